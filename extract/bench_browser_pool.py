@@ -0,0 +1,136 @@
+"""
+extract/bench_browser_pool.py
+
+Benchmark script -- NOT a unit test. Loads the same list of Sofascore match
+pages twice through capture_apis:
+
+    - cold:   pool=None, i.e. one Chromium launch per page (the old path)
+    - pooled: every page borrowed from one shared BrowserPool
+
+and reports pages-per-minute for each mode, so the cost of per-page browser
+cold starts can be measured on the actual scrape box.
+
+Match pages come from raw/<date>_sofascore.csv (run get_todays_matches for
+that date first). Each page is held for --wait-time seconds, same as a
+real capture, so the difference between the two modes is launch overhead.
+
+Running it once with --resource-profile full and once with light/minimal
+gives the bytes and blocked requests each profile saves (pooled mode).
+With --url-filter, only each match's MATCH_ENDPOINTS responses are
+decoded (as scrape.py does); the decoded/skipped counts show what the
+other API responses on the page would have cost.
+
+Usage:
+    python -m extract.bench_browser_pool 2022-11-20
+    python -m extract.bench_browser_pool 2022-11-20 --pages 20 --pool-size 2 --wait-time 2
+    python -m extract.bench_browser_pool 2022-11-20 --resource-profile light
+    python -m extract.bench_browser_pool 2022-11-20 --url-filter
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import pandas as pd
+
+from extract.scrape import API_PREFIX, HEADLESS, MATCH_ENDPOINTS, RAW_FOLDER, endpoint_url
+from utils.playwright_utils import (DEFAULT_RESOURCE_PROFILE, RESOURCE_PROFILES, BrowserPool, ResourceBlocker,
+                                   capture_apis, capture_stats)
+from utils.logging_setup import setup_logger
+
+logger = setup_logger("bench_browser_pool", "logs/bench_browser_pool.log")
+
+
+def load_match_urls(date_str, n_pages):
+    """Returns up to n_pages (sofascore_link, event_id) pairs from raw/<date>_sofascore.csv."""
+    input_path = os.path.join(RAW_FOLDER, f"{date_str}_sofascore.csv")
+    df = pd.read_csv(input_path).head(n_pages)
+    return list(zip(df['sofascore_link'], df['event_id']))
+
+
+async def run_mode(mode, urls, pool_size, wait_time, resource_profile=DEFAULT_RESOURCE_PROFILE, url_filter=False):
+    """Captures every url in `urls` with `pool_size` pages in flight, returns a result row."""
+    semaphore = asyncio.Semaphore(pool_size)
+    n_responses = 0
+    resource_blocker = ResourceBlocker(resource_profile)
+    capture_stats.reset()
+
+    async def capture_one(url_and_event, pool):
+        nonlocal n_responses
+        url, event_id = url_and_event
+        wanted = [endpoint_url(event_id, ep) for ep in MATCH_ENDPOINTS] if url_filter else None
+        async with semaphore:
+            responses = await capture_apis(url, API_PREFIX, headless=HEADLESS, wait_time=wait_time, pool=pool,
+                                           resource_blocker=resource_blocker, url_filter=wanted)
+            n_responses += len(responses)
+
+    started = time.perf_counter()
+    if mode == 'pooled':
+        async with BrowserPool(size=pool_size, headless=HEADLESS, resource_profile=resource_profile) as pool:
+            await asyncio.gather(*(capture_one(url, pool) for url in urls))
+            resource_blocker = pool.resource_blocker
+    else:
+        await asyncio.gather(*(capture_one(url, None) for url in urls))
+    elapsed = time.perf_counter() - started
+
+    pages_per_minute = round(len(urls) / elapsed * 60, 2) if elapsed else None
+    logger.info(f"run_mode: mode={mode} pages={len(urls)} elapsed={elapsed:.1f}s pages_per_minute={pages_per_minute}")
+    return {
+        'mode': mode,
+        'pages': len(urls),
+        'pool_size': pool_size,
+        'wait_time': wait_time,
+        'elapsed_seconds': round(elapsed, 2),
+        'pages_per_minute': pages_per_minute,
+        'api_responses': n_responses,
+        'resource_profile': resource_profile,
+        'requests_blocked': resource_blocker.blocked,
+        'bytes_received': resource_blocker.bytes_received,
+        'url_filter': url_filter,
+        **capture_stats.stats(),
+    }
+
+
+async def run_benchmark(date_str, n_pages, pool_size, wait_time, report_dir='reports',
+                        resource_profile=DEFAULT_RESOURCE_PROFILE, url_filter=False):
+    urls = load_match_urls(date_str, n_pages)
+    if not urls:
+        print(f"No match pages found for {date_str}")
+        return pd.DataFrame()
+
+    rows = []
+    for mode in ('cold', 'pooled'):
+        rows.append(await run_mode(mode, urls, pool_size, wait_time, resource_profile=resource_profile,
+                                   url_filter=url_filter))
+
+    results_df = pd.DataFrame(rows)
+    print("\n=== capture_apis pages-per-minute: cold launches vs BrowserPool ===")
+    print(results_df.to_string(index=False))
+
+    os.makedirs(report_dir, exist_ok=True)
+    suffix = "_filtered" if url_filter else ""
+    out_path = os.path.join(report_dir, f"bench_browser_pool_{date_str}_{resource_profile}{suffix}.csv")
+    results_df.to_csv(out_path, index=False)
+    logger.info(f"run_benchmark: saved {out_path}")
+    return results_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark capture_apis with per-page browser launches vs a shared BrowserPool.")
+    parser.add_argument('date_str', help="Date whose raw/<date>_sofascore.csv supplies the match pages")
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--pool-size', type=int, default=1)
+    parser.add_argument('--wait-time', type=int, default=2)
+    parser.add_argument('--report-dir', default='reports')
+    parser.add_argument('--resource-profile', choices=list(RESOURCE_PROFILES), default=DEFAULT_RESOURCE_PROFILE)
+    parser.add_argument('--url-filter', action='store_true',
+                        help="Decode only each match's MATCH_ENDPOINTS responses")
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args.date_str, args.pages, args.pool_size, args.wait_time, report_dir=args.report_dir,
+                              resource_profile=args.resource_profile, url_filter=args.url_filter))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+extract/bench_extract.py
+
+Benchmark script -- NOT a unit test. Runs the extract stage's per-match
+scrape (get_data_from_match for every match of a date) against a fixture
+bundle replayed offline (see utils.fixture_bundle; record one with
+`python -m extract.scrape <date> --record <bundle_dir>`), once per point of
+a concurrency x pool-size grid, and reports for each:
+
+    - pages_per_second / matches_per_minute
+    - p50 / p95 / max per-match latency
+    - peak and mean RSS of the browser processes (sampled from /proc)
+    - bytes transferred (page responses + direct API responses) and
+      JSON bytes decoded
+
+Replay removes the network from the measurement, so differences between
+runs are the extract code itself; the same bundle can be replayed after
+every change. Each grid point is appended as one JSON line to
+--results-file (default reports/bench_extract.jsonl) with a timestamp and
+the git commit, so runs can be compared over time.
+
+The match list comes from raw/<date>_sofascore.csv; if it doesn't exist it
+is discovered from the bundle into a temporary directory, so nothing is
+written under raw/. No match_data files or pipeline state are written
+either.
+
+Usage:
+    python -m extract.bench_extract 2022-12-01 fixtures/2022-12-01
+    python -m extract.bench_extract 2022-12-01 fixtures/2022-12-01 --concurrency 1 2 4 --pool-size 1 2 4
+    python -m extract.bench_extract 2022-12-01 fixtures/2022-12-01 --engine direct --repeat 3
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from extract.scrape import DEFAULT_ENGINE, ENGINES, HEADLESS, RAW_FOLDER, get_data_from_match, get_todays_matches
+from utils.fixture_bundle import FixtureBundle
+from utils.http_utils import ApiClient
+from utils.playwright_utils import DEFAULT_RESOURCE_PROFILE, RESOURCE_PROFILES, BrowserPool, capture_stats
+from utils.logging_setup import setup_logger
+
+logger = setup_logger("bench_extract", "logs/bench_extract.log")
+
+MEMORY_SAMPLE_SECONDS = 0.5
+
+
+def descendant_pids(root_pid):
+    """Every live process below root_pid (Chromium runs as children of the Playwright driver)."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # comm may contain spaces; ppid is the 2nd field after ')'
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    pids = []
+    stack = [root_pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            pids.append(child)
+            stack.append(child)
+    return pids
+
+
+def rss_bytes(pids):
+    total = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/statm') as f:
+                total += int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+async def sample_memory(samples, stop):
+    """Appends the RSS of all of this process's descendants to `samples` until `stop` is set."""
+    while not stop.is_set():
+        samples.append(rss_bytes(descendant_pids(os.getpid())))
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=MEMORY_SAMPLE_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[pct - 1]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def load_matches(date_str, fixtures, resource_profile):
+    input_path = os.path.join(RAW_FOLDER, f"{date_str}_sofascore.csv")
+    if os.path.exists(input_path):
+        return pd.read_csv(input_path)
+
+    logger.info(f"load_matches: {input_path} not found, discovering matches from the fixture bundle")
+    with tempfile.TemporaryDirectory() as raw_dir:
+        async with BrowserPool(headless=HEADLESS, resource_profile=resource_profile, fixtures=fixtures) as pool:
+            async with ApiClient(fixtures=fixtures) as client:
+                return await get_todays_matches(target_date=date_str, pool=pool, client=client, raw_dir=raw_dir)
+
+
+async def run_point(matches_df, fixtures, concurrency, pool_size, engine, resource_profile):
+    """Scrapes every match once with the given settings and returns a result row."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    n_failed = 0
+    capture_stats.reset()
+
+    memory_samples = []
+    stop_sampling = asyncio.Event()
+    sampler = asyncio.create_task(sample_memory(memory_samples, stop_sampling))
+
+    async with BrowserPool(size=pool_size, headless=HEADLESS, resource_profile=resource_profile,
+                           fixtures=fixtures) as pool:
+        client = ApiClient(fixtures=fixtures) if engine == "direct" else None
+
+        async def scrape_one(row):
+            nonlocal n_failed
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    await get_data_from_match(row.event_id, row.slug, row.custom_id, pool=pool, client=client)
+                except Exception as e:
+                    n_failed += 1
+                    logger.error(f"run_point: event_id={row.event_id} failed | {type(e).__name__}: {e}")
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(scrape_one(row) for row in matches_df.itertuples(index=False)))
+            elapsed = time.perf_counter() - started
+        finally:
+            if client is not None:
+                await client.close()
+            stop_sampling.set()
+            await sampler
+        pages_served = pool.pages_served
+        bytes_received = pool.resource_blocker.bytes_received + (client.bytes_received if client else 0)
+
+    n_matches = len(matches_df)
+    row = {
+        'concurrency': concurrency,
+        'pool_size': pool_size,
+        'engine': engine,
+        'resource_profile': resource_profile,
+        'matches': n_matches,
+        'matches_failed': n_failed,
+        'pages': pages_served,
+        'elapsed_seconds': round(elapsed, 3),
+        'pages_per_second': round(pages_served / elapsed, 3) if elapsed else None,
+        'matches_per_minute': round(n_matches / elapsed * 60, 2) if elapsed else None,
+        'latency_p50_seconds': round(percentile(latencies, 50), 3) if latencies else None,
+        'latency_p95_seconds': round(percentile(latencies, 95), 3) if latencies else None,
+        'latency_max_seconds': round(max(latencies), 3) if latencies else None,
+        'browser_rss_peak_mb': round(max(memory_samples) / 1024 ** 2, 1) if memory_samples else None,
+        'browser_rss_mean_mb': round(statistics.mean(memory_samples) / 1024 ** 2, 1) if memory_samples else None,
+        'bytes_received': bytes_received,
+        'bytes_decoded': capture_stats.bytes_decoded,
+        'bytes_skipped': capture_stats.bytes_skipped,
+    }
+    logger.info(f"run_point: {row}")
+    return row
+
+
+async def run_benchmark(date_str, bundle_dir, concurrencies, pool_sizes, engine=DEFAULT_ENGINE,
+                        resource_profile=DEFAULT_RESOURCE_PROFILE, repeat=1,
+                        results_file='reports/bench_extract.jsonl'):
+    with FixtureBundle(bundle_dir, mode="replay") as fixtures:
+        matches_df = await load_matches(date_str, fixtures, resource_profile)
+        if matches_df.empty:
+            print(f"No matches found for {date_str}")
+            return pd.DataFrame()
+
+        run_info = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_commit': git_commit(),
+            'date': date_str,
+            'bundle': bundle_dir,
+        }
+
+        rows = []
+        for concurrency in concurrencies:
+            for pool_size in pool_sizes:
+                for run in range(1, repeat + 1):
+                    print(f"concurrency={concurrency} pool_size={pool_size} run {run}/{repeat} ...")
+                    row = await run_point(matches_df, fixtures, concurrency, pool_size, engine, resource_profile)
+                    rows.append({**run_info, 'run': run, **row})
+
+        replay_stats = fixtures.stats()
+
+    results_df = pd.DataFrame(rows)
+    print("\n=== Extract throughput (replayed fixtures) ===")
+    print(results_df[['concurrency', 'pool_size', 'run', 'pages_per_second', 'matches_per_minute',
+                      'latency_p50_seconds', 'latency_p95_seconds', 'browser_rss_peak_mb',
+                      'bytes_received']].to_string(index=False))
+    print(f"\nFixture replay: {replay_stats}")
+
+    os.makedirs(os.path.dirname(results_file) or '.', exist_ok=True)
+    with open(results_file, 'a', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row) + '\n')
+    logger.info(f"run_benchmark: appended {len(rows)} result(s) to {results_file}")
+    print(f"Appended {len(rows)} result(s) to {results_file}")
+    return results_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extract throughput against a replayed fixture bundle.")
+    parser.add_argument('date_str', help="Date whose matches are scraped, e.g. 2022-12-01")
+    parser.add_argument('bundle_dir', help="Fixture bundle recorded with --record")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--pool-size', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--engine', choices=ENGINES, default=DEFAULT_ENGINE)
+    parser.add_argument('--resource-profile', choices=list(RESOURCE_PROFILES), default=DEFAULT_RESOURCE_PROFILE)
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per grid point")
+    parser.add_argument('--results-file', default='reports/bench_extract.jsonl')
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args.date_str, args.bundle_dir, args.concurrency, args.pool_size,
+                              engine=args.engine, resource_profile=args.resource_profile, repeat=args.repeat,
+                              results_file=args.results_file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+extract/convert_raw_format.py
+
+Converts every raw/<date>_match_data file from one raw format to the other
+(see utils.raw_format): by default the existing JSON-in-CSV files to
+zstd-compressed parquet, which transform.transform_csv reads directly.
+
+Each file is streamed through the same MatchDataWriter that scrape.py uses
+(so the output has the same columns and types as a fresh scrape), checked
+to hold the same event_ids as its source, and only then -- with
+--delete-source -- is the source removed. Sizes before/after are printed
+per file and in total.
+
+Usage:
+    python -m extract.convert_raw_format
+    python -m extract.convert_raw_format --to csv --raw-dir raw
+    python -m extract.convert_raw_format --delete-source
+"""
+
+import argparse
+import glob
+import os
+
+from extract.scrape import MATCH_DATA_COLUMNS, MATCH_DATA_INT_COLUMNS, RAW_FOLDER
+from utils.raw_format import RAW_EXTENSIONS, RAW_FORMATS, iter_match_data, read_match_data
+from utils.raw_writer import MatchDataWriter
+from utils.logging_setup import setup_logger
+
+logger = setup_logger("convert_raw_format", "logs/convert_raw_format.log")
+
+
+def convert_file(source_path, target_path):
+    """Converts one match_data file. Returns the number of rows written."""
+    with MatchDataWriter(target_path, MATCH_DATA_COLUMNS, int_columns=MATCH_DATA_INT_COLUMNS) as writer:
+        writer.open()
+        # One fsync per chunk rather than per row.
+        for chunk in iter_match_data(source_path):
+            writer.write_many(chunk.to_dict('records'))
+        n_rows = writer.finalize()
+
+    source_ids = sorted(read_match_data(source_path, columns=['event_id'])['event_id'])
+    target_ids = sorted(read_match_data(target_path, columns=['event_id'])['event_id'])
+    if source_ids != target_ids:
+        os.remove(target_path)
+        raise ValueError(f"event_ids differ after conversion ({len(source_ids)} vs {len(target_ids)} rows)")
+    return n_rows
+
+
+def convert_raw_dir(raw_dir=RAW_FOLDER, to_format="parquet", delete_source=False):
+    source_format = next(f for f in RAW_FORMATS if f != to_format)
+    pattern = os.path.join(raw_dir, f"*_match_data{RAW_EXTENSIONS[source_format]}")
+    source_paths = sorted(glob.glob(pattern))
+
+    logger.info(f"convert_raw_dir: converting {len(source_paths)} file(s) in {raw_dir} from {source_format} to {to_format}")
+
+    total_before = 0
+    total_after = 0
+    n_failed = 0
+    for source_path in source_paths:
+        target_path = source_path[:-len(RAW_EXTENSIONS[source_format])] + RAW_EXTENSIONS[to_format]
+        try:
+            n_rows = convert_file(source_path, target_path)
+        except Exception as e:
+            n_failed += 1
+            logger.error(f"convert_raw_dir: failed to convert {source_path} | {type(e).__name__}: {e}")
+            print(f"  [FAILED] {source_path} -- {type(e).__name__}: {e}")
+            continue
+
+        size_before = os.path.getsize(source_path)
+        size_after = os.path.getsize(target_path)
+        total_before += size_before
+        total_after += size_after
+        if delete_source:
+            os.remove(source_path)
+
+        logger.info(f"convert_raw_dir: {source_path} -> {target_path} ({n_rows} rows, {size_before} -> {size_after} bytes)")
+        print(f"  [OK] {os.path.basename(target_path)}: {n_rows} rows, "
+              f"{size_before / 1024:.0f} KiB -> {size_after / 1024:.0f} KiB")
+
+    ratio = total_before / total_after if total_after else 0
+    print(f"\n=== Converted {len(source_paths) - n_failed}/{len(source_paths)} file(s): "
+          f"{total_before / 1024 ** 2:.1f} MiB -> {total_after / 1024 ** 2:.1f} MiB ({ratio:.1f}x) ===")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert raw match_data files between csv and parquet.")
+    parser.add_argument('--raw-dir', default=RAW_FOLDER)
+    parser.add_argument('--to', dest='to_format', choices=RAW_FORMATS, default="parquet")
+    parser.add_argument('--delete-source', action='store_true',
+                        help="Remove each source file once its conversion has been verified")
+    args = parser.parse_args()
+
+    convert_raw_dir(raw_dir=args.raw_dir, to_format=args.to_format, delete_source=args.delete_source)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,58 @@
 """
 extract/run_world_cup_backfill.py
 
-Production driver: runs scrape.py's main(date_str, tournaments) for a fixed
-list of dates, restricted to FIFA World Cup (tournament_id=16), in batches
-with a pause between batches to avoid hammering the site.
+Production driver: runs scrape.py's main(date_str, tournaments) for a list
+of dates (the fixed World Cup DATES by default, or any dates/ranges given
+on the CLI), restricted to FIFA World Cup (tournament_id=16).
+
+Match discovery runs first for all dates, one date-range request per run
+of consecutive dates (get_todays_matches(end_date=...)), so the date
+pages are walked on one borrowed page instead of one page session per
+date. Then several dates run concurrently, but every request of every
+date goes through ONE global token bucket (--requests-per-second) and ONE
+browser pool whose size is the cap on pages in flight across all dates
+(--max-pages). Politeness is therefore a fixed, tunable rate rather than
+a side effect of pauses between batches, and throughput is whatever that
+rate allows.
 
 Unlike test_scrape.py (which calls get_data_from_match directly for
 diagnostics, with no CSV/state side effects), this calls the real
 main() for each date -- so it writes the actual raw/<date>_sofascore.csv
 and raw/<date>_match_data.csv files, and updates pipeline_state.csv's
-state_extract column for real, exactly as production usage intends.
+state_extract column for real, exactly as production usage intends. All
+dates share one in-memory pipeline state, so concurrent dates never
+overwrite each other's state updates.
+
+Scrape metrics (matches, missing endpoints, per-stage timings; see
+utils.metrics) are rewritten to metrics/scrape.prom after every date, and
+with --metrics-port also served live at http://127.0.0.1:<port>/metrics.
 
 Usage:
     python -m extract.run_world_cup_backfill
-    python -m extract.run_world_cup_backfill --batch-size 5 --batch-pause-seconds 60
+    python -m extract.run_world_cup_backfill --dates 2022-11-20:2022-12-18 2026-06-11:2026-06-16
+    python -m extract.run_world_cup_backfill --date-concurrency 3 --max-pages 4 --requests-per-second 0.5
+    python -m extract.run_world_cup_backfill --dates 2022-12-01:2022-12-03 --record fixtures/wc_dec
+    python -m extract.run_world_cup_backfill --dates 2022-12-01:2022-12-03 --replay fixtures/wc_dec
+    python -m extract.run_world_cup_backfill --metrics-port 9108
+    python -m extract.run_world_cup_backfill --profile-dir browser_profile
 """
 
 import argparse
 import asyncio
-
-from extract.scrape import main as scrape_main
+import time
+from contextlib import AsyncExitStack
+
+from extract.scrape import DEFAULT_ENGINE, ENGINES, HEADLESS, get_todays_matches, main as scrape_main
+from utils import metrics
+from utils.browser_profile import BrowserProfile
+from utils.date_utils import contiguous_ranges, expand_date_specs
+from utils.fixture_bundle import FixtureBundle
+from utils.http_utils import ApiClient
+from utils.pipeline_state import load_state
+from utils.playwright_utils import BrowserPool
+from utils.rate_limiter import TokenBucket
+from utils.raw_format import DEFAULT_RAW_FORMAT, RAW_FORMATS
+from utils.response_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, ResponseCache
 from utils.logging_setup import setup_logger
 
 logger = setup_logger("run_world_cup_backfill", "logs/run_world_cup_backfill.log")
@@ -33,58 +66,116 @@ DATES = [
 
 WORLD_CUP = {16: "FIFA World Cup"}
 
-BATCH_SIZE = 5
-BATCH_PAUSE_SECONDS = 60
+DATE_CONCURRENCY = 2
+MATCH_CONCURRENCY = 2
+MAX_PAGES_IN_FLIGHT = 2
+REQUESTS_PER_SECOND = 0.5
 
 
-def chunk_dates(dates, batch_size):
-    """Splits dates into a list of lists, each up to batch_size long."""
-    return [dates[i:i + batch_size] for i in range(0, len(dates), batch_size)]
+def format_eta(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s"
 
 
-async def run_backfill(dates=None, tournaments=None, batch_size=BATCH_SIZE,
-                        batch_pause_seconds=BATCH_PAUSE_SECONDS):
+async def run_backfill(dates=None, tournaments=None, date_concurrency=DATE_CONCURRENCY,
+                       match_concurrency=MATCH_CONCURRENCY, max_pages=MAX_PAGES_IN_FLIGHT,
+                       requests_per_second=REQUESTS_PER_SECOND, engine=DEFAULT_ENGINE, cache=None,
+                       incremental=False, raw_format=DEFAULT_RAW_FORMAT, fixtures=None, profile=None):
     """
-    Runs scrape.main(date_str, tournaments) for every date in `dates`, in
-    batches of `batch_size`, pausing `batch_pause_seconds` between batches.
+    Runs scrape.main(date_str, tournaments) for every date in `dates`,
+    up to `date_concurrency` dates at once and `match_concurrency`
+    matches at once within each date.
+
+    All dates share one TokenBucket of `requests_per_second` and one
+    BrowserPool of `max_pages` pages (and, for engine="direct", one
+    ApiClient drawing on the same bucket), so those two numbers bound the
+    load on the site no matter how many dates or matches are in flight.
 
     Each date's failures/successes are logged but do NOT stop the run --
     a failure on one date is independent of every other date, same
     philosophy as the per-row handling inside transform.py/scrape.py.
+    Progress and an ETA are logged and printed as each date finishes.
+
+    The match lists (raw/<date>_sofascore.csv) of all dates are written
+    first, one get_todays_matches call per run of consecutive dates, and
+    main() is then run with discover=False.
+
+    With a `cache` (utils.response_cache.ResponseCache), repeating a
+    backfill only fetches responses that were never captured. With
+    `incremental`, each date only scrapes matches not already extracted
+    successfully. `raw_format` picks the match_data file format. With
+    `fixtures` (utils.fixture_bundle.FixtureBundle), the shared pool and
+    client record into, or replay offline from, that bundle. With a
+    `profile` (utils.browser_profile.BrowserProfile), the pool's contexts
+    keep their cookies, consent state and HTTP cache on disk between runs.
     """
     dates = dates if dates is not None else DATES
     tournaments = tournaments if tournaments is not None else WORLD_CUP
 
-    batches = chunk_dates(dates, batch_size)
-    logger.info(f"run_backfill: {len(dates)} dates split into {len(batches)} batches of up to {batch_size}")
+    logger.info(
+        f"run_backfill: {len(dates)} dates, date_concurrency={date_concurrency}, "
+        f"match_concurrency={match_concurrency}, max_pages={max_pages}, "
+        f"requests_per_second={requests_per_second}, engine={engine}"
+    )
     logger.info(f"run_backfill: tournaments={tournaments}")
 
     results = []
-
-    for batch_num, batch_dates in enumerate(batches, start=1):
-        logger.info(f"run_backfill: starting batch {batch_num}/{len(batches)} -- dates: {batch_dates}")
-
-        for date_str in batch_dates:
-            logger.info(f"run_backfill: running main() for date_str={date_str}")
+    state_df = load_state()
+    date_semaphore = asyncio.Semaphore(max(1, date_concurrency))
+    rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+    started = time.monotonic()
+
+    async with AsyncExitStack() as stack:
+        pool = await stack.enter_async_context(
+            BrowserPool(size=max(1, max_pages), headless=HEADLESS, rate_limiter=rate_limiter, fixtures=fixtures,
+                        profile=profile)
+        )
+        client = None
+        if engine == "direct":
+            client = await stack.enter_async_context(ApiClient(rate_limiter=rate_limiter, fixtures=fixtures))
+
+        for start_date, end_date in contiguous_ranges(dates):
+            logger.info(f"run_backfill: discovering matches for {start_date} .. {end_date}")
             try:
-                await scrape_main(date_str, tournaments=tournaments)
-                results.append({'date': date_str, 'status': 'success', 'error': None})
-                logger.info(f"run_backfill: succeeded for date_str={date_str}")
+                await get_todays_matches(target_date=start_date, end_date=end_date, tournaments=tournaments,
+                                         pool=pool, client=client, cache=cache)
             except Exception as e:
-                error_message = f"{type(e).__name__}: {e}"
-                results.append({'date': date_str, 'status': 'failed', 'error': error_message})
-                logger.error(f"run_backfill: failed for date_str={date_str} | {error_message}")
-
-        logger.info(f"run_backfill: finished batch {batch_num}/{len(batches)}")
-
-        is_last_batch = (batch_num == len(batches))
-        if not is_last_batch:
-            logger.info(f"run_backfill: pausing {batch_pause_seconds}s before next batch")
-            await asyncio.sleep(batch_pause_seconds)
-
+                logger.error(f"run_backfill: discovery failed for {start_date} .. {end_date} | {type(e).__name__}: {e}")
+
+        async def run_date(date_str):
+            async with date_semaphore:
+                logger.info(f"run_backfill: running main() for date_str={date_str}")
+                try:
+                    await scrape_main(date_str, tournaments=tournaments, pool=pool, concurrency=match_concurrency,
+                                      engine=engine, client=client, cache=cache, incremental=incremental,
+                                      state_df=state_df, raw_format=raw_format, discover=False)
+                    results.append({'date': date_str, 'status': 'success', 'error': None})
+                    logger.info(f"run_backfill: succeeded for date_str={date_str}")
+                except Exception as e:
+                    error_message = f"{type(e).__name__}: {e}"
+                    results.append({'date': date_str, 'status': 'failed', 'error': error_message})
+                    logger.error(f"run_backfill: failed for date_str={date_str} | {error_message}")
+
+            n_done = len(results)
+            elapsed = time.monotonic() - started
+            eta = elapsed / n_done * (len(dates) - n_done)
+            progress = (
+                f"[{n_done}/{len(dates)}] {date_str} {results[-1]['status']} -- "
+                f"elapsed {format_eta(elapsed)}, ETA {format_eta(eta)}"
+            )
+            logger.info(f"run_backfill: {progress}")
+            print(progress)
+
+        await asyncio.gather(*(run_date(date_str) for date_str in dates))
+
+    results.sort(key=lambda r: r['date'])
     n_success = sum(1 for r in results if r['status'] == 'success')
     n_failed = sum(1 for r in results if r['status'] == 'failed')
-    logger.info(f"run_backfill: finished all batches -- {n_success} succeeded, {n_failed} failed")
+    logger.info(
+        f"run_backfill: finished all dates in {format_eta(time.monotonic() - started)} -- "
+        f"{n_success} succeeded, {n_failed} failed"
+    )
 
     print(f"\n=== Backfill finished: {n_success} succeeded, {n_failed} failed ===")
     for r in results:
@@ -95,18 +186,65 @@ async def run_backfill(dates=None, tournaments=None, batch_size=BATCH_SIZE,
 
 
 def main():
-    parser = argparse.ArgumentParser(description="Backfill scrape data for a fixed list of World Cup dates.")
-    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
-    parser.add_argument('--batch-pause-seconds', type=int, default=BATCH_PAUSE_SECONDS)
+    parser = argparse.ArgumentParser(description="Backfill scrape data for World Cup dates.")
+    parser.add_argument('--dates', nargs='+', default=None,
+                        help="Dates or inclusive ranges, e.g. 2022-11-20 2022-11-30:2022-12-18 (default: DATES)")
+    parser.add_argument('--date-concurrency', type=int, default=DATE_CONCURRENCY,
+                        help="Dates scraped at once")
+    parser.add_argument('--match-concurrency', type=int, default=MATCH_CONCURRENCY,
+                        help="Matches scraped at once within each date")
+    parser.add_argument('--max-pages', type=int, default=MAX_PAGES_IN_FLIGHT,
+                        help="Browser pages in flight across all dates")
+    parser.add_argument('--requests-per-second', type=float, default=REQUESTS_PER_SECOND,
+                        help="Global request budget shared by all dates (0 = unlimited)")
+    parser.add_argument('--engine', choices=ENGINES, default=DEFAULT_ENGINE)
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_MAX_BYTES // 1024 ** 2,
+                        help="Size cap for the response cache, least recently used entries are evicted")
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--incremental', action='store_true')
+    parser.add_argument('--raw-format', choices=RAW_FORMATS, default=DEFAULT_RAW_FORMAT)
+    fixture_group = parser.add_mutually_exclusive_group()
+    fixture_group.add_argument('--record', metavar='BUNDLE_DIR', default=None,
+                               help="Record every response into this fixture bundle (disables the cache)")
+    fixture_group.add_argument('--replay', metavar='BUNDLE_DIR', default=None,
+                               help="Run offline from this fixture bundle (disables the cache)")
+    parser.add_argument('--profile-dir', default=None,
+                        help="Persistent browser profile (cookies, consent, HTTP cache) shared across runs")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="Also serve metrics over HTTP on this port while the backfill runs")
     args = parser.parse_args()
 
-    asyncio.run(run_backfill(
-        dates=DATES,
-        tournaments=WORLD_CUP,
-        batch_size=args.batch_size,
-        batch_pause_seconds=args.batch_pause_seconds,
-    ))
+    if args.metrics_port:
+        metrics.serve(port=args.metrics_port)
+
+    dates = expand_date_specs(args.dates) if args.dates else DATES
+    fixtures = None
+    if args.record or args.replay:
+        fixtures = FixtureBundle(args.record or args.replay, mode="record" if args.record else "replay")
+    cache = None
+    if not args.no_cache and fixtures is None:
+        cache = ResponseCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 ** 2)
+
+    try:
+        asyncio.run(run_backfill(
+            dates=dates,
+            tournaments=WORLD_CUP,
+            date_concurrency=args.date_concurrency,
+            match_concurrency=args.match_concurrency,
+            max_pages=args.max_pages,
+            requests_per_second=args.requests_per_second,
+            engine=args.engine,
+            cache=cache,
+            incremental=args.incremental,
+            raw_format=args.raw_format,
+            fixtures=fixtures,
+            profile=BrowserProfile(args.profile_dir) if args.profile_dir else None,
+        ))
+    finally:
+        if fixtures is not None:
+            fixtures.close()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
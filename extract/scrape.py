@@ -1,20 +1,67 @@
 import asyncio
 import os
 import json
+from contextlib import AsyncExitStack
 from datetime import date, datetime, timedelta
 
 import pytz
 import pandas as pd
 
-from utils.playwright_utils import capture_apis
+from utils.browser_profile import BrowserProfile
+from utils.date_utils import date_range
+from utils.fixture_bundle import FixtureBundle
+from utils.http_utils import REFUSED_STATUSES, ApiClient, RedirectTransport
+from utils.playwright_utils import (DEFAULT_RESOURCE_PROFILE, RESOURCE_PROFILES, BrowserPool, capture_apis,
+                                   capture_apis_batch, capture_stats)
+from utils import metrics
 from utils.logging_setup import setup_logger
 from utils.pipeline_state import load_state, save_state, update_extract_state
+from utils.raw_format import (DEFAULT_RAW_FORMAT, RAW_FORMATS, find_match_data, iter_match_data,
+                              match_data_path, read_match_data, write_match_data)
+from utils.raw_writer import MatchDataWriter
+from utils.rate_limiter import TokenBucket
+from utils.response_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, ResponseCache
+from utils.retry_utils import retry_delay
 
 logger = setup_logger("scrape", "logs/scrape.log")
 
+MATCHES_DISCOVERED = metrics.counter("scrape_matches_discovered_total", "Finished matches listed by get_todays_matches")
+MATCHES_SCRAPED = metrics.counter("scrape_matches_total", "Matches scraped, by status")
+MATCH_SECONDS = metrics.histogram("scrape_match_seconds", "Seconds to fetch every endpoint of one match")
+ENDPOINTS_MISSING = metrics.counter("scrape_endpoints_missing_total",
+                                    "Endpoints missing from a scraped match, by endpoint")
+ENDPOINTS_RECOVERED = metrics.counter("scrape_endpoints_recovered_total",
+                                      "Missing endpoints recovered by the retry stage, by endpoint")
+STAGE_SECONDS = metrics.histogram("scrape_stage_seconds", "Seconds spent per stage of one date's run, by stage")
+
 API_PREFIX = "https://www.sofascore.com/api/v1"
 MOROCCO_TZ = pytz.timezone("Africa/Casablanca")
 RAW_FOLDER = "raw"
+HEADLESS = False
+SINGLE_NAVIGATION = True
+
+# Targeted retry of endpoints missing after scrape_all_matches: up to
+# RETRY_ATTEMPTS attempts per match, with utils.retry_utils.retry_delay
+# (exponential backoff, capped, with jitter) between attempts.
+RETRY_ATTEMPTS = 3
+
+# scrape_all_matches saves the pipeline state every STATE_SAVE_EVERY
+# matches (and once at the end) rather than after each one: a save
+# rewrites the whole state file. Matches scraped since the last save are
+# still in the date's journal, and are marked 'success' again on resume.
+STATE_SAVE_EVERY = 50
+
+# "browser": capture API JSON from Playwright page loads.
+# "direct":  fetch the API JSON over HTTP, falling back to the browser
+#            for any request the API refuses.
+ENGINES = ("browser", "direct")
+DEFAULT_ENGINE = "browser"
+
+# Cache policy: event endpoints are only scraped for finished matches, so
+# they never expire; a date's scheduled-events can still change for a day
+# or two (late kickoffs, postponements), so recent dates get a short TTL.
+SCHEDULED_EVENTS_TTL_SECONDS = 3600
+SCHEDULED_EVENTS_SETTLED_DAYS = 2
 
 TOURNAMENTS = {
     16:  "FIFA World Cup",
@@ -37,6 +84,14 @@ MATCH_ENDPOINTS = [
     "highlights",
 ]
 
+# Match page tabs visited by get_data_from_match, with the endpoints each
+# tab's visit is expected to trigger (None = the default match page).
+MATCH_TABS = [
+    (None,         ["incidents", "lineups", "average-positions", "highlights"]),
+    ("statistics", ["statistics"]),
+    ("shotmap",    ["shotmap"]),
+]
+
 
 # ---------------------------------------------------------------------------
 # Stage 1: get the list of completed matches for a given date
@@ -46,6 +101,32 @@ def build_url(target_date: str) -> str:
     return f"https://www.sofascore.com/fr/football/{target_date}"
 
 
+def scheduled_events_url(tournament_id: int, target_date: str) -> str:
+    return f"{API_PREFIX}/unique-tournament/{tournament_id}/scheduled-events/{target_date}"
+
+
+def scheduled_events_ttl(target_date: str):
+    """Cache TTL for a date's scheduled-events: None (never expires) once the date is settled."""
+    age_days = (datetime.now(MOROCCO_TZ).date() - date.fromisoformat(target_date)).days
+    return None if age_days >= SCHEDULED_EVENTS_SETTLED_DAYS else SCHEDULED_EVENTS_TTL_SECONDS
+
+
+def cache_captured(cache: ResponseCache, responses: list, wanted_urls: list, ttl_seconds: float = None,
+                   statuses: dict = None):
+    """
+    Stores the responses for wanted_urls in cache (no-op without a cache).
+    Wanted urls that answered 404 in `statuses` ({url: status}) are cached
+    as negative entries, with the cache's NEGATIVE_TTL_SECONDS.
+    """
+    if cache is None:
+        return
+    wanted = set(wanted_urls)
+    cache.store([r for r in responses if r["api_link"] in wanted], ttl_seconds=ttl_seconds)
+    for url, status in (statuses or {}).items():
+        if url in wanted and status == 404:
+            cache.put_unavailable(url, status)
+
+
 def parse_event(event: dict, competition: str) -> dict:
     kickoff_ts = event.get("startTimestamp")
     kickoff = datetime.fromtimestamp(kickoff_ts, tz=MOROCCO_TZ).strftime("%Y-%m-%d %H:%M") if kickoff_ts else None
@@ -75,107 +156,341 @@ def parse_event(event: dict, competition: str) -> dict:
     }
 
 
-async def get_todays_matches(target_date: str = None, tournaments: dict = None) -> pd.DataFrame:
-
+def collect_matches(responses: list, fetch_date: str, tournaments: dict, seen: set) -> list:
+    """Parsed Ended matches from a date's scheduled-events responses, skipping event_ids already in seen."""
+    matches = []
+    for r in responses:
+        for tournament_id, competition in tournaments.items():
+            endpoint = scheduled_events_url(tournament_id, fetch_date)
+            if r["api_link"] == endpoint:
+                events = r["json_response"].get("events", [])
+                for event in events:
+                    event_id = event.get("id")
+                    if event_id not in seen:
+                        parsed = parse_event(event, competition)
+                        if parsed["status"] == "Ended":
+                            seen.add(event_id)
+                            matches.append(parsed)
+    return matches
+
+
+async def get_todays_matches(target_date: str = None, tournaments: dict = None,
+                             pool: BrowserPool = None, client: ApiClient = None,
+                             cache: ResponseCache = None, end_date: str = None,
+                             raw_dir: str = None) -> pd.DataFrame:
+    """
+    Lists the finished matches of target_date (default: yesterday) and
+    writes them to raw/<date>_sofascore.csv (under `raw_dir` when given).
+    With `end_date`, does the same for every date from target_date to
+    end_date inclusive, one CSV per date, and returns all of them in one
+    DataFrame.
+
+    Each date's scheduled-events come from the cache, then the direct
+    `client`, and only what is still missing from the browser: every
+    date page that needs one is visited in turn on a single page
+    (capture_apis_batch), so a long range costs one page session, not
+    one browser start per date.
+    """
     tournaments_to_use = tournaments if tournaments is not None else TOURNAMENTS
     if target_date:
         fetch_date = target_date
     else:
         fetch_date = (datetime.now(MOROCCO_TZ).date() - timedelta(days=1)).isoformat()
 
-    dates_to_fetch = [fetch_date]
+    dates_to_fetch = date_range(fetch_date, end_date) if end_date else [fetch_date]
 
-    logger.info(f"get_todays_matches: fetching matches for {fetch_date}")
+    logger.info(f"get_todays_matches: fetching matches for {dates_to_fetch[0]} .. {dates_to_fetch[-1]} "
+                f"({len(dates_to_fetch)} date(s))")
     logger.info(f"get_todays_matches: scraping tournaments: {tournaments_to_use}")
 
-    seen = set()
-    all_matches = []
+    responses_by_date = {}
+    browser_targets = []
 
     for fetch_date in dates_to_fetch:
-        print(f"this is the dates to fitch: {dates_to_fetch} and this it the current date {fetch_date}")
-        url = build_url(fetch_date)
-        logger.info(f"get_todays_matches: fetching {fetch_date} from {url}")
+        wanted_urls = [scheduled_events_url(tournament_id, fetch_date) for tournament_id in tournaments_to_use]
+        expected_urls = wanted_urls
+        responses = []
         try:
-            responses = await capture_apis(url, API_PREFIX, headless=False, wait_time=10)
+            if cache is not None:
+                responses, expected_urls = await asyncio.to_thread(cache.lookup, wanted_urls)
+                if not expected_urls:
+                    logger.info(f"get_todays_matches: all scheduled-events for {fetch_date} served from cache")
+            if client is not None and expected_urls:
+                fetched, expected_urls = await client.fetch_apis(expected_urls)
+                await asyncio.to_thread(cache_captured, cache, fetched, wanted_urls, scheduled_events_ttl(fetch_date))
+                responses += fetched
         except Exception as e:
-            logger.error(f"get_todays_matches: failed to capture APIs for {fetch_date} | {type(e).__name__}: {e}")
-            continue
+            logger.error(f"get_todays_matches: failed to fetch APIs for {fetch_date} | {type(e).__name__}: {e}")
+        responses_by_date[fetch_date] = responses
+        if expected_urls:
+            browser_targets.append((fetch_date, expected_urls))
+
+    if browser_targets:
+        logger.info(f"get_todays_matches: visiting {len(browser_targets)} date page(s) in one browser session")
+        captured = await capture_apis_batch(
+            [(build_url(fetch_date), expected_urls) for fetch_date, expected_urls in browser_targets],
+            API_PREFIX, headless=HEADLESS, wait_time=10, pool=pool,
+        )
+        for (fetch_date, expected_urls), fetched in zip(browser_targets, captured):
+            await asyncio.to_thread(cache_captured, cache, fetched, expected_urls, scheduled_events_ttl(fetch_date))
+            responses_by_date[fetch_date] += fetched
+
+    raw_dir = raw_dir or RAW_FOLDER
+    os.makedirs(raw_dir, exist_ok=True)
+    frames = []
+    for fetch_date in dates_to_fetch:
+        # Duplicates are only dropped within one date: an event listed on
+        # date D's page but kicking off on D+1 must still reach D+1's CSV
+        # (scrape_all_matches drops it from D by its kickoff date).
+        seen = set()
+        df = pd.DataFrame(collect_matches(responses_by_date[fetch_date], fetch_date, tournaments_to_use, seen))
+        output_path = os.path.join(raw_dir, f"{fetch_date}_sofascore.csv")
+        df.to_csv(output_path, index=False)
+        logger.info(f"get_todays_matches: saved {len(df)} matches -> {output_path}")
+        MATCHES_DISCOVERED.inc(len(df))
+        frames.append(df)
 
-        for r in responses:
-            for tournament_id, competition in tournaments_to_use.items():
-                endpoint = f"{API_PREFIX}/unique-tournament/{tournament_id}/scheduled-events/{fetch_date}"
-                if r["api_link"] == endpoint:
-                    events = r["json_response"].get("events", [])
-                    for event in events:
-                        event_id = event.get("id")
-                        if event_id not in seen:
-                            parsed = parse_event(event, competition)
-                            if parsed["status"] == "Ended":
-                                seen.add(event_id)
-                                all_matches.append(parsed)
-
-    df = pd.DataFrame(all_matches)
-    os.makedirs(RAW_FOLDER, exist_ok=True)
-    output_date = fetch_date
-    output_path = os.path.join(RAW_FOLDER, f"{output_date}_sofascore.csv")
-    df.to_csv(output_path, index=False)
-    logger.info(f"get_todays_matches: saved {len(df)} matches -> {output_path}")
-    return df
+    return pd.concat(frames, ignore_index=True)
 
 
 # ---------------------------------------------------------------------------
 # Stage 2: scrape full per-match detail data for every match in the list
 # ---------------------------------------------------------------------------
 
-async def get_data_from_match(event_id: int, slug: str, custom_id: str) -> dict:
-    logger.info(f"get_data_from_match: scraping match event_id={event_id} ({slug})")
-
-    base_url = f"https://www.sofascore.com/fr/football/match/{slug}/{custom_id}"
-    stats_url = f"{base_url}#id:{event_id},tab:statistics"
-    shotmap_url = f"{base_url}#id:{event_id},tab:shotmap"
+def endpoint_url(event_id, endpoint: str) -> str:
+    return f"{API_PREFIX}/event/{event_id}/{endpoint}"
 
-    urls_to_visit = [base_url, stats_url, shotmap_url]
 
-    all_responses = []
-    for url in urls_to_visit:
-        try:
-            responses = await capture_apis(url, API_PREFIX, headless=False, wait_time=10)
-            all_responses.extend(responses)
-        except Exception as e:
-            logger.error(f"get_data_from_match: failed to capture APIs for event_id={event_id} at {url} | {type(e).__name__}: {e}")
-            continue
+def endpoint_key(endpoint: str) -> str:
+    """match_data key / match_data.csv column for an endpoint, e.g. average-positions -> average_positions."""
+    return endpoint.replace("/", "_").replace("-", "_")
 
-    match_data = {"event_id": event_id}
-    pending_endpoints = set(MATCH_ENDPOINTS)
 
-    for r in all_responses:
+def collect_endpoints(responses: list, event_id, match_data: dict, pending_endpoints: set):
+    """
+    Moves every response matching one of pending_endpoints for event_id
+    into match_data (first capture wins) and removes it from
+    pending_endpoints, both in place.
+    """
+    for r in responses:
         if not pending_endpoints:
             break
         matched_endpoints = []
         for endpoint in pending_endpoints:
-            expected = f"{API_PREFIX}/event/{event_id}/{endpoint}"
+            expected = endpoint_url(event_id, endpoint)
             if r["api_link"] == expected:
                 matched_endpoints.append(endpoint)
-                key = endpoint.replace("/", "_").replace("-", "_")
+                key = endpoint_key(endpoint)
                 if key not in match_data:
                     match_data[key] = json.dumps(r["json_response"])
                     logger.info(f"get_data_from_match: captured {endpoint} for event_id={event_id}")
 
         pending_endpoints.difference_update(matched_endpoints)
-        
 
-    missing = [ep for ep in pending_endpoints]
+
+def tab_url(base_url: str, event_id, tab: str) -> str:
+    return base_url if tab is None else f"{base_url}#id:{event_id},tab:{tab}"
+
+
+def settled_unavailable(settled_statuses: dict, event_id, pending_endpoints: set) -> list:
+    """
+    Pending endpoints whose URL the browser saw answered with a final
+    non-200 status (e.g. 404: no shotmap for this match), removed from
+    pending_endpoints in place. Refusals (REFUSED_STATUSES) stay pending,
+    as with the direct engine.
+    """
+    unavailable = []
+    for endpoint in sorted(pending_endpoints):
+        status = settled_statuses.get(endpoint_url(event_id, endpoint))
+        if status is not None and status not in REFUSED_STATUSES:
+            unavailable.append(endpoint)
+            logger.info(f"get_data_from_match: event_id={event_id} {endpoint} answered {status}, not retrying")
+    pending_endpoints.difference_update(unavailable)
+    return unavailable
+
+
+async def get_data_from_match(event_id: int, slug: str, custom_id: str, pool: BrowserPool = None,
+                              single_navigation: bool = SINGLE_NAVIGATION, client: ApiClient = None,
+                              cache: ResponseCache = None, endpoints: list = None,
+                              unavailable: list = None) -> dict:
+    """
+    Fetches `endpoints` (default: all MATCH_ENDPOINTS) for one match.
+    `unavailable`, when given, is extended in place with the endpoints
+    found to be legitimately absent for this match (a final non-200 such
+    as 404, fresh or negatively cached), as opposed to merely missed.
+
+    With a `cache`, endpoints already cached are taken from it and only
+    the rest touch the network; everything fetched is cached, and so are
+    404s (as negative entries with a TTL), so an endpoint a match doesn't
+    have is not requested again on the next run. Cache reads and writes
+    (gzip + file I/O) run in a worker thread, off the event loop.
+
+    With a direct `client`, every endpoint is first fetched straight from
+    the API; an endpoint the API answers without refusing (e.g. 404) is
+    final, and only refused ones go through the browser below.
+
+    With single_navigation, loads the match page once and switches to the
+    statistics/shotmap tabs in-page (hash change), capturing every
+    endpoint from that one page load. An endpoint the page sees answered
+    with a final non-200 status (e.g. 404) is unavailable, like with the
+    direct engine, and is not fetched again below.
+
+    Whatever is still missing (or everything, without single_navigation)
+    is then fetched by visiting the match page and its statistics/shotmap
+    tabs as separate page loads, waiting on each only until the endpoints
+    that tab is expected to trigger have arrived. A tab whose endpoints
+    were all captured already is not loaded at all; the last tab also
+    waits for anything still missing.
+    """
+    logger.info(f"get_data_from_match: scraping match event_id={event_id} ({slug})")
+
+    base_url = f"https://www.sofascore.com/fr/football/match/{slug}/{custom_id}"
+
+    wanted_endpoints = [ep for ep in MATCH_ENDPOINTS if endpoints is None or ep in endpoints]
+    match_data = {"event_id": event_id}
+    pending_endpoints = set(wanted_endpoints)
+    unavailable_endpoints = []
+    all_urls = [endpoint_url(event_id, ep) for ep in wanted_endpoints]
+
+    if cache is not None:
+        cached_unavailable = {}
+        cached_responses, _ = await asyncio.to_thread(cache.lookup, all_urls, cached_unavailable)
+        collect_endpoints(cached_responses, event_id, match_data, pending_endpoints)
+        unavailable_endpoints += settled_unavailable(cached_unavailable, event_id, pending_endpoints)
+        if not pending_endpoints:
+            logger.info(f"get_data_from_match: all endpoints for event_id={event_id} served from cache")
+            if unavailable is not None:
+                unavailable.extend(unavailable_endpoints)
+            return match_data
+
+    if client is not None and pending_endpoints:
+        direct_statuses = {}
+        responses, refused = await client.fetch_apis([endpoint_url(event_id, ep) for ep in wanted_endpoints
+                                                      if ep in pending_endpoints], statuses=direct_statuses)
+        collect_endpoints(responses, event_id, match_data, pending_endpoints)
+        if cache is not None:
+            await asyncio.to_thread(cache_captured, cache, responses, all_urls, None, direct_statuses)
+        direct_unavailable = [ep for ep in wanted_endpoints
+                              if ep in pending_endpoints and endpoint_url(event_id, ep) not in refused]
+        pending_endpoints.difference_update(direct_unavailable)
+        unavailable_endpoints += direct_unavailable
+        if pending_endpoints:
+            logger.info(
+                f"get_data_from_match: event_id={event_id} direct fetch refused for "
+                f"{sorted(pending_endpoints)}, falling back to the browser"
+            )
+
+    if single_navigation and pending_endpoints:
+        follow_up_urls = [(tab_url(base_url, event_id, tab),
+                           [endpoint_url(event_id, ep) for ep in tab_endpoints if ep in pending_endpoints])
+                          for tab, tab_endpoints in MATCH_TABS if tab is not None]
+        expected_urls = [endpoint_url(event_id, ep) for ep in MATCH_ENDPOINTS if ep in pending_endpoints]
+        settled_statuses = {}
+        try:
+            responses = await capture_apis(base_url, API_PREFIX, headless=HEADLESS, wait_time=10, pool=pool,
+                                           expected_urls=expected_urls, follow_up_urls=follow_up_urls,
+                                           settled_statuses=settled_statuses)
+            collect_endpoints(responses, event_id, match_data, pending_endpoints)
+            if cache is not None:
+                await asyncio.to_thread(cache_captured, cache, responses, all_urls, None, settled_statuses)
+            unavailable_endpoints += settled_unavailable(settled_statuses, event_id, pending_endpoints)
+        except Exception as e:
+            logger.error(f"get_data_from_match: single-navigation capture failed for event_id={event_id} | {type(e).__name__}: {e}")
+        if pending_endpoints:
+            logger.info(
+                f"get_data_from_match: event_id={event_id} falling back to per-tab page loads for "
+                f"{sorted(pending_endpoints)}"
+            )
+
+    for tab_num, (tab, tab_endpoints) in enumerate(MATCH_TABS, start=1):
+        is_last_tab = tab_num == len(MATCH_TABS)
+        targets = [ep for ep in MATCH_ENDPOINTS
+                   if ep in pending_endpoints and (is_last_tab or ep in tab_endpoints)]
+        if not targets:
+            continue
+
+        url = tab_url(base_url, event_id, tab)
+        expected_urls = [endpoint_url(event_id, ep) for ep in targets]
+        # Decode any still-pending endpoint this tab happens to trigger,
+        # not only the ones it is waited on for.
+        pending_urls = [endpoint_url(event_id, ep) for ep in pending_endpoints]
+        settled_statuses = {}
+        try:
+            responses = await capture_apis(url, API_PREFIX, headless=HEADLESS, wait_time=10, pool=pool,
+                                           expected_urls=expected_urls, url_filter=pending_urls,
+                                           settled_statuses=settled_statuses)
+        except Exception as e:
+            logger.error(f"get_data_from_match: failed to capture APIs for event_id={event_id} at {url} | {type(e).__name__}: {e}")
+            continue
+
+        collect_endpoints(responses, event_id, match_data, pending_endpoints)
+        if cache is not None:
+            await asyncio.to_thread(cache_captured, cache, responses, all_urls, None, settled_statuses)
+        unavailable_endpoints += settled_unavailable(settled_statuses, event_id, pending_endpoints)
+
+    missing = [ep for ep in pending_endpoints] + unavailable_endpoints
     if missing:
         logger.warning(f"get_data_from_match: event_id={event_id} missing endpoints: {missing}")
+    if unavailable is not None:
+        unavailable.extend(unavailable_endpoints)
 
     return match_data
 
-async def scrape_all_matches(date_str: str):
+# Column order of <date>_match_data files: event_id, one column per
+# endpoint, then the match info copied over from <date>_sofascore.csv.
+MATCH_INFO_COLUMNS = [
+    "competition", "kickoff", "home_team", "home_team_id", "away_team", "away_team_id",
+    "home_score", "away_score", "slug", "custom_id", "sofascore_link",
+]
+MATCH_DATA_COLUMNS = ["event_id"] + [endpoint_key(ep) for ep in MATCH_ENDPOINTS] + MATCH_INFO_COLUMNS
+MATCH_DATA_INT_COLUMNS = ["event_id", "home_team_id", "away_team_id", "home_score", "away_score"]
+
+
+def existing_match_records(output_path: str, event_ids: set):
+    """Yields the rows of an existing match_data file whose event_id is in event_ids, as dicts, chunk by chunk."""
+    for chunk in iter_match_data(output_path):
+        chunk = chunk.loc[chunk['event_id'].isin(event_ids)]
+        yield from chunk.to_dict('records')
+
+
+async def scrape_all_matches(date_str: str, pool: BrowserPool = None, concurrency: int = 1,
+                             client: ApiClient = None, cache: ResponseCache = None,
+                             incremental: bool = False, state_df: pd.DataFrame = None,
+                             raw_format: str = DEFAULT_RAW_FORMAT):
+    """
+    Scrapes every match listed in raw/<date>_sofascore.csv and writes
+    raw/<date>_match_data.<csv|parquet> (see utils.raw_format). Up to `concurrency` matches are scraped at
+    once; page loads are further bounded by the pool's size and its
+    rate limiter. concurrency=1 is the original one-match-at-a-time run.
+
+    Each match is written to a journal (utils.raw_writer.MatchDataWriter)
+    as soon as it is scraped, so memory stays flat and a crash loses at
+    most the matches in flight; the state is saved every STATE_SAVE_EVERY
+    matches and at the end. The output is only replaced, atomically and in
+    <date>_sofascore.csv row order, once every match is done. Matches
+    already in a journal left by a crashed run are not scraped again, and
+    are marked 'success' in case the crash came before their state was saved.
+
+    With incremental=True, matches whose state_extract is already
+    'success' AND whose row is already in the existing match_data file
+    (the newest one, in either format: see utils.raw_format.find_match_data)
+    are skipped; everything else (failed or never attempted) is scraped.
+    Rows of the existing file are kept unless their match is re-scraped
+    successfully.
+
+    `state_df` lets concurrent runs for several dates share (and save)
+    one in-memory pipeline state instead of each loading the file and
+    overwriting the others' updates; by default it is loaded here.
+
+    Returns {event_id: [endpoints]} of the endpoints found unavailable
+    (e.g. 404) for the matches scraped, for retry_missing_endpoints to skip.
+    """
     input_path = os.path.join(RAW_FOLDER, f"{date_str}_sofascore.csv")
+    unavailable_by_event = {}
 
     if not os.path.exists(input_path):
         logger.error(f"scrape_all_matches: input file not found: {input_path}")
-        return
+        return unavailable_by_event
 
     df = pd.read_csv(input_path)
 
@@ -192,57 +507,327 @@ async def scrape_all_matches(date_str: str):
 
     logger.info(f"scrape_all_matches: found {len(df)} matches to scrape for {date_str}")
 
-    state_df = load_state()
-
-    all_data = []
+    state_df = state_df if state_df is not None else load_state()
+    output_path = match_data_path(RAW_FOLDER, date_str, raw_format)
 
-    for _, row in df.iterrows():
-        event_id = row["event_id"]
-        try:
-            match_data = await get_data_from_match(
-                row["event_id"],
-                row["slug"],
-                row["custom_id"]
+    with MatchDataWriter(output_path, MATCH_DATA_COLUMNS, int_columns=MATCH_DATA_INT_COLUMNS) as writer:
+        recovered = writer.open()
+        to_scrape_df = df
+        if recovered:
+            logger.info(
+                f"scrape_all_matches: resuming {date_str} -- {len(recovered)} match(es) already journaled "
+                f"by an interrupted run"
+            )
+            to_scrape_df = to_scrape_df.loc[~to_scrape_df['event_id'].isin(recovered)]
+            # The journal only ever holds matches scraped successfully and
+            # rows copied for matches already 'success', so a recovered
+            # match that isn't 'success' yet was scraped by the crashed run.
+            for event_id in recovered:
+                if event_id not in state_df.index or state_df.loc[event_id, 'state_extract'] != 'success':
+                    update_extract_state(state_df, event_id, status='success')
+
+        existing_path = find_match_data(RAW_FOLDER, date_str)
+        if incremental and existing_path is not None:
+            existing_ids = read_match_data(existing_path, columns=['event_id'])['event_id']
+            succeeded = set(state_df.loc[state_df['state_extract'] == 'success', 'event_id'])
+            already_done = to_scrape_df['event_id'].isin(succeeded) & to_scrape_df['event_id'].isin(existing_ids)
+            logger.info(
+                f"scrape_all_matches: incremental run for {date_str} -- skipping {int(already_done.sum())} "
+                f"already-extracted match(es), scraping {int((~already_done).sum())}"
             )
-            update_extract_state(state_df, event_id, status='success')
+            # Only the skipped matches' rows go into the journal now; the
+            # rows of matches about to be re-scraped are kept out of it
+            # until finalize, in case their re-scrape fails.
+            writer.write_missing(existing_match_records(existing_path, set(to_scrape_df.loc[already_done, 'event_id'])))
+            to_scrape_df = to_scrape_df.loc[~already_done]
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        unsaved = 0
+
+        def record_state(event_id, status, error_message=None):
+            nonlocal unsaved
+            update_extract_state(state_df, event_id, status=status, error_message=error_message)
+            unsaved += 1
+            if unsaved >= STATE_SAVE_EVERY:
+                save_state(state_df)
+                unsaved = 0
+
+        async def scrape_one(row):
+            event_id = row["event_id"]
+            unavailable = []
+            async with semaphore:
+                try:
+                    with MATCH_SECONDS.time():
+                        match_data = await get_data_from_match(
+                            row["event_id"],
+                            row["slug"],
+                            row["custom_id"],
+                            pool=pool,
+                            client=client,
+                            cache=cache,
+                            unavailable=unavailable,
+                        )
+                except Exception as e:
+                    error_message = f"{type(e).__name__}: {e}"
+                    record_state(event_id, 'failed', error_message=error_message)
+                    MATCHES_SCRAPED.inc(status='failed')
+                    logger.error(f"scrape_all_matches: failed to scrape event_id={event_id} | {error_message}")
+                    return
+
+            for column in MATCH_INFO_COLUMNS:
+                match_data[column] = row[column]
+
+            writer.write(match_data)
+            if unavailable:
+                unavailable_by_event[event_id] = unavailable
+            record_state(event_id, 'success')
+            MATCHES_SCRAPED.inc(status='success')
+            for endpoint in MATCH_ENDPOINTS:
+                if endpoint_key(endpoint) not in match_data:
+                    ENDPOINTS_MISSING.inc(endpoint=endpoint)
             logger.info(f"scrape_all_matches: succeeded for event_id={event_id}")
-        except Exception as e:
-            error_message = f"{type(e).__name__}: {e}"
-            update_extract_state(state_df, event_id, status='failed', error_message=error_message)
-            logger.error(f"scrape_all_matches: failed to scrape event_id={event_id} | {error_message}")
-            continue
 
-        match_data["competition"]   = row["competition"]
-        match_data["kickoff"]       = row["kickoff"]
-        match_data["home_team"]     = row["home_team"]
-        match_data["home_team_id"]  = row["home_team_id"]
-        match_data["away_team"]     = row["away_team"]
-        match_data["away_team_id"]  = row["away_team_id"]
-        match_data["home_score"]    = row["home_score"]
-        match_data["away_score"]    = row["away_score"]
-        match_data["slug"]          = row["slug"]
-        match_data["custom_id"]     = row["custom_id"]
-        match_data["sofascore_link"] = row["sofascore_link"]
+        try:
+            await asyncio.gather(*(scrape_one(row) for _, row in to_scrape_df.iterrows()))
+        finally:
+            save_state(state_df)
 
-        all_data.append(match_data)
+        # Existing rows of matches whose re-scrape failed are kept as they were.
+        kept = {}
+        if incremental and existing_path is not None:
+            unscraped = {event_id for event_id in df['event_id'] if event_id not in writer}
+            kept = {record['event_id']: record for record in existing_match_records(existing_path, unscraped)}
 
-    save_state(state_df)
+        # The journal can hold records in any finishing order; finalize
+        # writes them in the <date>_sofascore.csv row order.
+        n_rows = writer.finalize(df['event_id'], kept=kept)
 
-    output_df = pd.DataFrame(all_data)
-    output_path = os.path.join(RAW_FOLDER, f"{date_str}_match_data.csv")
-    output_df.to_csv(output_path, index=False)
-    logger.info(f"scrape_all_matches: saved {len(output_df)} matches -> {output_path}")
+    logger.info(f"scrape_all_matches: saved {n_rows} matches -> {output_path}")
+    return unavailable_by_event
 
     
+# ---------------------------------------------------------------------------
+# Stage 3: retry only the endpoints still missing from match_data
+# ---------------------------------------------------------------------------
+
+def find_missing_endpoints(row) -> list:
+    """MATCH_ENDPOINTS whose column is absent or empty in a match_data row."""
+    return [ep for ep in MATCH_ENDPOINTS if pd.isna(row.get(endpoint_key(ep)))]
+
+
+RETRY_REPORT_COLUMNS = ['event_id', 'endpoint', 'attempts', 'recovered', 'unavailable']
+
+
+def retry_report_path(date_str: str) -> str:
+    return os.path.join(RAW_FOLDER, f"{date_str}_endpoint_retries.csv")
+
+
+def load_unavailable_endpoints(date_str: str) -> set:
+    """(event_id, endpoint) pairs a previous retry report recorded as unavailable."""
+    report_path = retry_report_path(date_str)
+    if not os.path.exists(report_path):
+        return set()
+    report_df = pd.read_csv(report_path)
+    if 'unavailable' not in report_df.columns:
+        return set()
+    report_df = report_df.loc[report_df['unavailable'].astype(bool)]
+    return set(zip(report_df['event_id'], report_df['endpoint']))
+
+
+async def retry_missing_endpoints(date_str: str, pool: BrowserPool = None, concurrency: int = 1,
+                                  client: ApiClient = None, cache: ResponseCache = None,
+                                  max_attempts: int = RETRY_ATTEMPTS, known_unavailable: dict = None):
+    """
+    Re-requests only the endpoints missing from raw/<date>_match_data
+    (e.g. just shotmap), per match, with exponential backoff and jitter
+    between attempts, and patches whatever is recovered into the existing
+    rows. Only the tabs those endpoints need are loaded. The file patched
+    is the newest match_data file of the date, in either format -- the one
+    transform reads (see utils.raw_format.find_match_data) -- and parquet
+    keeps MatchDataWriter's int64/string schema.
+
+    Endpoints that are legitimately absent (answered 404: no shotmap or
+    highlights for this match) are not retried: neither those reported by
+    this run's scrape (`known_unavailable`, {event_id: [endpoints]}, as
+    returned by scrape_all_matches) or a previous retry report, nor those
+    an attempt here finds unavailable. Delete the report to re-check them.
+
+    Attempt counts are saved per (event_id, endpoint) to
+    raw/<date>_endpoint_retries.csv, with unavailable endpoints flagged.
+    Returns that report as a DataFrame.
+    """
+    output_path = find_match_data(RAW_FOLDER, date_str)
+    if max_attempts < 1 or output_path is None:
+        return pd.DataFrame()
+
+    match_df = read_match_data(output_path)
+    for endpoint in MATCH_ENDPOINTS:
+        key = endpoint_key(endpoint)
+        if key not in match_df.columns:
+            match_df[key] = pd.NA
+        # An all-empty endpoint column is read back as float64; recovered
+        # JSON strings are patched into it below.
+        match_df[key] = match_df[key].astype(object)
+
+    skip = load_unavailable_endpoints(date_str)
+    for event_id, endpoints in (known_unavailable or {}).items():
+        skip.update((event_id, endpoint) for endpoint in endpoints)
+
+    report_rows = []
+    todo = []
+    for i, row in match_df.iterrows():
+        missing = find_missing_endpoints(row)
+        for endpoint in [ep for ep in missing if (row["event_id"], ep) in skip]:
+            missing.remove(endpoint)
+            report_rows.append({'event_id': row["event_id"], 'endpoint': endpoint, 'attempts': 0,
+                                'recovered': False, 'unavailable': True})
+        if missing:
+            todo.append((i, missing))
+    if not todo:
+        logger.info(f"retry_missing_endpoints: no missing endpoints to retry for {date_str} "
+                    f"({len(report_rows)} known unavailable)")
+    else:
+        logger.info(f"retry_missing_endpoints: {len(todo)} match(es) with missing endpoints for {date_str}, "
+                    f"{len(report_rows)} known-unavailable endpoint(s) skipped")
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    patched = False
+
+    async def retry_one(i, missing):
+        nonlocal patched
+        row = match_df.loc[i]
+        event_id = row["event_id"]
+        attempts = {ep: 0 for ep in missing}
+        unavailable = []
+        async with semaphore:
+            for attempt in range(1, max_attempts + 1):
+                for endpoint in missing:
+                    attempts[endpoint] += 1
+                try:
+                    recovered = await get_data_from_match(
+                        event_id, row["slug"], row["custom_id"], pool=pool, single_navigation=False,
+                        client=client, cache=cache, endpoints=missing, unavailable=unavailable,
+                    )
+                except Exception as e:
+                    logger.error(f"retry_missing_endpoints: attempt {attempt} failed for event_id={event_id} | {type(e).__name__}: {e}")
+                    recovered = {}
+
+                for endpoint in list(missing):
+                    key = endpoint_key(endpoint)
+                    if key in recovered:
+                        match_df.at[i, key] = recovered[key]
+                        patched = True
+                        missing.remove(endpoint)
+                        ENDPOINTS_RECOVERED.inc(endpoint=endpoint)
+                        logger.info(f"retry_missing_endpoints: recovered {endpoint} for event_id={event_id} on attempt {attempt}")
+                    elif endpoint in unavailable:
+                        missing.remove(endpoint)
+                        logger.info(f"retry_missing_endpoints: {endpoint} unavailable for event_id={event_id}, not retrying")
+
+                if not missing or attempt == max_attempts:
+                    break
+                await asyncio.sleep(retry_delay(attempt))
+
+        for endpoint, n_attempts in attempts.items():
+            report_rows.append({'event_id': event_id, 'endpoint': endpoint, 'attempts': n_attempts,
+                                'recovered': endpoint not in missing and endpoint not in unavailable,
+                                'unavailable': endpoint in unavailable})
+
+    await asyncio.gather(*(retry_one(i, missing) for i, missing in todo))
+
+    if patched:
+        write_match_data(match_df, output_path, int_columns=MATCH_DATA_INT_COLUMNS)
+
+    report_df = pd.DataFrame(report_rows, columns=RETRY_REPORT_COLUMNS)
+    report_path = retry_report_path(date_str)
+    report_df.to_csv(report_path, index=False)
+    logger.info(
+        f"retry_missing_endpoints: recovered {int(report_df['recovered'].sum())}/{len(report_df)} "
+        f"missing endpoint(s) for {date_str} -> {report_path}"
+    )
+    return report_df
+
+
 # ---------------------------------------------------------------------------
 # Main: run both stages in sequence for a given date
 # ---------------------------------------------------------------------------
 
-async def main(date_str: str, tournaments: dict = None):
-    logger.info(f"main: starting scrape run for date_str={date_str}")
-    await get_todays_matches(target_date=date_str, tournaments=tournaments)
-    await scrape_all_matches(date_str)
-    logger.info(f"main: finished scrape run for date_str={date_str}")
+async def main(date_str: str, tournaments: dict = None, pool: BrowserPool = None,
+               concurrency: int = 1, requests_per_second: float = None,
+               engine: str = DEFAULT_ENGINE, client: ApiClient = None, api_origin: str = None,
+               cache: ResponseCache = None, resource_profile: str = DEFAULT_RESOURCE_PROFILE,
+               incremental: bool = False, retry_attempts: int = RETRY_ATTEMPTS,
+               state_df: pd.DataFrame = None, raw_format: str = DEFAULT_RAW_FORMAT,
+               discover: bool = True, fixtures: FixtureBundle = None, profile: BrowserProfile = None):
+    """
+    Runs all stages for date_str: match list, per-match data, then a
+    targeted retry of missing endpoints (up to `retry_attempts` attempts
+    per match, 0 to skip). Every page of the run is borrowed from
+    one BrowserPool: the caller's `pool` if given (so a backfill can share
+    one browser across dates), otherwise a pool of `concurrency` pages
+    opened for this run only, rate-limited to `requests_per_second` page
+    loads when that is set, and blocking what `resource_profile` says
+    (see utils.playwright_utils.RESOURCE_PROFILES). A caller-supplied
+    pool keeps its own limiter and profile.
+
+    engine="direct" fetches the API JSON through one shared ApiClient
+    (the caller's `client`, or one opened here sharing the pool's rate
+    limiter), with the pool only used for refused requests. `api_origin`
+    sends those requests to another server, e.g. a local fixture server.
+
+    With a `cache`, every stage reads cached responses before touching the
+    network, so re-running a date only fetches what is still missing.
+    With `incremental`, matches already extracted successfully are not
+    scraped again (see scrape_all_matches). `state_df` is the shared
+    pipeline state when several dates run at once. Run metrics (see
+    utils.metrics) are written to metrics/scrape.prom at the end. `raw_format` is the
+    match_data file format (utils.raw_format.RAW_FORMATS). discover=False
+    skips the match list stage, for callers that already wrote
+    raw/<date>_sofascore.csv (e.g. for a whole date range at once).
+
+    With `fixtures` (utils.fixture_bundle.FixtureBundle), the pool and
+    client opened here record every response into the bundle, or replay
+    the run from it fully offline. Pass cache=None with fixtures: cached
+    responses would be missing from a recording, and would make a replay
+    depend on the cache's contents.
+
+    With a `profile` (utils.browser_profile.BrowserProfile), the pool
+    opened here keeps its HTTP cache, cookies and consent state on disk
+    across pages, runs and concurrent workers.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+
+    async with AsyncExitStack() as stack:
+        if pool is None:
+            rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+            pool = await stack.enter_async_context(BrowserPool(
+                size=max(1, concurrency), headless=HEADLESS, rate_limiter=rate_limiter,
+                resource_profile=resource_profile, fixtures=fixtures, profile=profile,
+            ))
+        if engine == "direct" and client is None:
+            transport = RedirectTransport(api_origin) if api_origin else None
+            client = await stack.enter_async_context(ApiClient(transport=transport, rate_limiter=pool.rate_limiter,
+                                                               fixtures=fixtures))
+
+        logger.info(f"main: starting scrape run for date_str={date_str} (engine={engine}, concurrency={concurrency})")
+        if discover:
+            with STAGE_SECONDS.time(stage='discover'):
+                await get_todays_matches(target_date=date_str, tournaments=tournaments, pool=pool, client=client,
+                                         cache=cache)
+        with STAGE_SECONDS.time(stage='matches'):
+            unavailable = await scrape_all_matches(date_str, pool=pool, concurrency=concurrency, client=client,
+                                                   cache=cache, incremental=incremental, state_df=state_df,
+                                                   raw_format=raw_format)
+        with STAGE_SECONDS.time(stage='retry'):
+            await retry_missing_endpoints(date_str, pool=pool, concurrency=concurrency, client=client, cache=cache,
+                                          max_attempts=retry_attempts, known_unavailable=unavailable)
+        logger.info(f"main: finished scrape run for date_str={date_str}")
+        if cache is not None:
+            logger.info(f"main: response cache stats for date_str={date_str}: {cache.stats()}")
+        logger.info(f"main: capture stats so far: {capture_stats.stats()}")
+        metrics_path = metrics.write_textfile("scrape")
+        logger.info(f"main: metrics written to {metrics_path}")
 
 
 def parse_tournament_args(args: list) -> dict:
@@ -284,14 +869,58 @@ def parse_tournament_args(args: list) -> dict:
 
 
 if __name__ == "__main__":
-    import sys
-
-    if len(sys.argv) < 2:
-        print("Usage: python -m extract.scrape YYYY-MM-DD [tournament_id name [tournament_id name ...]]")
-        sys.exit(1)
-
-    date_str = sys.argv[1]
-    tournament_args = sys.argv[2:]
-    tournaments = parse_tournament_args(tournament_args)
-
-    asyncio.run(main(date_str, tournaments=tournaments))
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Scrape Sofascore match data for one date.")
+    parser.add_argument('date_str', help="Date to scrape, e.g. 2026-06-17")
+    parser.add_argument('tournament_args', nargs='*',
+                        help="Optional alternating tournament_id/name pairs, e.g. 16 'FIFA World Cup'")
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help="Number of matches scraped at once (default 1)")
+    parser.add_argument('--requests-per-second', type=float, default=None,
+                        help="Global cap on page loads per second across all concurrent matches")
+    parser.add_argument('--engine', choices=ENGINES, default=DEFAULT_ENGINE,
+                        help="browser: capture via Playwright; direct: fetch the JSON API over HTTP")
+    parser.add_argument('--api-origin', default=None,
+                        help="Send direct-engine requests to this origin instead, e.g. http://127.0.0.1:8765")
+    parser.add_argument('--resource-profile', choices=list(RESOURCE_PROFILES), default=DEFAULT_RESOURCE_PROFILE,
+                        help="Which page resources the browser blocks (full blocks nothing)")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help="On-disk API response cache directory")
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_MAX_BYTES // 1024 ** 2,
+                        help="Size cap for the response cache, least recently used entries are evicted")
+    parser.add_argument('--no-cache', action='store_true', help="Always fetch from the network")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Skip matches already extracted successfully and merge into the existing match_data file")
+    parser.add_argument('--retry-attempts', type=int, default=RETRY_ATTEMPTS,
+                        help="Attempts per match to recover endpoints still missing after the scrape (0 disables)")
+    parser.add_argument('--raw-format', choices=RAW_FORMATS, default=DEFAULT_RAW_FORMAT,
+                        help="Format of the match_data file: csv, or zstd-compressed parquet")
+    fixture_group = parser.add_mutually_exclusive_group()
+    fixture_group.add_argument('--record', metavar='BUNDLE_DIR', default=None,
+                               help="Record every response of the run into this fixture bundle (disables the cache)")
+    fixture_group.add_argument('--replay', metavar='BUNDLE_DIR', default=None,
+                               help="Run offline from this fixture bundle (disables the cache)")
+    parser.add_argument('--profile-dir', default=None,
+                        help="Persistent browser profile shared across runs and workers "
+                             "(disk HTTP cache needs --resource-profile full)")
+    args = parser.parse_args()
+
+    tournaments = parse_tournament_args(args.tournament_args)
+    fixtures = None
+    if args.record or args.replay:
+        fixtures = FixtureBundle(args.record or args.replay, mode="record" if args.record else "replay")
+    cache = None
+    if not args.no_cache and fixtures is None:
+        cache = ResponseCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 ** 2)
+
+    try:
+        asyncio.run(main(args.date_str, tournaments=tournaments,
+                         concurrency=args.concurrency, requests_per_second=args.requests_per_second,
+                         engine=args.engine, api_origin=args.api_origin, cache=cache,
+                         resource_profile=args.resource_profile, incremental=args.incremental,
+                         retry_attempts=args.retry_attempts, raw_format=args.raw_format, fixtures=fixtures,
+                         profile=BrowserProfile(args.profile_dir) if args.profile_dir else None))
+    finally:
+        if fixtures is not None:
+            fixtures.close()
\ No newline at end of file
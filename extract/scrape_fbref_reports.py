@@ -0,0 +1,400 @@
+"""
+extract/scrape_fbref_reports.py
+
+Fetches the fbref match report of every match in a fixtures file (the
+Fbref_Link column written by extract.scrape_html_files_fbref) and parses
+its player, keeper, shot and team stat tables into parquet, next to the
+Sofascore tables:
+
+    processed/<date>/fbref_player_<category>.parquet   one row per player
+    processed/<date>/fbref_team_<category>.parquet     the table's team totals
+    processed/<date>/fbref_keeper.parquet
+    processed/<date>/fbref_shots.parquet
+
+<category> is fbref's table suffix (summary, passing, passing_types,
+defense, possession, misc). Columns are fbref's data-stat names, plus
+fbref_match_id, fbref_team_id and (player tables) fbref_player_id.
+
+Fetching is polite by construction: at most --concurrency requests in
+flight and one global token bucket (--requests-per-second, default one
+request every ~7 s, under fbref's published limit). 429/5xx answers are
+retried with exponential backoff. Every report is stored in a local
+gzip cache keyed by URL (utils.response_cache.ResponseCache under
+cache/fbref), so a report is only ever downloaded once; --offline runs
+from that cache alone and never touches the network, and --record /
+--replay work with fixture bundles as in extract.scrape. Parsing runs in
+a process pool once the fetches are done.
+
+Usage:
+    python -m extract.scrape_fbref_reports matches_to_rate.parquet
+    python -m extract.scrape_fbref_reports matches_to_rate.parquet --concurrency 2 --requests-per-second 0.1
+    python -m extract.scrape_fbref_reports matches_to_rate.parquet --offline
+    python -m extract.scrape_fbref_reports matches_to_rate.parquet --replay fixtures/fbref
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+import lxml.html
+import pandas as pd
+
+from utils import metrics
+from utils.fixture_bundle import FixtureBundle
+from utils.http_utils import DEFAULT_HEADERS, DEFAULT_TIMEOUT_SECONDS
+from utils.rate_limiter import TokenBucket
+from utils.response_cache import ResponseCache
+from utils.retry_utils import retry_delay
+from utils.logging_setup import setup_logger
+
+logger = setup_logger("scrape_fbref_reports", "logs/scrape_fbref_reports.log")
+
+DEFAULT_CACHE_DIR = "cache/fbref"
+DEFAULT_OUTPUT_DIR = "processed"
+CONCURRENCY = 1
+REQUESTS_PER_SECOND = 0.15
+FETCH_ATTEMPTS = 4
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+REQUEST_HEADERS = {
+    "User-Agent": DEFAULT_HEADERS["User-Agent"],
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+MATCH_ID_RE = re.compile(r"/matches/([0-9a-f]{8})")
+PLAYER_TABLE_RE = re.compile(r"^stats_([0-9a-f]{8})_(\w+)$")
+KEEPER_TABLE_RE = re.compile(r"^keeper_stats_([0-9a-f]{8})$")
+SHOTS_TABLE_ID = "shots_all"
+SKIPPED_ROW_CLASSES = {"thead", "over_header", "spacer"}
+
+# Text columns per kind of table (by table-name prefix); every other
+# data-stat is a number and is stored as float64, and the fbref_* ids as
+# strings (hex ids can happen to be all digits). Fixed per table, so a
+# table's parquet schema doesn't depend on which matches a date contains.
+FBREF_TEXT_COLUMNS = {
+    "fbref_player_": {"player", "nationality", "position", "age"},
+    "fbref_team_": {"player", "nationality", "position", "age"},
+    "fbref_keeper": {"player", "nationality", "age"},
+    "fbref_shots": {"minute", "player", "team", "outcome", "body_part", "notes",
+                    "sca_1_player", "sca_1_type", "sca_2_player", "sca_2_type"},
+}
+
+REPORTS = metrics.counter("fbref_reports_total", "Match reports requested, by source (cache/network/missing)")
+FETCH_SECONDS = metrics.histogram("fbref_fetch_seconds", "Seconds per fbref HTTP request")
+
+
+# ---------------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------------
+
+def match_id_of(url: str) -> str:
+    found = MATCH_ID_RE.search(url)
+    return found.group(1) if found else None
+
+
+def _stat_tables(tree):
+    """
+    Every <table> of the page, including those fbref ships inside HTML
+    comments (filled in client-side) on some report pages.
+    """
+    tables = tree.xpath("//table[@id]")
+    for comment in tree.xpath("//comment()[contains(., '<table')]"):
+        tables.extend(lxml.html.fromstring(comment.text).xpath("//table[@id]"))
+    return tables
+
+
+def _row_record(row) -> dict:
+    record = {}
+    for cell in row:
+        stat = cell.get("data-stat")
+        if not stat:
+            continue
+        record[stat] = cell.text_content().strip()
+        if stat == "player" and cell.get("data-append-csv"):
+            record["fbref_player_id"] = cell.get("data-append-csv")
+    return record
+
+
+def _table_rows(table, section: str) -> list:
+    rows = []
+    for row in table.xpath(f"./{section}/tr"):
+        if SKIPPED_ROW_CLASSES.intersection((row.get("class") or "").split()):
+            continue
+        record = _row_record(row)
+        if record:
+            rows.append(record)
+    return rows
+
+
+def parse_report(html, url: str = None) -> dict:
+    """
+    Parses one match report into {table_name: [row dicts]} (see the module
+    docstring for the table names). Cell values are kept as text; numeric
+    columns are converted when the tables are combined.
+    """
+    tree = lxml.html.fromstring(html)
+    match_id = match_id_of(url) if url else None
+    tables = {}
+
+    def add(name, rows, team_id=None):
+        for row in rows:
+            row["fbref_match_id"] = match_id
+            if team_id is not None:
+                row["fbref_team_id"] = team_id
+        tables.setdefault(name, []).extend(rows)
+
+    seen_ids = set()
+    for table in _stat_tables(tree):
+        table_id = table.get("id")
+        if table_id in seen_ids:
+            continue
+        seen_ids.add(table_id)
+
+        player_table = PLAYER_TABLE_RE.match(table_id)
+        keeper_table = KEEPER_TABLE_RE.match(table_id)
+        if player_table:
+            team_id, category = player_table.groups()
+            add(f"fbref_player_{category}", _table_rows(table, "tbody"), team_id)
+            add(f"fbref_team_{category}", _table_rows(table, "tfoot"), team_id)
+        elif keeper_table:
+            add("fbref_keeper", _table_rows(table, "tbody"), keeper_table.group(1))
+        elif table_id == SHOTS_TABLE_ID:
+            add("fbref_shots", _table_rows(table, "tbody"))
+
+    return tables
+
+
+def _parse_job(job):
+    url, html = job
+    try:
+        return url, parse_report(html, url), None
+    except Exception as e:
+        return url, {}, f"{type(e).__name__}: {e}"
+
+
+def _text_columns(table_name: str) -> set:
+    for prefix, columns in FBREF_TEXT_COLUMNS.items():
+        if table_name.startswith(prefix):
+            return columns
+    return set()
+
+
+def _apply_dtypes(table_name: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Gives every column of an fbref table its fixed dtype (see
+    FBREF_TEXT_COLUMNS): numbers (fbref writes 1,234 for thousands) become
+    float64, empty cells NaN. A value that isn't a number in a numeric
+    column is logged and stored as NaN.
+    """
+    text_columns = _text_columns(table_name)
+    for column in df.columns:
+        if column.startswith("fbref_") or column in text_columns:
+            df[column] = df[column].astype("string")
+            continue
+        values = df[column].replace("", None)
+        converted = pd.to_numeric(values.astype("string").str.replace(",", "", regex=False), errors="coerce")
+        n_dropped = int(values.notna().sum() - converted.notna().sum())
+        if n_dropped:
+            logger.warning(f"_apply_dtypes: {table_name}.{column}: {n_dropped} non-numeric value(s) stored as NaN, "
+                           f"e.g. {values[converted.isna() & values.notna()].iloc[0]!r}")
+        df[column] = converted.astype("float64")
+    return df
+
+
+# ---------------------------------------------------------------------------
+# Fetching
+# ---------------------------------------------------------------------------
+
+async def fetch_report(client: httpx.AsyncClient, url: str, rate_limiter: TokenBucket = None,
+                       attempts: int = FETCH_ATTEMPTS) -> str:
+    """GETs one report, retrying 429/5xx and network errors with backoff. Returns the HTML or None."""
+    for attempt in range(1, attempts + 1):
+        if rate_limiter is not None:
+            await rate_limiter.acquire()
+        try:
+            with FETCH_SECONDS.time():
+                response = await client.get(url)
+        except httpx.HTTPError as e:
+            logger.warning(f"fetch_report: attempt {attempt} failed for {url} | {type(e).__name__}: {e}")
+            status = 0
+        else:
+            status = response.status_code
+            if status == 200:
+                return response.text
+            if status not in RETRY_STATUSES:
+                logger.warning(f"fetch_report: {url} answered {status}, not retrying")
+                return None
+
+        if attempt < attempts:
+            retry_after = response.headers.get("retry-after", "") if status else ""
+            delay = float(retry_after) if retry_after.isdigit() else retry_delay(attempt)
+            logger.info(f"fetch_report: {url} answered {status}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    logger.error(f"fetch_report: giving up on {url} after {attempts} attempt(s)")
+    return None
+
+
+async def fetch_reports(urls, cache: ResponseCache, concurrency: int = CONCURRENCY,
+                        requests_per_second: float = REQUESTS_PER_SECOND, offline: bool = False,
+                        fixtures: FixtureBundle = None) -> dict:
+    """
+    Returns {url: html} for every url available from the cache or, unless
+    `offline`, fetched from fbref (and then cached). Urls that could not
+    be fetched are left out. Cache reads and writes (gzip + file I/O) run
+    in a thread, off the event loop.
+    """
+    reports = {}
+    to_fetch = []
+    for url in urls:
+        html = await asyncio.to_thread(cache.get, url) if cache is not None else None
+        if html is not None:
+            reports[url] = html
+            REPORTS.inc(source="cache")
+        else:
+            to_fetch.append(url)
+
+    logger.info(f"fetch_reports: {len(reports)} cached, {len(to_fetch)} to fetch (offline={offline})")
+    if offline or not to_fetch:
+        REPORTS.inc(len(to_fetch), source="missing")
+        return reports
+
+    transport = None
+    if fixtures is not None:
+        transport = fixtures.mock_transport() if fixtures.mode == "replay" else fixtures.recording_transport()
+    rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async with httpx.AsyncClient(http2=True, transport=transport, headers=REQUEST_HEADERS,
+                                 timeout=DEFAULT_TIMEOUT_SECONDS, follow_redirects=True) as client:
+
+        async def fetch_one(i, url):
+            async with semaphore:
+                html = await fetch_report(client, url, rate_limiter)
+            if html is None:
+                REPORTS.inc(source="missing")
+                return
+            reports[url] = html
+            REPORTS.inc(source="network")
+            if cache is not None:
+                await asyncio.to_thread(cache.put, url, html)
+            print(f"[{i}/{len(to_fetch)}] fetched {url}")
+
+        await asyncio.gather(*(fetch_one(i, url) for i, url in enumerate(to_fetch, start=1)))
+
+    return reports
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def read_fixtures(fixtures_path: str) -> pd.DataFrame:
+    if fixtures_path.endswith(".parquet"):
+        df = pd.read_parquet(fixtures_path)
+    elif fixtures_path.endswith(".xlsx"):
+        df = pd.read_excel(fixtures_path)
+    else:
+        df = pd.read_csv(fixtures_path)
+    df = df[df["Fbref_Link"].notna() & (df["Fbref_Link"] != "")]
+    return df.drop_duplicates(subset="Fbref_Link")
+
+
+def write_tables(tables_by_date: dict, output_dir: str = DEFAULT_OUTPUT_DIR):
+    """Writes {date: {table_name: DataFrame}} to <output_dir>/<date>/<table_name>.parquet, staged then moved."""
+    for date_str, tables in sorted(tables_by_date.items()):
+        date_output_dir = os.path.join(output_dir, date_str)
+        with tempfile.TemporaryDirectory() as staging_dir:
+            for table_name, table_df in tables.items():
+                table_df.to_parquet(os.path.join(staging_dir, f"{table_name}.parquet"), index=False)
+            os.makedirs(date_output_dir, exist_ok=True)
+            for table_name, table_df in tables.items():
+                final_path = os.path.join(date_output_dir, f"{table_name}.parquet")
+                shutil.move(os.path.join(staging_dir, f"{table_name}.parquet"), final_path)
+                logger.info(f"write_tables: wrote {final_path} ({len(table_df)} rows)")
+        print(f"{date_str}: wrote {len(tables)} fbref table(s) to {date_output_dir}")
+
+
+def scrape_fbref_reports(fixtures_path: str, output_dir: str = DEFAULT_OUTPUT_DIR,
+                         cache_dir: str = DEFAULT_CACHE_DIR, concurrency: int = CONCURRENCY,
+                         requests_per_second: float = REQUESTS_PER_SECOND, offline: bool = False,
+                         workers: int = None, fixtures: FixtureBundle = None) -> dict:
+    """
+    Fetches and parses the report of every match in fixtures_path, and
+    writes the stat tables per match date. Returns {date: {table: df}}.
+    """
+    matches_df = read_fixtures(fixtures_path)
+    urls = list(matches_df["Fbref_Link"])
+    date_of = dict(zip(matches_df["Fbref_Link"], matches_df["Date"].astype(str)))
+    cache = ResponseCache(cache_dir) if fixtures is None else None
+
+    reports = asyncio.run(fetch_reports(urls, cache, concurrency=concurrency,
+                                        requests_per_second=requests_per_second, offline=offline,
+                                        fixtures=fixtures))
+
+    rows_by_date = {}
+    n_failed = 0
+    jobs = [(url, reports[url]) for url in urls if url in reports]
+    workers = workers or min(len(jobs), os.cpu_count() or 1) or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for url, tables, error in executor.map(_parse_job, jobs, chunksize=8):
+            if error is not None:
+                n_failed += 1
+                logger.error(f"scrape_fbref_reports: failed to parse {url} | {error}")
+                continue
+            by_table = rows_by_date.setdefault(date_of[url], {})
+            for table_name, rows in tables.items():
+                by_table.setdefault(table_name, []).extend(rows)
+
+    tables_by_date = {
+        date_str: {name: _apply_dtypes(name, pd.DataFrame(rows)) for name, rows in tables.items() if rows}
+        for date_str, tables in rows_by_date.items()
+    }
+    write_tables(tables_by_date, output_dir)
+
+    n_missing = len(urls) - len(reports)
+    print(f"\n=== fbref reports: {len(jobs) - n_failed} parsed, {n_failed} failed to parse, "
+          f"{n_missing} not available{' offline' if offline else ''} ===")
+    if cache is not None:
+        logger.info(f"scrape_fbref_reports: cache stats {cache.stats()}")
+    metrics.write_textfile("fbref")
+    return tables_by_date
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch and parse fbref match reports into parquet stat tables.")
+    parser.add_argument('fixtures_path', help="Fixtures file with Fbref_Link and Date columns (.parquet/.csv/.xlsx)")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help="Requests in flight")
+    parser.add_argument('--requests-per-second', type=float, default=REQUESTS_PER_SECOND,
+                        help="Global request budget (0 = unlimited)")
+    parser.add_argument('--workers', type=int, default=None, help="Parser processes")
+    fixture_group = parser.add_mutually_exclusive_group()
+    fixture_group.add_argument('--offline', action='store_true', help="Only use reports already in the cache")
+    fixture_group.add_argument('--record', metavar='BUNDLE_DIR', default=None,
+                               help="Record every response into this fixture bundle (disables the cache)")
+    fixture_group.add_argument('--replay', metavar='BUNDLE_DIR', default=None,
+                               help="Run offline from this fixture bundle (disables the cache)")
+    args = parser.parse_args()
+
+    fixtures = None
+    if args.record or args.replay:
+        fixtures = FixtureBundle(args.record or args.replay, mode="record" if args.record else "replay")
+    try:
+        scrape_fbref_reports(args.fixtures_path, output_dir=args.output_dir, cache_dir=args.cache_dir,
+                             concurrency=args.concurrency, requests_per_second=args.requests_per_second,
+                             offline=args.offline, workers=args.workers, fixtures=fixtures)
+    finally:
+        if fixtures is not None:
+            fixtures.close()
+
+
+if __name__ == "__main__":
+    main()
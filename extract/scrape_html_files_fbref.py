@@ -1,5 +1,26 @@
 # extract/scrape_wc.py
-from bs4 import BeautifulSoup
+"""
+Parses saved fbref "Scores & Fixtures" pages into one table of matches to
+rate.
+
+Each page is parsed with lxml: one XPath selects the fixture rows of the
+first table, and each row's cells are read into a {data-stat: cell} dict
+in a single pass, instead of one BeautifulSoup .find() per column. Files
+are parsed in a process pool (one file per task), so decades of season
+pages take seconds. Output is Parquet or CSV (by the --output extension);
+the Excel sheet for manual rating is an optional extra export.
+
+Usage:
+    python -m extract.scrape_html_files_fbref
+    python -m extract.scrape_html_files_fbref seasons/*.html --output raw/fbref_fixtures.parquet
+    python -m extract.scrape_html_files_fbref 2022_wc.html:70 2026_wc.html:20 --excel matches_to_rate.xlsx
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import lxml.html
 import pandas as pd
 
 FILES = [
@@ -7,71 +28,146 @@ FILES = [
     {"path": "2026_wc.html", "limit": 20},
 ]
 
-def parse_fixtures(html: str, limit: int) -> list:
-    soup = BeautifulSoup(html, "lxml")
-    table = soup.find("table")
+DEFAULT_OUTPUT = "matches_to_rate.parquet"
+FBREF_ORIGIN = "https://fbref.com"
 
-    if not table:
+# fbref pages are UTF-8. Saved copies don't always keep the meta charset,
+# and without it libxml2 would read the raw bytes as Latin-1
+# ("Côte d'Ivoire" -> "CÃ´te d'Ivoire").
+HTML_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+
+# Rows of the first table, minus fbref's spacer and repeated-header rows.
+FIXTURE_ROWS_XPATH = (
+    "(//table)[1]/tbody/tr"
+    "[not(contains(concat(' ', normalize-space(@class), ' '), ' spacer '))"
+    " and not(contains(concat(' ', normalize-space(@class), ' '), ' thead '))]"
+)
+
+
+def _cells_by_stat(row) -> dict:
+    return {cell.get("data-stat"): cell for cell in row if cell.tag == "td" and cell.get("data-stat")}
+
+
+def _link_text(cell) -> str:
+    if cell is None:
+        return ""
+    link = cell.find(".//a")
+    return link.text_content().strip() if link is not None else ""
+
+
+def parse_fixtures(html: str, limit: int = None) -> list:
+    tree = lxml.html.fromstring(html, parser=HTML_PARSER)
+    rows = tree.xpath(FIXTURE_ROWS_XPATH)
+
+    if not rows and not tree.xpath("//table"):
         print("Table not found")
         return []
 
-    rows = table.find("tbody").find_all("tr")
     matches = []
-    count = 0
-
     for row in rows:
-        if count >= limit:
+        if limit is not None and len(matches) >= limit:
             break
 
-        classes = row.get("class", [])
-        if "spacer" in classes or "thead" in classes:
+        cells = _cells_by_stat(row)
+        date_td = cells.get("date")
+        home_td = cells.get("home_team")
+        away_td = cells.get("away_team")
+        if date_td is None or home_td is None or away_td is None:
             continue
 
-        date_td    = row.find("td", {"data-stat": "date"})
-        home_td    = row.find("td", {"data-stat": "home_team"})
-        away_td    = row.find("td", {"data-stat": "away_team"})
-        score_td   = row.find("td", {"data-stat": "score"})
-        report_td  = row.find("td", {"data-stat": "match_report"})
-
-        if not date_td or not home_td or not away_td:
-            continue
-
-        date       = date_td.text.strip()
-        home_team  = home_td.find("a").text.strip() if home_td.find("a") else ""
-        away_team  = away_td.find("a").text.strip() if away_td.find("a") else ""
-        score      = score_td.text.strip() if score_td else ""
-        fbref_link = "https://fbref.com" + report_td.find("a")["href"] if report_td and report_td.find("a") else ""
-
+        home_team = _link_text(home_td)
+        away_team = _link_text(away_td)
         if not home_team or not away_team:
             continue
 
+        score_td = cells.get("score")
+        report_td = cells.get("match_report")
+        report_link = report_td.find(".//a") if report_td is not None else None
+
         matches.append({
             "Title": f"{home_team} vs {away_team}",
-            "Date": date,
+            "Date": date_td.text_content().strip(),
             "Home Team": home_team,
             "Away Team": away_team,
-            "Score": score,
-            "Fbref_Link": fbref_link,
+            "Score": score_td.text_content().strip() if score_td is not None else "",
+            "Fbref_Link": FBREF_ORIGIN + report_link.get("href") if report_link is not None else "",
             "Rating (0-100)": ""
         })
-        count += 1
 
     return matches
 
-def extract_wc_matches():
+
+def parse_file(file: dict) -> list:
+    """Parses one {"path", "limit"} entry (run in a worker process)."""
+    with open(file["path"], "rb") as f:
+        html = f.read()
+    return parse_fixtures(html, file.get("limit"))
+
+
+def parse_file_specs(specs: list) -> list:
+    """'path' or 'path:limit' command-line specs -> FILES-style entries."""
+    files = []
+    for spec in specs:
+        path, sep, limit = spec.rpartition(":")
+        if sep and limit.isdigit():
+            files.append({"path": path, "limit": int(limit)})
+        else:
+            files.append({"path": spec, "limit": None})
+    return files
+
+
+def write_matches(df: pd.DataFrame, output_path: str):
+    """Writes the matches as Parquet or CSV, by output_path's extension."""
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    if output_path.endswith(".parquet"):
+        df.to_parquet(output_path, index=False)
+    elif output_path.endswith(".csv"):
+        df.to_csv(output_path, index=False)
+    else:
+        raise ValueError(f"Unsupported output format for {output_path}, expected .parquet or .csv")
+
+
+def extract_wc_matches(files=FILES, output_path=DEFAULT_OUTPUT, excel_path=None, workers=None):
+    workers = workers or min(len(files), os.cpu_count() or 1)
     all_matches = []
 
-    for file in FILES:
-        print(f"Parsing {file['path']}...")
-        with open(file["path"], "r", encoding="utf-8") as f:
-            html = f.read()
-        matches = parse_fixtures(html, file["limit"])
+    if workers > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(parse_file, files))
+    else:
+        results = [parse_file(file) for file in files]
+
+    # executor.map keeps input order, so the output is in FILES order.
+    for file, matches in zip(files, results):
         print(f"Extracted {len(matches)} matches from {file['path']}")
         all_matches.extend(matches)
 
     df = pd.DataFrame(all_matches)
-    df.to_excel("matches_to_rate.xlsx", index=False)
-    print(f"Total: {len(df)} matches → matches_to_rate.xlsx")
+    write_matches(df, output_path)
+    print(f"Total: {len(df)} matches → {output_path}")
+
+    if excel_path:
+        df.to_excel(excel_path, index=False)
+        print(f"Excel export → {excel_path}")
+
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse saved fbref fixture pages into a table of matches.")
+    parser.add_argument('files', nargs='*',
+                        help="HTML files, optionally as path:limit (default: FILES)")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Output .parquet or .csv")
+    parser.add_argument('--excel', default=None, metavar='XLSX_PATH',
+                        help="Also export an Excel sheet (needs openpyxl)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Parser processes (default: one per file, up to the CPU count)")
+    args = parser.parse_args()
+
+    files = parse_file_specs(args.files) if args.files else FILES
+    extract_wc_matches(files, output_path=args.output, excel_path=args.excel, workers=args.workers)
+
 
 if __name__ == "__main__":
-    extract_wc_matches()
\ No newline at end of file
+    main()
@@ -0,0 +1,45 @@
+"""
+extract/serve_fixtures.py
+
+Local stand-in for the Sofascore API: serves a fixture bundle recorded with
+`python -m extract.scrape <date> --record <bundle_dir>` (or the backfill's
+--record) over plain HTTP, matching requests on path and query.
+
+Point the direct engine at it to run extraction offline through real HTTP
+(connection handling included), instead of the in-process replay that
+--replay does:
+
+    python -m extract.serve_fixtures fixtures/2022-12-01 --port 8765
+    python -m extract.scrape 2022-12-01 --engine direct --api-origin http://127.0.0.1:8765 --no-cache
+
+Requests the bundle doesn't hold get a 404 and are listed on exit.
+"""
+
+import argparse
+import time
+
+from utils.fixture_bundle import FixtureBundle
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a recorded fixture bundle over HTTP.")
+    parser.add_argument('bundle_dir')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    with FixtureBundle(args.bundle_dir, mode="replay") as fixtures:
+        server = fixtures.serve(args.host, args.port)
+        print(f"Serving {args.bundle_dir} on http://{args.host}:{args.port} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
+            print(f"Stopped -- {fixtures.stats()}")
+
+
+if __name__ == "__main__":
+    main()
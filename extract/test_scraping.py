@@ -30,7 +30,8 @@ import os
 
 import pandas as pd
 
-from extract.scrape import get_todays_matches, MATCH_ENDPOINTS, get_data_from_match
+from extract.scrape import get_todays_matches, MATCH_ENDPOINTS, get_data_from_match, HEADLESS
+from utils.playwright_utils import BrowserPool
 from utils.pipeline_state import load_state
 from utils.logging_setup import setup_logger
 
@@ -59,7 +60,7 @@ def chunk_dates(dates, batch_size):
     return [dates[i:i + batch_size] for i in range(0, len(dates), batch_size)]
 
 
-async def process_date(date_str, tournaments):
+async def process_date(date_str, tournaments, pool=None):
     """
     Processes a single date: gets the match list, scrapes each match's
     detail data, and returns (by_date_row, endpoint_presence_rows) for
@@ -67,7 +68,7 @@ async def process_date(date_str, tournaments):
     """
     logger.info(f"process_date: processing date_str={date_str}")
     try:
-        matches_df = await get_todays_matches(target_date=date_str, tournaments=tournaments)
+        matches_df = await get_todays_matches(target_date=date_str, tournaments=tournaments, pool=pool)
     except Exception as e:
         logger.error(f"process_date: get_todays_matches failed for date_str={date_str} | {type(e).__name__}: {e}")
         by_date_row = {
@@ -85,7 +86,7 @@ async def process_date(date_str, tournaments):
     for _, row in matches_df.iterrows():
         event_id = row['event_id']
         try:
-            match_data = await get_data_from_match(event_id, row['slug'], row['custom_id'])
+            match_data = await get_data_from_match(event_id, row['slug'], row['custom_id'], pool=pool)
             n_success += 1
         except Exception as e:
             n_failed += 1
@@ -160,30 +161,31 @@ async def run_scrape_test(dates=None, tournaments=None, report_dir='reports',
     all_by_date_rows = []
     all_endpoint_presence_rows = []
 
-    for batch_num, batch_dates in enumerate(batches, start=1):
-        logger.info(f"run_scrape_test: starting batch {batch_num}/{len(batches)} -- dates: {batch_dates}")
+    async with BrowserPool(headless=HEADLESS) as pool:
+        for batch_num, batch_dates in enumerate(batches, start=1):
+            logger.info(f"run_scrape_test: starting batch {batch_num}/{len(batches)} -- dates: {batch_dates}")
 
-        batch_by_date_rows = []
-        batch_endpoint_presence_rows = []
+            batch_by_date_rows = []
+            batch_endpoint_presence_rows = []
 
-        for date_str in batch_dates:
-            by_date_row, endpoint_presence_rows = await process_date(date_str, tournaments)
-            batch_by_date_rows.append(by_date_row)
-            batch_endpoint_presence_rows.extend(endpoint_presence_rows)
+            for date_str in batch_dates:
+                by_date_row, endpoint_presence_rows = await process_date(date_str, tournaments, pool=pool)
+                batch_by_date_rows.append(by_date_row)
+                batch_endpoint_presence_rows.extend(endpoint_presence_rows)
 
-        all_by_date_rows.extend(batch_by_date_rows)
-        all_endpoint_presence_rows.extend(batch_endpoint_presence_rows)
+            all_by_date_rows.extend(batch_by_date_rows)
+            all_endpoint_presence_rows.extend(batch_endpoint_presence_rows)
 
-        batch_by_date_df = pd.DataFrame(batch_by_date_rows)
-        batch_by_endpoint_df = build_endpoint_summary(batch_endpoint_presence_rows)
-        save_reports(batch_by_date_df, batch_by_endpoint_df, report_dir, suffix=f'_batch{batch_num}')
+            batch_by_date_df = pd.DataFrame(batch_by_date_rows)
+            batch_by_endpoint_df = build_endpoint_summary(batch_endpoint_presence_rows)
+            save_reports(batch_by_date_df, batch_by_endpoint_df, report_dir, suffix=f'_batch{batch_num}')
 
-        logger.info(f"run_scrape_test: finished batch {batch_num}/{len(batches)}")
+            logger.info(f"run_scrape_test: finished batch {batch_num}/{len(batches)}")
 
-        is_last_batch = (batch_num == len(batches))
-        if not is_last_batch:
-            logger.info(f"run_scrape_test: pausing {batch_pause_seconds}s before next batch")
-            await asyncio.sleep(batch_pause_seconds)
+            is_last_batch = (batch_num == len(batches))
+            if not is_last_batch:
+                logger.info(f"run_scrape_test: pausing {batch_pause_seconds}s before next batch")
+                await asyncio.sleep(batch_pause_seconds)
 
     by_date_df = pd.DataFrame(all_by_date_rows)
     by_endpoint_df = build_endpoint_summary(all_endpoint_presence_rows)
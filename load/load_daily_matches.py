@@ -1,10 +1,29 @@
 # load/load_daily_matches.py
 import csv
+import time
+from utils import metrics
 from utils.connection import get_connection
 from utils.logging_setup import setup_logger
 
 logger = setup_logger("load", "logs/load.log")
 
+ROWS_LOADED = metrics.counter("load_rows_total", "Rows inserted into the database, by table")
+BATCH_SECONDS = metrics.histogram("load_batch_seconds", "Seconds per executemany + commit batch, by table")
+ROWS_PER_SECOND = metrics.gauge("load_rows_per_second", "Insert throughput of the last batch, by table")
+
+INSERT_MATCHES_SQL = "INSERT INTO matches (title, sofascore_link, fbref_link) VALUES (:1, :2, :3)"
+
+
+def _insert_batch(conn, cursor, rows, table="matches", sql=INSERT_MATCHES_SQL):
+    started = time.perf_counter()
+    cursor.executemany(sql, rows)
+    conn.commit()
+    elapsed = time.perf_counter() - started
+    BATCH_SECONDS.observe(elapsed, table=table)
+    ROWS_LOADED.inc(len(rows), table=table)
+    if elapsed > 0:
+        ROWS_PER_SECOND.set(len(rows) / elapsed, table=table)
+
 def load_daily_matches(csv_file="../matches.csv"):
     conn = get_connection()
     cursor = conn.cursor()
@@ -18,20 +37,12 @@ def load_daily_matches(csv_file="../matches.csv"):
             for row in reader:
                 rows.append((row["Title"], row["Sofascore_Link"], row["Fbref_Link"]))
                 if len(rows) >= batch_size:
-                    cursor.executemany(
-                        "INSERT INTO matches (title, sofascore_link, fbref_link) VALUES (:1, :2, :3)",
-                        rows
-                    )
-                    conn.commit()
+                    _insert_batch(conn, cursor, rows)
                     logger.info(f"Inserted batch of {len(rows)} rows")
                     rows = []
 
             if rows:
-                cursor.executemany(
-                    "INSERT INTO matches (title, sofascore_link, fbref_link) VALUES (:1, :2, :3)",
-                    rows
-                )
-                conn.commit()
+                _insert_batch(conn, cursor, rows)
                 logger.info(f"Inserted final batch of {len(rows)} rows")
                 
         open(csv_file, 'w').close()
@@ -43,3 +54,4 @@ def load_daily_matches(csv_file="../matches.csv"):
         cursor.close()
         conn.close()
         logger.info("Connection closed after loading daily matches")
+        metrics.write_textfile("load")
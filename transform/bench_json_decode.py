@@ -0,0 +1,98 @@
+"""
+transform/bench_json_decode.py
+
+Micro-benchmark -- NOT a unit test. Decodes every endpoint column
+(transform.JSON_COLUMNS) of one date's raw match_data file with each JSON
+backend available here (stdlib json, orjson when installed; see
+utils.json_utils) and reports, per endpoint and backend:
+
+    - matches decoded and total MB of JSON text
+    - mean / p95 decode time per match (microseconds)
+    - throughput (MB/s) and speedup over the stdlib
+
+Each value is decoded --repeat times and the fastest run is kept, so the
+numbers are decode cost alone, not file I/O or first-call effects. The
+table is printed and saved to <report-dir>/<date>/json_decode.csv.
+
+Usage:
+    python -m transform.bench_json_decode 2022-12-18
+    python -m transform.bench_json_decode 2022-12-18 --repeat 5 --csv-dir raw
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+import pandas as pd
+
+from transform.transform import JSON_COLUMNS
+from utils.json_utils import available_backends
+from utils.raw_format import find_match_data, match_data_path, read_match_data
+
+
+def bench_column(values, loads, repeat):
+    """Best-of-`repeat` decode seconds for each value."""
+    timings = []
+    for value in values:
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            loads(value)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        timings.append(best)
+    return timings
+
+
+def run_benchmark(date_str, csv_dir='raw', repeat=3, report_dir='reports'):
+    path = find_match_data(csv_dir, date_str) or match_data_path(csv_dir, date_str)
+    df = read_match_data(path, columns=['event_id', *JSON_COLUMNS])
+    backends = available_backends()
+    print(f"Decoding {len(df)} matches from {path} with backends: {', '.join(backends)}")
+
+    rows = []
+    for column in JSON_COLUMNS:
+        values = [v for v in df[column] if isinstance(v, str) and v]
+        n_bytes = sum(len(v.encode('utf-8')) for v in values)
+        baseline = None
+        for name, loads in backends.items():
+            timings = bench_column(values, loads, repeat)
+            total = sum(timings)
+            if name == 'json':
+                baseline = total
+            rows.append({
+                'endpoint': column,
+                'backend': name,
+                'matches': len(values),
+                'mb': round(n_bytes / 1024 ** 2, 2),
+                'mean_us': round(statistics.mean(timings) * 1e6, 1) if timings else None,
+                'p95_us': round(statistics.quantiles(timings, n=20)[-1] * 1e6, 1) if len(timings) > 1 else None,
+                'mb_per_s': round(n_bytes / 1024 ** 2 / total, 1) if total else None,
+                'speedup': round(baseline / total, 2) if baseline and total else None,
+            })
+
+    results_df = pd.DataFrame(rows)
+    print("\n=== JSON decode time per endpoint ===")
+    print(results_df.to_string(index=False))
+
+    out_dir = f"{report_dir}/{date_str}"
+    os.makedirs(out_dir, exist_ok=True)
+    results_df.to_csv(f"{out_dir}/json_decode.csv", index=False)
+    print(f"\nSaved {out_dir}/json_decode.csv")
+    return results_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON decoding of the raw match_data endpoint columns.")
+    parser.add_argument('date_str', help="Date of the raw match_data file, e.g. 2022-12-18")
+    parser.add_argument('--csv-dir', default='raw')
+    parser.add_argument('--repeat', type=int, default=3, help="Decodes per value; the fastest is kept")
+    parser.add_argument('--report-dir', default='reports')
+    args = parser.parse_args()
+
+    run_benchmark(args.date_str, csv_dir=args.csv_dir, repeat=args.repeat, report_dir=args.report_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""
+transform/bench_stats_long.py
+
+Benchmark -- NOT a unit test. Builds match_player_stats and
+match_team_stats for a synthetic input of --matches matches (10,000 by
+default) two ways and compares them:
+
+    - loop: the previous builders, one row dict per stat appended in
+      nested Python loops, then one DataFrame per table
+    - vectorized: transform.transform's staged rows (one per player /
+      statistics item) melted once per table by _player_stats_long and
+      _team_stats_long
+
+Both tables must come out identical (pd.testing.assert_frame_equal); the
+script fails otherwise. The synthetic lineups and statistics have the
+shape of Sofascore's: ~40 players a match with ~30 statistics each (plus
+the nested ratingVersions dict that is skipped), and ~50 statistics
+items per side, a third of them with homeTotal/awayTotal.
+
+Usage:
+    python -m transform.bench_stats_long
+    python -m transform.bench_stats_long --matches 2000 --seed 7
+"""
+
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from transform.transform import (
+    TABLE_COLUMNS,
+    _player_stats_long,
+    _player_stats_rows,
+    _team_stats_long,
+    _team_stats_rows,
+)
+
+PLAYER_STATS = [
+    'totalPass', 'accuratePass', 'totalLongBalls', 'accurateLongBalls', 'goodHighClaim', 'savedShotsFromInsideTheBox',
+    'saves', 'minutesPlayed', 'touches', 'rating', 'possessionLostCtrl', 'expectedGoals', 'expectedAssists',
+    'aerialLost', 'aerialWon', 'duelLost', 'duelWon', 'challengeLost', 'totalContest', 'wonContest', 'totalTackle',
+    'interceptionWon', 'totalClearance', 'outfielderBlock', 'fouls', 'wasFouled', 'totalCross', 'accurateCross',
+    'keyPass', 'onTargetScoringAttempt', 'shotOffTarget', 'blockedScoringAttempt', 'dispossessed', 'ballRecovery',
+]
+STAT_GROUPS = {
+    'Match overview': ['Ball possession', 'Expected goals', 'Big chances', 'Total shots', 'Goalkeeper saves',
+                       'Corner kicks', 'Fouls', 'Passes', 'Tackles', 'Free kicks'],
+    'Shots': ['Total shots', 'Shots on target', 'Hit woodwork', 'Shots off target', 'Blocked shots',
+              'Shots inside box', 'Shots outside box'],
+    'Attack': ['Big chances scored', 'Big chances missed', 'Through balls', 'Touches in penalty area',
+               'Fouled in final third', 'Offsides'],
+    'Passes': ['Accurate passes', 'Throw-ins', 'Final third entries', 'Final third phase', 'Long balls', 'Crosses'],
+    'Duels': ['Duels', 'Dispossessed', 'Ground duels', 'Aerial duels', 'Dribbles'],
+    'Defending': ['Tackles won', 'Total tackles', 'Interceptions', 'Recoveries', 'Clearances', 'Errors lead to a shot'],
+    'Goalkeeping': ['Total saves', 'Goals prevented', 'High claims', 'Punches', 'Goal kicks'],
+}
+
+
+# ---------------------------------------------------------------------------
+# Synthetic input
+# ---------------------------------------------------------------------------
+
+def make_players(rng, team_id, n_players=20):
+    players = []
+    for i in range(n_players):
+        player = {'IdPlayer': rng.randint(1, 50_000), 'teamId': team_id}
+        if i < 16:
+            stats = {label: rng.randint(0, 90) for label in rng.sample(PLAYER_STATS, rng.randint(20, 30))}
+            stats['rating'] = round(rng.uniform(5.5, 9.5), 1)
+            stats['ratingVersions'] = {'original': stats['rating'], 'alternative': stats['rating'] - 0.1}
+            player['statistics'] = stats
+        players.append(player)
+    return players
+
+
+def make_groups(rng):
+    groups = []
+    for group_name, names in STAT_GROUPS.items():
+        items = []
+        for k, name in enumerate(names):
+            item = {'name': name, 'home': '1', 'away': '2', 'compareCode': 1}
+            if k % 3 == 0:
+                item.update(homeValue=rng.randint(0, 40), awayValue=rng.randint(0, 40),
+                            homeTotal=rng.randint(40, 80), awayTotal=rng.randint(40, 80))
+            else:
+                item.update(homeValue=rng.randint(0, 600), awayValue=round(rng.uniform(0, 3), 2))
+            items.append(item)
+        groups.append({'groupName': group_name, 'statisticsItems': items})
+    return groups
+
+
+def make_matches(n_matches, seed=0):
+    rng = random.Random(seed)
+    matches = []
+    for i in range(n_matches):
+        home_id, away_id = rng.sample(range(4000, 4100), 2)
+        matches.append({
+            'event_id': 10_000_000 + i,
+            'home_team_id': home_id,
+            'away_team_id': away_id,
+            'home_players': make_players(rng, home_id),
+            'away_players': make_players(rng, away_id),
+            'groups': make_groups(rng),
+        })
+    return matches
+
+
+# ---------------------------------------------------------------------------
+# Reference: the previous row-per-stat loops
+# ---------------------------------------------------------------------------
+
+def loop_player_stats_long(players, event_id):
+    rows = []
+    for player in players:
+        stats_dict = player.get('statistics')
+        if not isinstance(stats_dict, dict):
+            continue
+        player_id = player['IdPlayer']
+        team_id = player.get('teamId')
+        for stat_label, stat_value in stats_dict.items():
+            if isinstance(stat_value, dict):
+                continue
+            rows.append({'eventId': event_id, 'teamId': team_id, 'playerId': player_id,
+                         'stat_label': stat_label, 'stat_value': stat_value})
+    return rows
+
+
+def loop_team_stats_long(groups, side, event_id, team_id):
+    value_key = f'{side}Value'
+    total_key = f'{side}Total'
+    rows = []
+    for group in groups:
+        group_name = group['groupName']
+        for item in group['statisticsItems']:
+            name = item['name']
+            if total_key in item:
+                rows.append({'event_id': event_id, 'team_id': team_id,
+                             'stat_name': f'Successful {group_name} {name}', 'stat_value': item[value_key]})
+                rows.append({'event_id': event_id, 'team_id': team_id,
+                             'stat_name': f'Total {group_name} {name}', 'stat_value': item[total_key]})
+            else:
+                rows.append({'event_id': event_id, 'team_id': team_id,
+                             'stat_name': f'{group_name} {name}', 'stat_value': item[value_key]})
+    return rows
+
+
+def build_with_loops(matches):
+    player_rows, team_rows = [], []
+    for match in matches:
+        event_id = match['event_id']
+        player_rows += loop_player_stats_long(match['home_players'], event_id)
+        player_rows += loop_player_stats_long(match['away_players'], event_id)
+        team_rows += loop_team_stats_long(match['groups'], 'home', event_id, match['home_team_id'])
+        team_rows += loop_team_stats_long(match['groups'], 'away', event_id, match['away_team_id'])
+    return (pd.DataFrame(player_rows, columns=TABLE_COLUMNS['match_player_stats']),
+            pd.DataFrame(team_rows, columns=TABLE_COLUMNS['match_team_stats']))
+
+
+def build_vectorized(matches):
+    player_rows, team_rows = [], []
+    for match in matches:
+        event_id = match['event_id']
+        player_rows += _player_stats_rows(match['home_players'], event_id)
+        player_rows += _player_stats_rows(match['away_players'], event_id)
+        team_rows += _team_stats_rows(match['groups'], 'home', event_id, match['home_team_id'])
+        team_rows += _team_stats_rows(match['groups'], 'away', event_id, match['away_team_id'])
+    return _player_stats_long(player_rows), _team_stats_long(team_rows)
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the long-format player/team stats builders.")
+    parser.add_argument('--matches', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"Generating {args.matches} synthetic matches...")
+    matches = make_matches(args.matches, seed=args.seed)
+
+    (loop_players, loop_teams), loop_seconds = timed(build_with_loops, matches)
+    (vec_players, vec_teams), vec_seconds = timed(build_vectorized, matches)
+
+    pd.testing.assert_frame_equal(loop_players, vec_players)
+    pd.testing.assert_frame_equal(loop_teams, vec_teams)
+
+    print(f"\nmatch_player_stats: {len(vec_players)} rows, match_team_stats: {len(vec_teams)} rows (identical)")
+    print(f"  loop:       {loop_seconds:.2f}s")
+    print(f"  vectorized: {vec_seconds:.2f}s  ({loop_seconds / vec_seconds:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,50 @@
 """
 transform/run_world_cup_transform.py
 
-Production driver: runs transform.transform_csv(date_str) for a fixed list
-of dates (the same World Cup backfill dates used by
-extract/run_world_cup_backfill.py).
-
-No batching/pauses -- transform_csv is purely local (reads raw CSVs, writes
-parquet files), so there's no need to be gentle the way the network-bound
-scrape backfill is. Runs straight through all dates.
-
-If a date's raw CSV doesn't exist yet (e.g. that date's scrape hasn't run
-or failed entirely), that date is skipped gracefully: logged, and the loop
-continues to the next date.
+Production driver: runs transform.transform_csv(date_str) for a list of
+dates (the World Cup backfill DATES used by extract/run_world_cup_backfill.py
+by default, or any dates/ranges given on the CLI).
+
+No batching/pauses -- transform_csv is purely local (reads raw match data,
+writes parquet files), so there's no need to be gentle the way the
+network-bound scrape backfill is. Dates run concurrently in a process pool
+(--workers), each date in its own worker process. --max-memory-mb caps
+every worker's address space (RLIMIT_AS), so one oversized date fails with
+a MemoryError instead of dragging the machine into swap.
+
+Workers never touch state/pipeline_state.csv: each date's per-match
+outcomes are returned to the parent, which is the single writer -- it
+applies them to one in-memory state and saves it after every finished
+date, so concurrent dates never overwrite each other's state updates.
+Worker metrics are merged the same way and written to
+metrics/transform.prom.
+
+If a date's raw match data (CSV or parquet) doesn't exist yet (e.g. that
+date's scrape hasn't run or failed entirely), that date is skipped
+gracefully: logged, and the remaining dates still run.
 
 Usage:
     python -m transform.run_world_cup_transform
+    python -m transform.run_world_cup_transform --dates 2022-11-20:2022-12-18 2026-06-11:2026-06-16
+    python -m transform.run_world_cup_transform --workers 8 --max-memory-mb 4096
 """
 
+import argparse
 import os
+import resource
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from transform.transform import transform_csv
+from utils import metrics
+from utils.date_utils import expand_date_specs
+from utils.pipeline_state import load_state, save_state, update_transform_states
+from utils.raw_format import find_match_data
 from utils.logging_setup import setup_logger
 
 logger = setup_logger("run_world_cup_transform", "logs/run_world_cup_transform.log")
 
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
 DATES = [
     '2022-11-20', '2022-11-21', '2022-11-22', '2022-11-23', '2022-11-24',
     '2022-11-25', '2022-11-26', '2022-11-27', '2022-11-28', '2022-11-29',
@@ -34,36 +55,111 @@ DATES = [
 ]
 
 
-def run_transform_backfill(dates=None, csv_dir='raw', output_dir='processed'):
+def _limit_memory(max_memory_mb):
+    # Process pool initializer: caps the worker's address space, so a date
+    # that outgrows it raises MemoryError inside transform_csv.
+    limit = max_memory_mb * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _transform_date(date_str, csv_dir, output_dir):
+    """
+    Runs transform_csv for one date, collecting its per-match outcomes
+    instead of writing them to the state file, and leaving the metrics
+    textfile to the parent (a worker's would overwrite the merged one).
+    Returns a result dict with the date's status and those outcomes.
+    """
+    outcomes = []
+    try:
+        transform_csv(date_str, csv_dir=csv_dir, output_dir=output_dir, state_writer=outcomes.extend,
+                      metrics_writer=lambda: None)
+        return {'date': date_str, 'status': 'success', 'error': None, 'outcomes': outcomes}
+    except Exception as e:
+        return {'date': date_str, 'status': 'failed', 'error': f"{type(e).__name__}: {e}", 'outcomes': outcomes}
+
+
+def _transform_date_worker(date_str, csv_dir, output_dir):
+    # Runs in a worker process: starts from clean metrics and ships this
+    # date's metrics back with the result, for the parent to merge.
+    metrics.drain(prefix="transform_")
+    result = _transform_date(date_str, csv_dir, output_dir)
+    result['metrics'] = metrics.drain(prefix="transform_")
+    return result
+
+
+def run_transform_backfill(dates=None, csv_dir='raw', output_dir='processed', workers=DEFAULT_WORKERS,
+                           max_memory_mb=None):
     """
     Runs transform_csv(date_str, csv_dir, output_dir) for every date in
-    `dates`, straight through. A date whose raw CSV doesn't exist is
-    skipped (logged, not a hard failure). A date that fails for any other
-    reason is also logged and does not stop the remaining dates.
+    `dates`, up to `workers` dates at a time, each in its own process
+    (workers=1 runs them one after another in this process). A date with
+    no raw match data is skipped (logged, not a hard failure). A date that
+    fails for any other reason -- including a worker hitting the
+    max_memory_mb ceiling or dying outright -- is also logged and does not
+    stop the remaining dates.
+
+    This process is the only writer of the pipeline state: every finished
+    date's match outcomes are applied and saved as soon as it completes.
     """
     dates = dates if dates is not None else DATES
 
-    logger.info(f"run_transform_backfill: starting for {len(dates)} dates")
+    logger.info(f"run_transform_backfill: starting for {len(dates)} dates with workers={workers}, "
+                f"max_memory_mb={max_memory_mb}")
 
-    results = []
+    results = {}
+    pending = []
 
     for date_str in dates:
-        csv_path = f"{csv_dir}/{date_str}_match_data.csv"
-
-        if not os.path.exists(csv_path):
-            logger.warning(f"run_transform_backfill: skipping date_str={date_str} -- raw CSV not found at {csv_path}")
-            results.append({'date': date_str, 'status': 'skipped', 'error': f"raw CSV not found: {csv_path}"})
-            continue
-
-        logger.info(f"run_transform_backfill: running transform_csv for date_str={date_str}")
-        try:
-            transform_csv(date_str, csv_dir=csv_dir, output_dir=output_dir)
-            results.append({'date': date_str, 'status': 'success', 'error': None})
+        csv_path = find_match_data(csv_dir, date_str)
+
+        if csv_path is None:
+            logger.warning(f"run_transform_backfill: skipping date_str={date_str} -- no raw match data in {csv_dir}")
+            results[date_str] = {'date': date_str, 'status': 'skipped', 'error': f"raw match data not found in {csv_dir}"}
+        else:
+            pending.append(date_str)
+
+    state_df = load_state()
+
+    def record(result):
+        nonlocal state_df
+        date_str = result['date']
+        results[date_str] = result
+        metrics.merge(result.pop('metrics', {}))
+        state_df = update_transform_states(state_df, result.pop('outcomes'))
+        save_state(state_df)
+        metrics.write_textfile("transform")
+        if result['status'] == 'success':
             logger.info(f"run_transform_backfill: succeeded for date_str={date_str}")
-        except Exception as e:
-            error_message = f"{type(e).__name__}: {e}"
-            results.append({'date': date_str, 'status': 'failed', 'error': error_message})
-            logger.error(f"run_transform_backfill: failed for date_str={date_str} | {error_message}")
+        else:
+            logger.error(f"run_transform_backfill: failed for date_str={date_str} | {result['error']}")
+
+    if workers > 1 and len(pending) > 1:
+        initializer, initargs = (_limit_memory, (max_memory_mb,)) if max_memory_mb else (None, ())
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)),
+                                 initializer=initializer, initargs=initargs) as executor:
+            futures = {executor.submit(_transform_date_worker, date_str, csv_dir, output_dir): date_str
+                       for date_str in pending}
+            for future in as_completed(futures):
+                date_str = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # The worker itself died (e.g. killed for memory); its
+                    # matches keep their previous state.
+                    result = {'date': date_str, 'status': 'failed', 'error': f"{type(e).__name__}: {e}",
+                              'outcomes': []}
+                record(result)
+    else:
+        if max_memory_mb:
+            logger.warning("run_transform_backfill: max_memory_mb only applies to worker processes (workers > 1)")
+        for date_str in pending:
+            logger.info(f"run_transform_backfill: running transform_csv for date_str={date_str}")
+            record(_transform_date(date_str, csv_dir, output_dir))
+
+    results = [results[date_str] for date_str in dates]
 
     n_success = sum(1 for r in results if r['status'] == 'success')
     n_failed = sum(1 for r in results if r['status'] == 'failed')
@@ -79,8 +175,21 @@ def run_transform_backfill(dates=None, csv_dir='raw', output_dir='processed'):
 
 
 def main():
-    run_transform_backfill(dates=DATES)
+    parser = argparse.ArgumentParser(description="Transform raw match data for World Cup dates.")
+    parser.add_argument('--dates', nargs='+', default=None,
+                        help="Dates or inclusive ranges, e.g. 2022-11-20 2022-11-30:2022-12-18 (default: DATES)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help="Dates transformed at once, one process each")
+    parser.add_argument('--max-memory-mb', type=int, default=None,
+                        help="Address-space ceiling per worker process, in MB (default: no limit)")
+    parser.add_argument('--csv-dir', default='raw')
+    parser.add_argument('--output-dir', default='processed')
+    args = parser.parse_args()
+
+    dates = expand_date_specs(args.dates) if args.dates else DATES
+    run_transform_backfill(dates=dates, csv_dir=args.csv_dir, output_dir=args.output_dir,
+                           workers=args.workers, max_memory_mb=args.max_memory_mb)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -5,9 +5,13 @@ import traceback
 import pandas as pd
 
 from transform.transform import (
+    TABLE_COLUMNS,
     PlayerRegistry,
+    build_tables,
+    iter_records,
     transform_row,
 )
+from utils.raw_format import find_match_data, match_data_path, read_match_data
 
 
 def profile_table(name, df):
@@ -56,25 +60,18 @@ def transform_csv_with_profiling(date_str, csv_dir='raw', output_dir='processed'
       errors_df: DataFrame of every row-level exception encountered
       profiles: dict of table_name -> profile summary DataFrame
     """
-    csv_path = f"{csv_dir}/{date_str}_match_data.csv"
-    df = pd.read_csv(csv_path)
+    csv_path = find_match_data(csv_dir, date_str) or match_data_path(csv_dir, date_str)
+    df = read_match_data(csv_path)
 
     registry = PlayerRegistry()
-
-    accumulated = {
-        'match': [], 'team': [], 'match_team': [], 'match_team_stats': [],
-        'match_players': [], 'match_player_stats': [],
-        'goals': [], 'cards': [], 'substitutions': [], 'passing_network': [], 'highlights': [],
-        'shotmaps': [],
-    }
+    accumulated = {table_name: [] for table_name in TABLE_COLUMNS}
 
     errors = []
 
-    for i in range(len(df)):
-        row = df.iloc[[i]]
-        event_id = row['event_id'].iloc[0] if 'event_id' in row.columns else None
+    for i, record in enumerate(iter_records(df)):
+        event_id = record.get('event_id')
         try:
-            tables = transform_row(row, registry)
+            tables = transform_row(record, registry)
         except Exception as e:
             errors.append({
                 'row_index': i,
@@ -86,20 +83,10 @@ def transform_csv_with_profiling(date_str, csv_dir='raw', output_dir='processed'
             print(f"[ERROR] row_index={i} event_id={event_id} | {type(e).__name__}: {e}")
             continue
 
-        for table_name, table_df in tables.items():
-            accumulated[table_name].append(table_df)
-
-    final_tables = {}
-    for table_name, frames in accumulated.items():
-        if frames:
-            combined = pd.concat(frames, ignore_index=True)
-        else:
-            combined = pd.DataFrame()
-        if table_name == 'team':
-            combined = combined.drop_duplicates(subset='team_id').reset_index(drop=True)
-        final_tables[table_name] = combined
+        for table_name, rows in tables.items():
+            accumulated[table_name].extend(rows)
 
-    final_tables['players'] = registry.to_dataframe()
+    final_tables = build_tables(accumulated, registry)
 
     # --- Profiling: build + print + collect for saving ---
     profiles = {}
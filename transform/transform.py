@@ -1,15 +1,28 @@
-import json
 import os
+import numpy as np
 import pandas as pd
 import argparse
 import tempfile
 import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import chain, repeat
 pd.set_option('future.no_silent_downcasting', True)
-from utils.pipeline_state import load_state, save_state, update_transform_state
+from utils import json_utils, metrics
+from utils.pipeline_state import load_state, save_state, update_transform_states
 from utils.logging_setup import setup_logger
+from utils.raw_format import find_match_data, match_data_path, read_match_data
 
 logger = setup_logger("transform", "logs/transform.log")
 
+EVENTS_TRANSFORMED = metrics.counter("transform_events_total", "Matches transformed, by status")
+EVENT_SECONDS = metrics.histogram("transform_event_seconds", "Seconds to transform one match",
+                                  buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+DECODE_SECONDS = metrics.histogram("transform_json_decode_seconds", "Seconds to decode one endpoint column, by endpoint",
+                                   buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
+OUTPUT_ROWS = metrics.counter("transform_output_rows_total", "Rows written per output table, by table")
+
 # ---------------------------------------------------------------------------
 # Player identity extraction + registry
 # ---------------------------------------------------------------------------
@@ -66,52 +79,163 @@ class PlayerRegistry:
 
         return player_id
 
+    def merge(self, other):
+        """
+        Adds the players of another registry (e.g. a worker's) that are not
+        registered here yet, in the other registry's order. Merging the
+        registries of consecutive record shards in shard order therefore
+        gives the same players, in the same order, as one registry fed every
+        record: the first occurrence of a player wins.
+        """
+        for identity_row in other._identity_rows:
+            player_id = identity_row['IdPlayer']
+            if player_id not in self._seen_ids:
+                self._seen_ids.add(player_id)
+                self._identity_rows.append(identity_row)
+
     def to_dataframe(self):
         if not self._identity_rows:
             return pd.DataFrame(columns=['IdPlayer', 'Name', 'Country',
                                           'marketValue', 'dateOfBirth', 'height'])
         return pd.DataFrame(self._identity_rows).reset_index(drop=True)
 
+# ---------------------------------------------------------------------------
+# Output tables: every helper below works on one match's MatchPayload and
+# returns plain row dicts; DataFrames are only built once per table, for all
+# matches, in build_tables.
+# ---------------------------------------------------------------------------
+
+TABLE_COLUMNS = {
+    'match': ['event_id', 'competition', 'kickoff', 'home_team_id', 'away_team_id', 'home_score', 'away_score',
+              'slug', 'custom_id', 'sofascore_link', 'full_highlight_url'],
+    'team': ['team_id', 'teamName'],
+    'match_team': ['event_id', 'team_id', 'isHome', 'score', 'formation'],
+    'match_team_stats': ['event_id', 'team_id', 'stat_name', 'stat_value'],
+    'match_players': ['event_id', 'IdPlayer', 'teamId', 'jerseyNumber', 'position', 'substitute', 'captain',
+                      'averageX', 'averageY'],
+    'match_player_stats': ['eventId', 'teamId', 'playerId', 'stat_label', 'stat_value'],
+    'goals': ['event_id', 'goal_id', 'isHome', 'homeScore', 'awayScore', 'time', 'addedTime', 'hasAssist',
+              'player_id', 'assist1_id', 'team_id'],
+    'cards': ['event_id', 'card_id', 'isHome', 'incidentClass', 'time', 'addedTime', 'player_id', 'team_id'],
+    'substitutions': ['event_id', 'sub_id', 'isHome', 'injury', 'time', 'addedTime', 'playerIn_id',
+                      'playerOut_id', 'team_id'],
+    'passing_network': ['event_id', 'goal_id', 'playerId', 'type', 'order', 'player_coordinates',
+                        'action_coordinates', 'team_id', 'has_action_coordinates'],
+    'highlights': ['event_id', 'title', 'subtitle', 'url', 'createdAtTimestamp'],
+    'shotmaps': ['eventId', 'playerId', 'teamId', 'shotType', 'situation', 'playerCoordinates',
+                 'bodyPart', 'goalMouthLocation', 'goalMouthCoordinates',
+                 'blockCoordinates', 'xg', 'xgot', 'goalkeeperId', 'time', 'addedTime'],
+}
+
+# Columns whose values can be missing for some rows: fixed dtypes, so a
+# table's parquet schema doesn't depend on which matches a date happens to
+# contain. Everything else is inferred from the values.
+TABLE_DTYPES = {
+    'match_players': {'substitute': bool, 'captain': bool, 'averageX': 'float64', 'averageY': 'float64'},
+    'goals': {'goal_id': 'Int64', 'homeScore': 'float64', 'awayScore': 'float64', 'addedTime': 'float64',
+              'player_id': 'Int64', 'assist1_id': 'Int64'},
+    'cards': {'card_id': 'Int64', 'addedTime': 'float64', 'player_id': 'Int64'},
+    'substitutions': {'sub_id': 'Int64', 'addedTime': 'float64'},
+    'passing_network': {'has_action_coordinates': bool},
+    'shotmaps': {'xg': 'float64', 'xgot': 'float64', 'goalkeeperId': 'Int64', 'addedTime': 'float64'},
+}
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def _team_id(is_home, home_team_id, away_team_id):
+    if is_home is True:
+        return home_team_id
+    if is_home is False:
+        return away_team_id
+    return None
+
+# ---------------------------------------------------------------------------
+# Parsed match payload
+# ---------------------------------------------------------------------------
+
+# match_data columns holding an endpoint's raw JSON text.
+JSON_COLUMNS = ('incidents', 'lineups', 'average_positions', 'statistics', 'shotmap', 'highlights')
+
+
+class MatchPayload:
+    """
+    One match_data record whose endpoint columns (JSON_COLUMNS) are
+    decoded on first access, with utils.json_utils.loads, and then shared
+    by every table builder: payload['lineups'] is the decoded lineups
+    JSON, payload['event_id'] the plain column value.
+
+    A missing (empty) endpoint column, or one that fails to decode,
+    raises on access -- every time, without decoding again. has() tells
+    whether a column has any data at all.
+    """
+
+    def __init__(self, record):
+        self.record = record
+        self._decoded = {}
+
+    def has(self, column):
+        return not _is_missing(self.record.get(column))
+
+    def get(self, column, default=None):
+        try:
+            return self[column]
+        except Exception:
+            return default
+
+    def __getitem__(self, column):
+        if column not in JSON_COLUMNS:
+            return self.record[column]
+        if column not in self._decoded:
+            raw = self.record.get(column)
+            try:
+                if _is_missing(raw):
+                    raise ValueError(f"no {column} data")
+                with DECODE_SECONDS.time(endpoint=column):
+                    self._decoded[column] = (json_utils.loads(raw), None)
+            except Exception as e:
+                self._decoded[column] = (None, e)
+        value, error = self._decoded[column]
+        if error is not None:
+            raise error
+        return value
+
 # ---------------------------------------------------------------------------
 # match
 # ---------------------------------------------------------------------------
 
-def get_full_highlight(raw, event_id):
+def get_full_highlight(payload, event_id):
     try:
-        highlights_raw = raw['highlights'].iloc[0]
-        if pd.isna(highlights_raw):
-            return None
-        highlights_json = json.loads(highlights_raw)
-        highlights_df = pd.DataFrame(highlights_json['highlights'].tolist()
-                                      if hasattr(highlights_json['highlights'], 'tolist')
-                                      else highlights_json['highlights'])
-        if highlights_df.empty or 'keyHighlight' not in highlights_df.columns:
+        if not payload.has('highlights'):
             return None
-        key_rows = highlights_df.loc[highlights_df['keyHighlight'] == True, 'url']
-        if key_rows.empty:
-            return None
-        return key_rows.iloc[0]
+        highlights = payload['highlights']['highlights']
+        for highlight in highlights:
+            if highlight.get('keyHighlight') == True:
+                return highlight.get('url')
+        return None
     except Exception as e:
         logger.warning(f"get_full_highlight: failed to parse highlights for event_id={event_id}, returning None | {type(e).__name__}: {e}")
-        return None        
+        return None
 
 
-def get_match_table(row):
-    event_id = row['event_id'].iloc[0]
+def get_match_table(payload):
+    event_id = payload['event_id']
     try:
-        result = pd.DataFrame([{
+        result = [{
             'event_id': event_id,
-            'competition': row['competition'].iloc[0],
-            'kickoff': row['kickoff'].iloc[0],
-            'home_team_id': row['home_team_id'].iloc[0],
-            'away_team_id': row['away_team_id'].iloc[0],
-            'home_score': row['home_score'].iloc[0],
-            'away_score': row['away_score'].iloc[0],
-            'slug': row['slug'].iloc[0],
-            'custom_id': row['custom_id'].iloc[0],
-            'sofascore_link': row['sofascore_link'].iloc[0],
-            'full_highlight_url': get_full_highlight(row, event_id),
-        }])
+            'competition': payload['competition'],
+            'kickoff': payload['kickoff'],
+            'home_team_id': payload['home_team_id'],
+            'away_team_id': payload['away_team_id'],
+            'home_score': payload['home_score'],
+            'away_score': payload['away_score'],
+            'slug': payload['slug'],
+            'custom_id': payload['custom_id'],
+            'sofascore_link': payload['sofascore_link'],
+            'full_highlight_url': get_full_highlight(payload, event_id),
+        }]
         logger.info(f"get_match_table: succeeded for event_id={event_id}")
         return result
     except Exception as e:
@@ -123,46 +247,87 @@ def get_match_table(row):
 # ---------------------------------------------------------------------------
 
 def get_team(team_id, team_name):
-    return pd.DataFrame([{'team_id': team_id, 'teamName': team_name}])
+    return {'team_id': team_id, 'teamName': team_name}
 
 # ---------------------------------------------------------------------------
-# lineups -> meta-only home/away player frames + long player stats
+# lineups -> meta-only home/away player rows + long player stats
 # ---------------------------------------------------------------------------
 
-def _get_lineups_players(row, registry):
-    event_id = row['event_id'].iloc[0]
+def _player_stats_rows(players, event_id):
+    """
+    One row per player with statistics, carrying the whole statistics
+    dict; _player_stats_long melts them into match_player_stats once for
+    all matches.
+    """
+    rows = []
+    for player in players:
+        stats_dict = player.get('statistics')
+        if not isinstance(stats_dict, dict):
+            continue
+        rows.append({'eventId': event_id, 'teamId': player.get('teamId'), 'playerId': player['IdPlayer'],
+                     'statistics': stats_dict})
+    return rows
+
+
+def _infer_columns(df, columns):
+    # Object columns -> the dtype pandas would have inferred building the
+    # table from row dicts (e.g. ints + None -> float64).
+    for column in columns:
+        df[column] = df[column].infer_objects()
+    return df
+
+
+def _player_stats_long(rows):
+    """
+    match_player_stats from _player_stats_rows: each player's statistics
+    dict is flattened into one (stat_label, stat_value) row per stat, in
+    dict order, skipping nested-dict stats (e.g. ratingVersions) -- not
+    useful for ML. Labels and values of all players are flattened into
+    two arrays in one pass, and the player columns are repeated alongside.
+    """
+    columns = TABLE_COLUMNS['match_player_stats']
+    if not rows:
+        return pd.DataFrame(columns=columns)
+
+    stats_dicts = [row['statistics'] for row in rows]
+    counts = np.fromiter(map(len, stats_dicts), dtype=np.intp, count=len(stats_dicts))
+    n_stats = int(counts.sum())
+    labels = np.fromiter(chain.from_iterable(stats_dicts), dtype=object, count=n_stats)
+    values = np.fromiter(chain.from_iterable(map(dict.values, stats_dicts)), dtype=object, count=n_stats)
+    keep = ~np.fromiter(map(isinstance, values, repeat(dict)), dtype=bool, count=n_stats)
+
+    # The player columns are built, and their dtypes inferred, from the
+    # players that keep at least one stat, then repeated once per kept stat.
+    kept_counts = np.bincount(np.repeat(np.arange(len(rows)), counts)[keep], minlength=len(rows))
+    has_stats = kept_counts > 0
+    kept_rows = [row for row, kept in zip(rows, has_stats) if kept]
+    long_df = pd.DataFrame(kept_rows, columns=['eventId', 'teamId', 'playerId'])
+    long_df = long_df.loc[long_df.index.repeat(kept_counts[has_stats])].reset_index(drop=True)
+    long_df['stat_label'] = labels[keep]
+    long_df['stat_value'] = values[keep]
+    return _infer_columns(long_df, ['stat_value'])
+
+
+def _get_lineups_players(payload, registry):
+    event_id = payload['event_id']
     try:
-        lineups = json.loads(row["lineups"].iloc[0])
-        lineups = pd.DataFrame(lineups)
+        lineups = payload["lineups"]
 
         formations = {
-            'home': lineups.loc['formation', 'home'],
-            'away': lineups.loc['formation', 'away'],
+            'home': lineups['home'].get('formation'),
+            'away': lineups['away'].get('formation'),
         }
 
-        home_players = pd.DataFrame(lineups.loc['players', 'home'])
-        away_players = pd.DataFrame(lineups.loc['players', 'away'])
+        home_players = [dict(p) for p in lineups['home']['players']]
+        away_players = [dict(p) for p in lineups['away']['players']]
 
-        home_players['IdPlayer'] = home_players['player'].apply(registry.get_or_add)
-        away_players['IdPlayer'] = away_players['player'].apply(registry.get_or_add)
+        for player in home_players:
+            player['IdPlayer'] = registry.get_or_add(player.get('player'))
+        for player in away_players:
+            player['IdPlayer'] = registry.get_or_add(player.get('player'))
 
-        def build_stats_long(players_df, event_id):
-            rows = []
-            for player_id, team_id, stats_dict in zip(players_df['IdPlayer'], players_df['teamId'], players_df['statistics']):
-                if not isinstance(stats_dict, dict):
-                    continue
-                for stat_label, stat_value in stats_dict.items():
-                    if isinstance(stat_value, dict):
-                        continue  # skip nested-dict stats (e.g. ratingVersions) -- not useful for ML
-                    rows.append({'eventId': event_id, 'teamId': team_id, 'playerId': player_id,
-                                 'stat_label': stat_label, 'stat_value': stat_value})
-            return pd.DataFrame(rows, columns=['eventId', 'teamId', 'playerId', 'stat_label', 'stat_value'])
-
-        home_players_stats = build_stats_long(home_players, event_id)
-        away_players_stats = build_stats_long(away_players, event_id)
-
-        home_players = home_players.drop(columns=['statistics', 'player'])
-        away_players = away_players.drop(columns=['statistics', 'player'])
+        home_players_stats = _player_stats_rows(home_players, event_id)
+        away_players_stats = _player_stats_rows(away_players, event_id)
 
         return home_players, home_players_stats, away_players, away_players_stats, formations
     except Exception as e:
@@ -175,30 +340,25 @@ def _get_lineups_players(row, registry):
 # separately in match_team_stats, kept long for ML/reporting flexibility)
 # ---------------------------------------------------------------------------
 
-def get_match_team(row, formations):
-    event_id = row['event_id'].iloc[0]
+def get_match_team(payload, formations):
+    event_id = payload['event_id']
     try:
-        home_team_id = row['home_team_id'].iloc[0]
-        away_team_id = row['away_team_id'].iloc[0]
-        home_score = row['home_score'].iloc[0]
-        away_score = row['away_score'].iloc[0]
-
-        return pd.DataFrame([
+        return [
             {
                 'event_id': event_id,
-                'team_id': home_team_id,
+                'team_id': payload['home_team_id'],
                 'isHome': True,
-                'score': home_score,
+                'score': payload['home_score'],
                 'formation': formations['home'],
             },
             {
                 'event_id': event_id,
-                'team_id': away_team_id,
+                'team_id': payload['away_team_id'],
                 'isHome': False,
-                'score': away_score,
+                'score': payload['away_score'],
                 'formation': formations['away'],
             },
-        ])
+        ]
     except Exception as e:
         logger.error(f"get_match_team: failed for event_id={event_id} | {type(e).__name__}: {e}")
         raise
@@ -207,48 +367,66 @@ def get_match_team(row, formations):
 # match_team_stats (long format: event_id, team_id, stat_name, stat_value)
 # ---------------------------------------------------------------------------
 
-def _build_team_stats_long(groups, side, event_id, team_id):
+def _team_stats_rows(groups, side, event_id, team_id):
+    """
+    One row per statistics item for one side, with its raw value and (for
+    items carrying <side>Total) total; _team_stats_long turns them into
+    match_team_stats once for all matches.
+    """
     value_key = f'{side}Value'
     total_key = f'{side}Total'
     rows = []
     for group in groups:
         group_name = group['groupName']
         for item in group['statisticsItems']:
-            name = item['name']
-            if total_key in item:
-                rows.append({
-                    'event_id': event_id, 'team_id': team_id,
-                    'stat_name': f'Successful {group_name} {name}',
-                    'stat_value': item[value_key],
-                })
-                rows.append({
-                    'event_id': event_id, 'team_id': team_id,
-                    'stat_name': f'Total {group_name} {name}',
-                    'stat_value': item[total_key],
-                })
-            else:
-                rows.append({
-                    'event_id': event_id, 'team_id': team_id,
-                    'stat_name': f'{group_name} {name}',
-                    'stat_value': item[value_key],
-                })
-    return pd.DataFrame(rows)
-
-
-def get_match_team_stats(row):
-    event_id = row['event_id'].iloc[0]
+            has_total = total_key in item
+            rows.append({'event_id': event_id, 'team_id': team_id, 'group': group_name, 'name': item['name'],
+                         'value': item[value_key], 'total': item[total_key] if has_total else None,
+                         'has_total': has_total})
+    return rows
+
+
+def _team_stats_long(rows):
+    """
+    match_team_stats from _team_stats_rows. An item without a total is one
+    '<group> <name>' row; an item with one is split into a 'Successful
+    <group> <name>' row (its value) directly followed by a 'Total <group>
+    <name>' row (its total).
+    """
+    columns = TABLE_COLUMNS['match_team_stats']
+    if not rows:
+        return pd.DataFrame(columns=columns)
+
+    # Object columns, inferred once at the end (see _infer_columns).
+    items = pd.DataFrame(rows, columns=['event_id', 'team_id', 'group', 'name', 'value', 'total', 'has_total'],
+                         dtype=object)
+    has_total = items['has_total'].to_numpy(dtype=bool)
+    base_name = items['group'].astype(str) + ' ' + items['name'].astype(str)
+
+    first = items[['event_id', 'team_id']].assign(
+        stat_name=base_name.where(~has_total, 'Successful ' + base_name),
+        stat_value=items['value'],
+    )
+    totals = items.loc[has_total, ['event_id', 'team_id']].assign(
+        stat_name='Total ' + base_name[has_total],
+        stat_value=items.loc[has_total, 'total'],
+    )
+    # Both frames keep the item's index: a stable sort on it puts every
+    # Total row right after its Successful row, in item order.
+    long_df = pd.concat([first, totals]).sort_index(kind='stable').reset_index(drop=True)
+    return _infer_columns(long_df, ['event_id', 'team_id', 'stat_value'])
+
+
+def get_match_team_stats(payload):
+    event_id = payload['event_id']
     try:
-        home_team_id = row['home_team_id'].iloc[0]
-        away_team_id = row['away_team_id'].iloc[0]
-
-        statistics = json.loads(row['statistics'].iloc[0])
-        statistics_df = pd.DataFrame(statistics['statistics'])
-        groups = statistics_df['groups'].iloc[0]
+        statistics = payload['statistics']
+        groups = statistics['statistics'][0]['groups']
 
-        home_long = _build_team_stats_long(groups, 'home', event_id, home_team_id)
-        away_long = _build_team_stats_long(groups, 'away', event_id, away_team_id)
+        home_rows = _team_stats_rows(groups, 'home', event_id, payload['home_team_id'])
+        away_rows = _team_stats_rows(groups, 'away', event_id, payload['away_team_id'])
 
-        return pd.concat([home_long, away_long], ignore_index=True)
+        return home_rows + away_rows
     except Exception as e:
         logger.error(f"get_match_team_stats: failed for event_id={event_id} | {type(e).__name__}: {e}")
         raise
@@ -258,59 +436,51 @@ def get_match_team_stats(row):
 # fields like jerseyNumber/position/substitute/captain + avg position)
 # ---------------------------------------------------------------------------
 
-def get_match_players(row, home_players, away_players, avg_home_positions, avg_away_positions):
-    event_id = row['event_id'].iloc[0]
+def _average_positions_by_player(avg_positions):
+    """{player id: [(averageX, averageY), ...]} for one side, or None if the side has no player positions."""
+    if not avg_positions or not any('player' in entry for entry in avg_positions):
+        return None
+    by_player = {}
+    for entry in avg_positions:
+        player_id = (entry.get('player') or {}).get('id')
+        by_player.setdefault(player_id, []).append((entry['averageX'], entry['averageY']))
+    return by_player
+
+
+def get_match_players(payload, home_players, away_players, avg_home_positions, avg_away_positions):
+    event_id = payload['event_id']
     try:
-        home = home_players.copy()
-        away = away_players.copy()
-
-        home_avg = pd.json_normalize(avg_home_positions['player']) if 'player' in avg_home_positions else None
-        away_avg = pd.json_normalize(avg_away_positions['player']) if 'player' in avg_away_positions else None
-
-        def attach_avg_position(side_df, avg_positions_df, avg_id_df):
-            if avg_id_df is None or avg_positions_df is None or avg_positions_df.empty:
-                side_df = side_df.copy()
-                side_df['averageX'] = 50
-                side_df['averageY'] = 50
-                return side_df
-            avg = avg_positions_df.copy()
-            avg['IdPlayer'] = avg_id_df['id'].values
-            avg = avg.rename(columns={'averageX': 'averageX', 'averageY': 'averageY'})
-            merged = side_df.merge(avg[['IdPlayer', 'averageX', 'averageY']], on='IdPlayer', how='left')
-            merged['averageX'] = merged['averageX'].fillna(50)
-            merged['averageY'] = merged['averageY'].fillna(50)
-            return merged
-
-        home = attach_avg_position(home, avg_home_positions, home_avg)
-        away = attach_avg_position(away, avg_away_positions, away_avg)
-
-        keep_cols = ['IdPlayer', 'teamId', 'jerseyNumber', 'position', 'substitute',
-                     'captain', 'averageX', 'averageY']
-
-        home_out = home.reindex(columns=keep_cols)
-        away_out = away.reindex(columns=keep_cols)
-
-        out = pd.concat([home_out, away_out], ignore_index=True)
-        out.insert(0, 'event_id', event_id)
-
-        out['captain'] = out['captain'].fillna(False).infer_objects(copy=False).astype(bool)
-        out = out.dropna(subset=['averageX', 'averageY'])
-
-        return out
+        def player_rows(players, avg_positions):
+            # Players without an average position sit at the pitch centre (50, 50).
+            by_player = _average_positions_by_player(avg_positions)
+            rows = []
+            for player in players:
+                positions = by_player.get(player['IdPlayer']) if by_player is not None else None
+                for average_x, average_y in positions or [(50, 50)]:
+                    captain = player.get('captain')
+                    rows.append({
+                        'event_id': event_id,
+                        'IdPlayer': player['IdPlayer'],
+                        'teamId': player.get('teamId'),
+                        'jerseyNumber': player.get('jerseyNumber'),
+                        'position': player.get('position'),
+                        'substitute': player.get('substitute'),
+                        'captain': False if _is_missing(captain) else bool(captain),
+                        'averageX': 50 if _is_missing(average_x) else average_x,
+                        'averageY': 50 if _is_missing(average_y) else average_y,
+                    })
+            return rows
+
+        return player_rows(home_players, avg_home_positions) + player_rows(away_players, avg_away_positions)
     except Exception as e:
         logger.error(f"get_match_players: failed for event_id={event_id} | {type(e).__name__}: {e}")
         raise
 # ---------------------------------------------------------------------------
 # incidents -> goals, cards, substitutions, passing_network
 # ---------------------------------------------------------------------------
-def _team_id_from_is_home(is_home_series, home_team_id, away_team_id):
-    return is_home_series.map({True: home_team_id, False: away_team_id})
-
-
 def get_passing_network_table(goal_id, network_actions, registry):
     if not isinstance(network_actions, list):
-        return pd.DataFrame(columns=['goal_id', 'playerId', 'type', 'order',
-                                      'player_coordinates', 'action_coordinates'])
+        return []
 
     rows = []
     order = 0
@@ -358,94 +528,72 @@ def get_passing_network_table(goal_id, network_actions, registry):
             })
             order += 1
 
-    return pd.DataFrame(rows, columns=['goal_id', 'playerId', 'type', 'order',
-                                        'player_coordinates', 'action_coordinates'])
+    return rows
 
 
-def get_incidents_tables(row, registry):
-    event_id = row['event_id'].iloc[0]
+def get_incidents_tables(payload, registry):
+    event_id = payload['event_id']
     try:
-        home_team_id = row['home_team_id'].iloc[0]
-        away_team_id = row['away_team_id'].iloc[0]
-
-        incidents_json = json.loads(row['incidents'].iloc[0])
-        incidents = pd.DataFrame(incidents_json['incidents'])
-        incidents['id'] = incidents['id'].astype('Int64')
-
-        if 'player' not in incidents.columns:
-            incidents['player'] = None
-
-        substitutions = incidents.loc[
-            incidents['incidentType'] == 'substitution',
-            ['id', 'isHome', 'playerIn', 'playerOut', 'injury', 'time', 'addedTime']
-        ].copy().rename(columns={'id': 'sub_id'})
-
-        cards = incidents.loc[
-            incidents['incidentType'] == 'card',
-            ['id', 'isHome', 'incidentClass', 'time', 'addedTime', 'player']
-        ].copy().rename(columns={'id': 'card_id'})
-
-        if 'assist1' not in incidents.columns:
-            incidents['assist1'] = None
-        if 'footballPassingNetworkAction' not in incidents.columns:
-            incidents['footballPassingNetworkAction'] = None
-
-        goals = incidents.loc[
-            incidents['incidentType'] == 'goal',
-            ['id', 'isHome', 'homeScore', 'awayScore', 'time', 'addedTime', 'player', 'assist1', 'footballPassingNetworkAction']
-        ].copy().rename(columns={'id': 'goal_id'})
-        goals['hasAssist'] = goals['assist1'].notna()
-
-        if not cards.empty:
-            cards['player_id'] = cards['player'].apply(registry.get_or_add)
-        else:
-            cards['player_id'] = pd.Series(dtype='object')
-        cards = cards.drop(columns=['player'])
-        cards['player_id'] = cards['player_id'].astype('Int64')
-
-        if not substitutions.empty:
-            substitutions['playerIn_id'] = substitutions['playerIn'].apply(registry.get_or_add)
-            substitutions['playerOut_id'] = substitutions['playerOut'].apply(registry.get_or_add)
-            substitutions = substitutions.drop(columns=['playerIn', 'playerOut'])
-
-        cards['isHome'] = cards['isHome'].astype(bool)
-
-        substitutions['isHome'] = substitutions['isHome'].astype(bool)
-        substitutions['injury'] = substitutions['injury'].astype(bool)
-
-        goals['isHome'] = goals['isHome'].astype(bool)
-
-        passing_networks = []
-        goal_team_ids = {}
-        if not goals.empty:
-            goals['player_id'] = goals['player'].apply(registry.get_or_add)
-            goals['assist1_id'] = goals['assist1'].apply(registry.get_or_add)
-
-            goal_team_ids = dict(zip(goals['goal_id'], _team_id_from_is_home(goals['isHome'], home_team_id, away_team_id)))
-
-            for goal_id, network_actions in zip(goals['goal_id'], goals['footballPassingNetworkAction']):
-                passing_networks.append(get_passing_network_table(goal_id, network_actions, registry))
-
-            goals = goals.drop(columns=['player', 'assist1', 'footballPassingNetworkAction'])
-
-        if passing_networks:
-            passing_network_df = pd.concat(passing_networks, ignore_index=True)
-        else:
-            passing_network_df = pd.DataFrame(columns=['goal_id', 'playerId', 'type', 'order',
-                                                         'player_coordinates', 'action_coordinates'])
+        home_team_id = payload['home_team_id']
+        away_team_id = payload['away_team_id']
+
+        incidents = payload['incidents']['incidents']
+        substitutions = [i for i in incidents if i.get('incidentType') == 'substitution']
+        cards = [i for i in incidents if i.get('incidentType') == 'card']
+        goals = [i for i in incidents if i.get('incidentType') == 'goal']
+
+        # Players are registered in the same order as ever: card players,
+        # then all players in, all players out, goal scorers, assisters,
+        # and finally each goal's passing network.
+        card_player_ids = [registry.get_or_add(i.get('player')) for i in cards]
+        player_in_ids = [registry.get_or_add(i.get('playerIn')) for i in substitutions]
+        player_out_ids = [registry.get_or_add(i.get('playerOut')) for i in substitutions]
+        scorer_ids = [registry.get_or_add(i.get('player')) for i in goals]
+        assist_ids = [registry.get_or_add(i.get('assist1')) for i in goals]
+
+        card_rows = []
+        for incident, player_id in zip(cards, card_player_ids):
+            is_home = bool(incident.get('isHome'))
+            card_rows.append({
+                'event_id': event_id, 'card_id': incident.get('id'), 'isHome': is_home,
+                'incidentClass': incident.get('incidentClass'), 'time': incident.get('time'),
+                'addedTime': incident.get('addedTime'), 'player_id': player_id,
+                'team_id': _team_id(is_home, home_team_id, away_team_id),
+            })
 
-        if not passing_network_df.empty:
-            passing_network_df.insert(0, 'event_id', event_id)
-            passing_network_df['team_id'] = passing_network_df['goal_id'].map(goal_team_ids)
+        substitution_rows = []
+        for incident, player_in_id, player_out_id in zip(substitutions, player_in_ids, player_out_ids):
+            is_home = bool(incident.get('isHome'))
+            substitution_rows.append({
+                'event_id': event_id, 'sub_id': incident.get('id'), 'isHome': is_home,
+                'injury': bool(incident.get('injury')), 'time': incident.get('time'),
+                'addedTime': incident.get('addedTime'), 'playerIn_id': player_in_id,
+                'playerOut_id': player_out_id, 'team_id': _team_id(is_home, home_team_id, away_team_id),
+            })
 
-        passing_network_df['has_action_coordinates'] = passing_network_df['action_coordinates'].notna()
+        goal_rows = []
+        passing_network_rows = []
+        for incident, player_id, assist_id in zip(goals, scorer_ids, assist_ids):
+            is_home = bool(incident.get('isHome'))
+            team_id = _team_id(is_home, home_team_id, away_team_id)
+            goal_rows.append({
+                'event_id': event_id, 'goal_id': incident.get('id'), 'isHome': is_home,
+                'homeScore': incident.get('homeScore'), 'awayScore': incident.get('awayScore'),
+                'time': incident.get('time'), 'addedTime': incident.get('addedTime'),
+                'hasAssist': not _is_missing(incident.get('assist1')),
+                'player_id': player_id, 'assist1_id': assist_id, 'team_id': team_id,
+            })
 
-        for df_ in (substitutions, cards, goals):
-            df_.insert(0, 'event_id', event_id)
-            df_['team_id'] = _team_id_from_is_home(df_['isHome'], home_team_id, away_team_id)
+        for incident, goal_row in zip(goals, goal_rows):
+            for row in get_passing_network_table(goal_row['goal_id'], incident.get('footballPassingNetworkAction'),
+                                                 registry):
+                row['event_id'] = event_id
+                row['team_id'] = goal_row['team_id']
+                row['has_action_coordinates'] = row['action_coordinates'] is not None
+                passing_network_rows.append(row)
 
-        return {'goals': goals, 'cards': cards, 'substitutions': substitutions,
-                'passing_network': passing_network_df}
+        return {'goals': goal_rows, 'cards': card_rows, 'substitutions': substitution_rows,
+                'passing_network': passing_network_rows}
     except Exception as e:
         logger.error(f"get_incidents_tables: failed for event_id={event_id} | {type(e).__name__}: {e}")
         raise
@@ -454,162 +602,283 @@ def get_incidents_tables(row, registry):
 # highlights (per match)
 # ---------------------------------------------------------------------------
 
-def get_highlights_table(row):
-    event_id = row['event_id'].iloc[0]
-    empty_result = pd.DataFrame(columns=['event_id', 'title', 'subtitle', 'url', 'createdAtTimestamp'])
-
-    try:
-        highlights_str = row['highlights'].iloc[0]
-
-        highlights_json = json.loads(highlights_str)
-        highlights = pd.DataFrame(highlights_json)
-
-        key_subtitles = ['Goal', 'Goal (replay)', 'Chance', 'Chance (replay)', 'Big chance', 'Big chance (replay)', 'Cross', 'Goal Disallowed', 'Goal Disallowed (replay)'
-                          'Penalty', 'Penalty (replay)', 'Penalty missed', 'VAR (Replay)', 'Penalty Disallowed (VAR decision)', 'Penalty Disallowed']
+KEY_HIGHLIGHT_SUBTITLES = {
+    'Goal', 'Goal (replay)', 'Chance', 'Chance (replay)', 'Big chance', 'Big chance (replay)', 'Cross',
+    'Goal Disallowed', 'Goal Disallowed (replay)' 'Penalty', 'Penalty (replay)', 'Penalty missed', 'VAR (Replay)',
+    'Penalty Disallowed (VAR decision)', 'Penalty Disallowed',
+}
 
-        highlights_df = pd.DataFrame(highlights['highlights'].tolist()).sort_values('createdAtTimestamp')
 
-        highlights_table = highlights_df.loc[(highlights_df['subtitle'].isin(key_subtitles)), ['title', 'subtitle', 'url', 'createdAtTimestamp']].copy()
-        highlights_table.insert(0, 'event_id', event_id)
+def get_highlights_table(payload):
+    event_id = payload['event_id']
 
-        return highlights_table
+    try:
+        highlights = payload['highlights']['highlights']
+        highlights = sorted(highlights, key=lambda h: h['createdAtTimestamp'])
+
+        return [
+            {'event_id': event_id, 'title': h.get('title'), 'subtitle': h.get('subtitle'), 'url': h.get('url'),
+             'createdAtTimestamp': h['createdAtTimestamp']}
+            for h in highlights if h.get('subtitle') in KEY_HIGHLIGHT_SUBTITLES
+        ]
     except Exception as e:
         logger.warning(f"get_highlights_table: failed to parse highlights for event_id={event_id}, returning empty table | {type(e).__name__}: {e}")
-        return empty_result
+        return []
 
 
 # ---------------------------------------------------------------------------
 # shotmaps (per match)
 # ---------------------------------------------------------------------------
 
-def get_shotmaps_table(row, registry):
-    event_id = row['event_id'].iloc[0]
-    cols = ['eventId', 'playerId', 'teamId', 'shotType', 'situation', 'playerCoordinates',
-            'bodyPart', 'goalMouthLocation', 'goalMouthCoordinates',
-            'blockCoordinates', 'xg', 'xgot', 'goalkeeperId', 'time', 'addedTime']
-    empty_result = pd.DataFrame(columns=cols)
+def get_shotmaps_table(payload, registry):
+    event_id = payload['event_id']
 
     try:
-        home_team_id = row['home_team_id'].iloc[0]
-        away_team_id = row['away_team_id'].iloc[0]
+        home_team_id = payload['home_team_id']
+        away_team_id = payload['away_team_id']
 
-        shotmaps = json.loads(row['shotmap'].iloc[0])
-        shotmaps_df = pd.DataFrame(shotmaps['shotmap'])
+        shots = payload['shotmap']['shotmap']
 
-        shotmaps_df = shotmaps_df.copy()
-        shotmaps_df['playerId'] = shotmaps_df['player'].apply(registry.get_or_add)
-        shotmaps_df['goalkeeperId'] = shotmaps_df['goalkeeper'].apply(registry.get_or_add)
+        player_ids = [registry.get_or_add(shot.get('player')) for shot in shots]
+        goalkeeper_ids = [registry.get_or_add(shot.get('goalkeeper')) for shot in shots]
 
-        shotmaps_df['teamId'] = _team_id_from_is_home(shotmaps_df['isHome'], home_team_id, away_team_id)
-
-        keep_cols = ['playerId', 'teamId', 'shotType', 'situation', 'playerCoordinates',
-                'bodyPart', 'goalMouthLocation', 'goalMouthCoordinates',
-                'blockCoordinates', 'xg', 'xgot', 'goalkeeperId', 'time', 'addedTime']
-        shotmaps_df = shotmaps_df.reindex(columns=keep_cols)
-        shotmaps_df.insert(0, 'eventId', event_id)
-        return shotmaps_df
+        rows = []
+        for shot, player_id, goalkeeper_id in zip(shots, player_ids, goalkeeper_ids):
+            rows.append({
+                'eventId': event_id,
+                'playerId': player_id,
+                'teamId': _team_id(shot.get('isHome'), home_team_id, away_team_id),
+                'shotType': shot.get('shotType'),
+                'situation': shot.get('situation'),
+                'playerCoordinates': shot.get('playerCoordinates'),
+                'bodyPart': shot.get('bodyPart'),
+                'goalMouthLocation': shot.get('goalMouthLocation'),
+                'goalMouthCoordinates': shot.get('goalMouthCoordinates'),
+                'blockCoordinates': shot.get('blockCoordinates'),
+                'xg': shot.get('xg'),
+                'xgot': shot.get('xgot'),
+                'goalkeeperId': goalkeeper_id,
+                'time': shot.get('time'),
+                'addedTime': shot.get('addedTime'),
+            })
+        return rows
     except Exception as e:
         logger.warning(f"get_shotmaps_table: failed to parse shotmap for event_id={event_id}, returning empty table | {type(e).__name__}: {e}")
-        return empty_result
+        return []
 # ---------------------------------------------------------------------------
 # Main orchestration
 # ---------------------------------------------------------------------------
 
-def transform_row(row, registry):
-    event_id = row['event_id'].iloc[0]
+def transform_row(record, registry):
+    """
+    Transforms one match_data record (a dict of its columns) into
+    {table_name: [row dicts]} for every table in TABLE_COLUMNS. Each
+    endpoint column is decoded once, into the MatchPayload every table
+    builder reads.
+    """
+    payload = record if isinstance(record, MatchPayload) else MatchPayload(record)
+    event_id = payload['event_id']
 
-    home_players, home_players_stats, away_players, away_players_stats, formations = _get_lineups_players(row, registry)
+    home_players, home_players_stats, away_players, away_players_stats, formations = _get_lineups_players(payload, registry)
 
     try:
-        avg_positions = json.loads(row['average_positions'].iloc[0])
-        avg_home_positions = pd.DataFrame(avg_positions['home'])
-        avg_away_positions = pd.DataFrame(avg_positions['away'])
+        avg_positions = payload['average_positions']
+        avg_home_positions = avg_positions['home']
+        avg_away_positions = avg_positions['away']
     except Exception as e:
         logger.warning(f"transform_row: failed to parse average_positions for event_id={event_id}, falling back to (50, 50) | {type(e).__name__}: {e}")
-        avg_home_positions = pd.DataFrame()
-        avg_away_positions = pd.DataFrame()
+        avg_home_positions = []
+        avg_away_positions = []
 
-    match_df = get_match_table(row)
+    match_rows = get_match_table(payload)
 
-    team_home = get_team(row['home_team_id'].iloc[0], row['home_team'].iloc[0])
-    team_away = get_team(row['away_team_id'].iloc[0], row['away_team'].iloc[0])
-    team_df = pd.concat([team_home, team_away], ignore_index=True)
+    team_rows = [get_team(payload['home_team_id'], payload['home_team']),
+                 get_team(payload['away_team_id'], payload['away_team'])]
 
-    match_team_df = get_match_team(row, formations)
-    match_team_stats_df = get_match_team_stats(row)
+    match_team_rows = get_match_team(payload, formations)
+    match_team_stats_rows = get_match_team_stats(payload)
 
-    match_players_df = get_match_players(row, home_players, away_players,
-                                          avg_home_positions, avg_away_positions)
-    match_player_stats_df = pd.concat([home_players_stats, away_players_stats], ignore_index=True)
+    match_players_rows = get_match_players(payload, home_players, away_players,
+                                           avg_home_positions, avg_away_positions)
+    match_player_stats_rows = home_players_stats + away_players_stats
 
-    incidents_tables = get_incidents_tables(row, registry)
+    incidents_tables = get_incidents_tables(payload, registry)
 
-    highlights_df = get_highlights_table(row)
-    shotmaps_df = get_shotmaps_table(row, registry)
+    highlights_rows = get_highlights_table(payload)
+    shotmaps_rows = get_shotmaps_table(payload, registry)
 
     return {
-        'match': match_df,
-        'team': team_df,
-        'match_team': match_team_df,
-        'match_team_stats': match_team_stats_df,
-        'match_players': match_players_df,
-        'match_player_stats': match_player_stats_df,
+        'match': match_rows,
+        'team': team_rows,
+        'match_team': match_team_rows,
+        'match_team_stats': match_team_stats_rows,
+        'match_players': match_players_rows,
+        'match_player_stats': match_player_stats_rows,
         'goals': incidents_tables['goals'],
         'cards': incidents_tables['cards'],
         'substitutions': incidents_tables['substitutions'],
         'passing_network': incidents_tables['passing_network'],
-        'highlights': highlights_df,
-        'shotmaps': shotmaps_df,
+        'highlights': highlights_rows,
+        'shotmaps': shotmaps_rows,
     }
 
-def transform_csv(date_str, csv_dir='raw', output_dir='processed'):
-    try:
-        csv_path = f"{csv_dir}/{date_str}_match_data.csv"
-        df = pd.read_csv(csv_path)
-    except Exception as e:
-        logger.error(f"transform_csv: failed to read raw CSV at {csv_path} | {type(e).__name__}: {e}")
-        raise
 
-    registry = PlayerRegistry()
+# Long tables whose per-match rows are staged wide (one row per player /
+# statistics item) and melted by these builders for all matches at once.
+LONG_TABLE_BUILDERS = {
+    'match_team_stats': _team_stats_long,
+    'match_player_stats': _player_stats_long,
+}
 
-    accumulated = {
-        'match': [], 'team': [], 'match_team': [], 'match_team_stats': [],
-        'match_players': [], 'match_player_stats': [],
-        'goals': [], 'cards': [], 'substitutions': [], 'passing_network': [], 'highlights': [],
-        'shotmaps': [],
-    }
 
-    state_df = load_state()
-    succeeded_event_ids = []
+def build_tables(rows_by_table, registry):
+    """
+    Builds the output DataFrames from the accumulated {table_name: [row
+    dicts]} of every successful match, plus the players table from the
+    registry.
+    """
+    final_tables = {}
+    for table_name, columns in TABLE_COLUMNS.items():
+        rows = rows_by_table.get(table_name, [])
+        if table_name in LONG_TABLE_BUILDERS:
+            table_df = LONG_TABLE_BUILDERS[table_name](rows)
+        else:
+            table_df = pd.DataFrame(rows, columns=columns)
+        dtypes = TABLE_DTYPES.get(table_name)
+        if dtypes:
+            table_df = table_df.astype(dtypes)
+        if table_name == 'team':
+            table_df = table_df.drop_duplicates(subset='team_id').reset_index(drop=True)
+        final_tables[table_name] = table_df
+
+    final_tables['players'] = registry.to_dataframe()
+    return final_tables
+
+
+def iter_records(df):
+    """Yields each row of a match_data DataFrame as a plain dict."""
+    columns = list(df.columns)
+    for values in df.itertuples(index=False, name=None):
+        yield dict(zip(columns, values))
+
+
+# Shards per worker: contiguous record shards are kept small enough that a
+# worker stuck on a few heavy matches doesn't hold up the rest of the pool.
+SHARDS_PER_WORKER = 4
+
+
+def transform_records(records):
+    """
+    Transforms match_data records in order with one PlayerRegistry.
+    Returns (rows_by_table, registry, outcomes), where outcomes holds one
+    {event_id, status, error_message, timestamp, seconds} dict per record
+    for update_transform_states. A failing record is logged and recorded as
+    'failed'; it contributes no rows.
+    """
+    registry = PlayerRegistry()
+    accumulated = {table_name: [] for table_name in TABLE_COLUMNS}
+    outcomes = []
 
-    for i in range(len(df)):
-        row = df.iloc[[i]]
-        event_id = row['event_id'].iloc[0]
+    for record in records:
+        event_id = record['event_id']
+        started = time.perf_counter()
         try:
-            tables = transform_row(row, registry)
-            update_transform_state(state_df, event_id, status='success')
-            succeeded_event_ids.append(event_id)
-            logger.info(f"transform_row: succeeded for event_id={event_id}")
+            tables = transform_row(record, registry)
         except Exception as e:
             error_message = f"{type(e).__name__}: {e}"
-            update_transform_state(state_df, event_id, status='failed', error_message=error_message)
+            outcomes.append({'event_id': event_id, 'status': 'failed', 'error_message': error_message,
+                             'timestamp': datetime.now(timezone.utc).isoformat(),
+                             'seconds': time.perf_counter() - started})
             logger.error(f"transform_row: failed for event_id={event_id} | {error_message}")
             continue
 
-        for table_name, table_df in tables.items():
-            accumulated[table_name].append(table_df)
+        outcomes.append({'event_id': event_id, 'status': 'success', 'error_message': None,
+                         'timestamp': datetime.now(timezone.utc).isoformat(),
+                         'seconds': time.perf_counter() - started})
+        logger.info(f"transform_row: succeeded for event_id={event_id}")
+        for table_name, rows in tables.items():
+            accumulated[table_name].extend(rows)
 
-    final_tables = {}
-    for table_name, frames in accumulated.items():
-        if frames:
-            combined = pd.concat(frames, ignore_index=True)
-        else:
-            combined = pd.DataFrame()
-        if table_name == 'team':
-            combined = combined.drop_duplicates(subset='team_id').reset_index(drop=True)
-        final_tables[table_name] = combined
+    return accumulated, registry, outcomes
 
-    final_tables['players'] = registry.to_dataframe()
+
+def _transform_shard(records):
+    # Runs in a worker process: the decode timings observed there are
+    # shipped back with the results and merged into the parent's metrics.
+    DECODE_SECONDS.drain()
+    accumulated, registry, outcomes = transform_records(records)
+    return accumulated, registry, outcomes, DECODE_SECONDS.drain()
+
+
+def transform_records_parallel(records, workers):
+    """
+    transform_records across a pool of `workers` processes. The records are
+    split into contiguous shards; each worker builds its shard's rows and
+    its own PlayerRegistry, and the parent merges them in shard order, so
+    rows, players and outcomes come out exactly as the serial path would
+    produce them.
+    """
+    n_shards = min(len(records), workers * SHARDS_PER_WORKER)
+    shard_size = -(-len(records) // n_shards)
+    shards = [records[i:i + shard_size] for i in range(0, len(records), shard_size)]
+
+    registry = PlayerRegistry()
+    accumulated = {table_name: [] for table_name in TABLE_COLUMNS}
+    outcomes = []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for shard_rows, shard_registry, shard_outcomes, decode_series in executor.map(_transform_shard, shards):
+            for table_name, rows in shard_rows.items():
+                accumulated[table_name].extend(rows)
+            registry.merge(shard_registry)
+            outcomes.extend(shard_outcomes)
+            DECODE_SECONDS.merge(decode_series)
+
+    return accumulated, registry, outcomes
+
+
+def write_transform_state(outcomes):
+    """Default transform_csv state writer: applies the outcomes to the pipeline state file in one batch."""
+    save_state(update_transform_states(load_state(), outcomes))
+
+
+def write_transform_metrics():
+    """Default transform_csv metrics writer: exports the process's metrics to the "transform" textfile."""
+    metrics.write_textfile("transform")
+
+
+def transform_csv(date_str, csv_dir='raw', output_dir='processed', workers=1, state_writer=write_transform_state,
+                  metrics_writer=write_transform_metrics):
+    """
+    Transforms one date's raw match data into processed/<date>/*.parquet
+    and records each match's transform state. workers > 1 shards the
+    matches across a process pool (transform_records_parallel); the output
+    is identical to the serial run.
+
+    The per-match outcomes are handed to state_writer once, after the
+    write, and metrics_writer is called last; callers running several
+    dates at once pass their own writers so that a single process owns
+    the state file and the metrics textfile.
+    """
+    # Reads whichever raw format extract wrote for this date (CSV or
+    # parquet, see utils.raw_format).
+    try:
+        csv_path = find_match_data(csv_dir, date_str) or match_data_path(csv_dir, date_str)
+        df = read_match_data(csv_path)
+    except Exception as e:
+        logger.error(f"transform_csv: failed to read raw match data at {csv_path} | {type(e).__name__}: {e}")
+        raise
+
+    if workers > 1 and len(df) > 1:
+        accumulated, registry, outcomes = transform_records_parallel(list(iter_records(df)), workers)
+    else:
+        accumulated, registry, outcomes = transform_records(iter_records(df))
+
+    for outcome in outcomes:
+        EVENT_SECONDS.observe(outcome['seconds'])
+        EVENTS_TRANSFORMED.inc(status=outcome['status'])
+
+    final_tables = build_tables(accumulated, registry)
 
     date_output_dir = f"{output_dir}/{date_str}"
 
@@ -626,15 +895,19 @@ def transform_csv(date_str, csv_dir='raw', output_dir='processed'):
                 shutil.move(staging_path, final_path)
                 print(f"Wrote {final_path} ({len(final_tables[table_name])} rows)")
                 logger.info(f"transform_csv: wrote {final_path} ({len(final_tables[table_name])} rows)")
+                OUTPUT_ROWS.inc(len(final_tables[table_name]), table=table_name)
     except Exception as e:
         error_message = f"write failed: {type(e).__name__}: {e}"
         logger.error(f"transform_csv: failed to write output tables for date_str={date_str} | {error_message}")
-        for event_id in succeeded_event_ids:
-            update_transform_state(state_df, event_id, status='failed', error_message=error_message)
-        save_state(state_df)
+        for outcome in outcomes:
+            if outcome['status'] == 'success':
+                outcome.update(status='failed', error_message=error_message)
+        state_writer(outcomes)
         raise
 
-    save_state(state_df)
+    # Every match's state is applied in one batch, once the outputs are in place.
+    state_writer(outcomes)
+    metrics_writer()
 
     return final_tables
 
@@ -644,9 +917,11 @@ def main():
     parser.add_argument('date_str', help="Date string for the raw CSV, e.g. 2026-06-17")
     parser.add_argument('--csv-dir', default='raw')
     parser.add_argument('--output-dir', default='processed')
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Transform processes; >1 shards the date's matches across a process pool")
     args = parser.parse_args()
 
-    transform_csv(args.date_str, csv_dir=args.csv_dir, output_dir=args.output_dir)
+    transform_csv(args.date_str, csv_dir=args.csv_dir, output_dir=args.output_dir, workers=args.workers)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,169 @@
+# utils/browser_profile.py
+import asyncio
+import fcntl
+import json
+import os
+from typing import List
+
+from utils.logging_setup import setup_logger
+
+logger = setup_logger("browser_profile", "logs/browser_profile.log")
+
+DEFAULT_PROFILE_DIR = "browser_profile"
+MAX_SLOT_DIRS = 64
+
+
+def _merge_storage_states(old: dict, new: dict) -> dict:
+    """
+    Union of two Playwright storage states; `new` wins on conflicts
+    (same cookie name/domain/path, same localStorage key of an origin).
+    """
+    cookies = {}
+    for cookie in old.get("cookies", []) + new.get("cookies", []):
+        cookies[(cookie.get("name"), cookie.get("domain"), cookie.get("path"))] = cookie
+
+    origins = {}
+    for origin in old.get("origins", []) + new.get("origins", []):
+        items = origins.setdefault(origin["origin"], {})
+        for item in origin.get("localStorage", []):
+            items[item["name"]] = item["value"]
+
+    return {
+        "cookies": list(cookies.values()),
+        "origins": [
+            {"origin": origin, "localStorage": [{"name": k, "value": v} for k, v in items.items()]}
+            for origin, items in origins.items()
+        ],
+    }
+
+
+class BrowserProfile:
+    """
+    On-disk browser state shared by every BrowserPool of every scrape
+    process pointed at the same directory, so the SPA shell, its scripts
+    and the consent/cookie state survive from one page, run and worker to
+    the next.
+
+    Layout:
+        <profile_dir>/slot-<n>/            Chromium user-data-dir (HTTP disk
+                                           cache, cookies) of one pool slot
+        <profile_dir>/slot-<n>.lock        held while a process uses slot-<n>
+        <profile_dir>/storage_state.json   cookies + localStorage merged from
+                                           every slot, seeded into new contexts
+
+    Chromium refuses to share a user-data-dir between two live browsers,
+    so each pool slot takes the first slot-<n> no other process holds (an
+    flock that the OS releases if the process dies) -- concurrent workers
+    therefore each get their own disk cache, warmed by earlier runs.
+    Cookies and localStorage (where consent dialogs keep their answer) are
+    what must be shared across slots; they are merged into
+    storage_state.json under a lock and written atomically whenever a
+    slot's context is closed.
+
+    Note: Playwright disables the browser HTTP cache for contexts with
+    request routing, i.e. any RESOURCE_PROFILES entry other than "full"
+    and fixture replay. Cookies/consent persist either way; the disk
+    cache only pays off with resource_profile="full".
+    """
+
+    def __init__(self, profile_dir: str = DEFAULT_PROFILE_DIR):
+        self.profile_dir = profile_dir
+        self.storage_state_path = os.path.join(profile_dir, "storage_state.json")
+        self._lock_path = os.path.join(profile_dir, "storage_state.lock")
+        self._slot_locks = {}
+        os.makedirs(profile_dir, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Slot user-data-dirs
+    # ------------------------------------------------------------------
+
+    def acquire_slot_dir(self) -> str:
+        """Locks and returns the first free slot-<n> user-data-dir."""
+        for n in range(MAX_SLOT_DIRS):
+            slot_dir = os.path.join(self.profile_dir, f"slot-{n}")
+            if slot_dir in self._slot_locks:
+                continue
+            lock_file = open(f"{slot_dir}.lock", "w")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                continue
+            self._slot_locks[slot_dir] = lock_file
+            os.makedirs(slot_dir, exist_ok=True)
+            return slot_dir
+        raise RuntimeError(f"BrowserProfile: all {MAX_SLOT_DIRS} slot dirs in {self.profile_dir} are in use")
+
+    def release_slot_dir(self, slot_dir: str):
+        lock_file = self._slot_locks.pop(slot_dir, None)
+        if lock_file is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def release(self):
+        for slot_dir in list(self._slot_locks):
+            self.release_slot_dir(slot_dir)
+
+    # ------------------------------------------------------------------
+    # Shared storage state
+    # ------------------------------------------------------------------
+
+    def load_storage_state(self) -> dict:
+        try:
+            with open(self.storage_state_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"cookies": [], "origins": []}
+        except ValueError as e:
+            logger.warning(f"BrowserProfile: ignoring unreadable {self.storage_state_path} | {type(e).__name__}: {e}")
+            return {"cookies": [], "origins": []}
+
+    def save_storage_state(self, state: dict):
+        """Merges `state` into storage_state.json (under a cross-process lock) and replaces it atomically."""
+        with open(self._lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            merged = _merge_storage_states(self.load_storage_state(), state)
+            tmp_path = f"{self.storage_state_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(merged, f)
+            os.replace(tmp_path, self.storage_state_path)
+
+    async def seed_context(self, context):
+        """Adds the shared cookies to `context` and restores the shared localStorage on page load."""
+        state = self.load_storage_state()
+        if state["cookies"]:
+            try:
+                await context.add_cookies(state["cookies"])
+            except Exception as e:
+                logger.warning(f"BrowserProfile.seed_context: add_cookies failed | {type(e).__name__}: {e}")
+        if state["origins"]:
+            await context.add_init_script(script=_local_storage_script(state["origins"]))
+
+    async def persist_context(self, context):
+        """
+        Saves `context`'s cookies and localStorage into the shared storage
+        state. The locked merge and write run in a thread, so waiting on
+        another process's lock never blocks the event loop.
+        """
+        try:
+            state = await context.storage_state()
+            await asyncio.to_thread(self.save_storage_state, state)
+        except Exception as e:
+            logger.warning(f"BrowserProfile.persist_context: storage_state failed | {type(e).__name__}: {e}")
+
+
+def _local_storage_script(origins: List[dict]) -> str:
+    # Only fills keys the page doesn't have yet, so a slot's own newer
+    # values are never overwritten by the shared copy.
+    by_origin = {o["origin"]: {i["name"]: i["value"] for i in o["localStorage"]} for o in origins}
+    return (
+        "(() => {"
+        f" const items = {json.dumps(by_origin)}[window.location.origin];"
+        " if (!items) return;"
+        " try {"
+        "  for (const [k, v] of Object.entries(items)) {"
+        "   if (window.localStorage.getItem(k) === null) window.localStorage.setItem(k, v);"
+        "  }"
+        " } catch (e) {}"
+        "})();"
+    )
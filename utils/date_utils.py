@@ -0,0 +1,39 @@
+# utils/date_utils.py
+from datetime import date, timedelta
+from typing import List, Tuple
+
+
+def date_range(start: str, end: str) -> List[str]:
+    """Every date from start to end inclusive, as YYYY-MM-DD strings."""
+    start_date = date.fromisoformat(start)
+    end_date = date.fromisoformat(end)
+    if end_date < start_date:
+        raise ValueError(f"Date range end {end} is before its start {start}")
+    return [(start_date + timedelta(days=i)).isoformat() for i in range((end_date - start_date).days + 1)]
+
+
+def expand_date_specs(specs: List[str]) -> List[str]:
+    """
+    Expands CLI date specs into a sorted, de-duplicated list of dates.
+    Each spec is either a single date (2022-11-20) or an inclusive range
+    written start:end (2022-11-20:2022-12-18).
+    """
+    dates = set()
+    for spec in specs:
+        if ":" in spec:
+            start, end = spec.split(":", 1)
+            dates.update(date_range(start, end))
+        else:
+            dates.add(date.fromisoformat(spec).isoformat())
+    return sorted(dates)
+
+
+def contiguous_ranges(dates: List[str]) -> List[Tuple[str, str]]:
+    """Groups dates into (start, end) runs of consecutive days, e.g. for one range request per run."""
+    ranges = []
+    for day in sorted(set(dates)):
+        if ranges and date.fromisoformat(day) - date.fromisoformat(ranges[-1][1]) == timedelta(days=1):
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
@@ -0,0 +1,270 @@
+# utils/fixture_bundle.py
+import gzip
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import httpx
+
+from utils.logging_setup import setup_logger
+
+logger = setup_logger("fixture_bundle", "logs/fixture_bundle.log")
+
+FIXTURE_MODES = ("record", "replay")
+
+# Response headers kept in a fixture. Bodies are stored decoded, so
+# content-encoding/length from the original response would be wrong.
+KEPT_HEADERS = ("content-type", "location")
+
+
+def url_key(url: str) -> str:
+    """Fixture key of a URL: everything but the #fragment, which never reaches the server."""
+    return url.split("#", 1)[0]
+
+
+def path_key(url: str) -> str:
+    """Path and query of a URL, for lookups that ignore the origin (stand-in server)."""
+    parts = urlsplit(url)
+    return parts.path + (f"?{parts.query}" if parts.query else "")
+
+
+class FixtureBundle:
+    """
+    A directory of recorded HTTP responses for running the extract stage
+    offline.
+
+    Layout:
+        <bundle_dir>/index.jsonl          one line per recorded response:
+                                          {method, url, status, headers, body}
+        <bundle_dir>/bodies/<sha256>.gz   gzip body, content-addressed
+
+    mode="record": attach() makes a browser context save every response
+    it receives, and recording_transport() does the same for an
+    ApiClient. Entries are appended (and flushed) as they arrive, so a
+    bundle is usable even if the run dies halfway.
+
+    mode="replay": attach() makes a context fulfil every request from the
+    bundle and abort anything not in it, mock_transport() serves an
+    ApiClient, and serve() runs a local stand-in HTTP server. Nothing
+    touches the network. When a URL was recorded more than once, the
+    last recording wins.
+
+    hits / misses / recorded count this instance's lookups and writes;
+    missed URLs are logged on close().
+
+    Usage:
+        with FixtureBundle("fixtures/2022-12-01", mode="record") as fixtures:
+            async with BrowserPool(fixtures=fixtures) as pool: ...
+    """
+
+    def __init__(self, bundle_dir: str, mode: str = "replay"):
+        if mode not in FIXTURE_MODES:
+            raise ValueError(f"Unknown fixture mode '{mode}', expected one of {FIXTURE_MODES}")
+        self.bundle_dir = bundle_dir
+        self.mode = mode
+        self.index_path = os.path.join(bundle_dir, "index.jsonl")
+        self.bodies_dir = os.path.join(bundle_dir, "bodies")
+
+        self._entries = {}
+        self._by_path = {}
+        self._index_file = None
+        self._lock = threading.Lock()
+        self.missed_urls = []
+
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+        if mode == "replay":
+            if not os.path.exists(self.index_path):
+                raise FileNotFoundError(f"Fixture bundle index not found: {self.index_path}")
+            self._load()
+        else:
+            os.makedirs(self.bodies_dir, exist_ok=True)
+            self._index_file = open(self.index_path, "a", encoding="utf-8")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._index_file is not None:
+            self._index_file.close()
+            self._index_file = None
+        if self.missed_urls:
+            logger.warning(f"FixtureBundle: {len(self.missed_urls)} request(s) not in {self.bundle_dir}: "
+                           f"{sorted(set(self.missed_urls))[:20]}")
+        logger.info(f"FixtureBundle: closed {self.bundle_dir} ({self.mode}) -- {self.stats()}")
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "recorded": self.recorded, "hits": self.hits, "misses": self.misses}
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def _load(self):
+        with open(self.index_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self._entries[(entry["method"], url_key(entry["url"]))] = entry
+                self._by_path[(entry["method"], path_key(entry["url"]))] = entry
+        logger.info(f"FixtureBundle: loaded {len(self._entries)} response(s) from {self.bundle_dir}")
+
+    def _body_path(self, digest: str) -> str:
+        return os.path.join(self.bodies_dir, f"{digest}.gz")
+
+    def record(self, method: str, url: str, status: int, headers: dict, body: bytes):
+        """Saves one response (body already decoded)."""
+        digest = hashlib.sha256(body).hexdigest()
+        body_path = self._body_path(digest)
+        if not os.path.exists(body_path):
+            tmp_path = f"{body_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, body_path)
+
+        entry = {
+            "method": method,
+            "url": url_key(url),
+            "status": status,
+            "headers": {k: v for k, v in headers.items() if k.lower() in KEPT_HEADERS},
+            "body": digest,
+        }
+        with self._lock:
+            self._index_file.write(json.dumps(entry) + "\n")
+            self._index_file.flush()
+            self._entries[(method, entry["url"])] = entry
+            self.recorded += 1
+
+    def lookup(self, method: str, url: str, match_path_only: bool = False):
+        """Returns (status, headers, body) for a recorded request, or None."""
+        if match_path_only:
+            entry = self._by_path.get((method, path_key(url)))
+        else:
+            entry = self._entries.get((method, url_key(url)))
+        if entry is None:
+            self.misses += 1
+            self.missed_urls.append(url)
+            return None
+        self.hits += 1
+        with gzip.open(self._body_path(entry["body"]), "rb") as f:
+            body = f.read()
+        return entry["status"], entry["headers"], body
+
+    # ------------------------------------------------------------------
+    # Browser contexts
+    # ------------------------------------------------------------------
+
+    async def attach(self, context):
+        """Records every response of `context`, or replays every request it makes, depending on mode."""
+        if self.mode == "record":
+            context.on("response", self._record_browser_response)
+        else:
+            await context.route("**/*", self._replay_route)
+
+    async def _record_browser_response(self, response):
+        if not response.url.startswith("http"):
+            return
+        try:
+            body = b"" if 300 <= response.status < 400 else await response.body()
+        except Exception as e:
+            logger.debug(f"FixtureBundle: no body for {response.url} | {type(e).__name__}: {e}")
+            return
+        self.record(response.request.method, response.url, response.status, response.headers, body)
+
+    async def _replay_route(self, route):
+        request = route.request
+        if not request.url.startswith("http"):
+            await route.fallback()
+            return
+        found = self.lookup(request.method, request.url)
+        if found is None:
+            await route.abort("blockedbyclient")
+            return
+        status, headers, body = found
+        await route.fulfill(status=status, headers=headers, body=body)
+
+    # ------------------------------------------------------------------
+    # ApiClient transports
+    # ------------------------------------------------------------------
+
+    def mock_transport(self) -> httpx.MockTransport:
+        """httpx transport serving requests from the bundle; unknown URLs get a 404."""
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            found = self.lookup(request.method, str(request.url))
+            if found is None:
+                return httpx.Response(404, request=request)
+            status, headers, body = found
+            return httpx.Response(status, headers=headers, content=body, request=request)
+
+        return httpx.MockTransport(handler)
+
+    def recording_transport(self, inner: httpx.AsyncBaseTransport = None) -> httpx.AsyncBaseTransport:
+        """httpx transport that records every response it passes through from `inner` (default: HTTP/2)."""
+        return _RecordingTransport(self, inner if inner is not None else httpx.AsyncHTTPTransport(http2=True))
+
+    # ------------------------------------------------------------------
+    # Stand-in server
+    # ------------------------------------------------------------------
+
+    def serve(self, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+        """
+        Starts a local HTTP server answering GETs from the bundle (matched
+        on path and query, whatever host they were recorded from) in a
+        daemon thread, and returns it; call .shutdown() to stop it. Point
+        the direct engine at it with --api-origin http://host:port.
+        """
+        bundle = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                found = bundle.lookup("GET", self.path, match_path_only=True)
+                if found is None:
+                    self.send_error(404)
+                    return
+                status, headers, body = found
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f"FixtureBundle.serve: {format % args}")
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logger.info(f"FixtureBundle: serving {self.bundle_dir} on http://{host}:{port}")
+        return server
+
+
+class _RecordingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, bundle: FixtureBundle, inner: httpx.AsyncBaseTransport):
+        self.bundle = bundle
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url)  # before an inner RedirectTransport rewrites it
+        response = await self.inner.handle_async_request(request)
+        # Decode the body here so the fixture stores what the client sees.
+        decoded = httpx.Response(response.status_code, headers=response.headers, stream=response.stream,
+                                 request=request)
+        body = await decoded.aread()
+        await response.aclose()
+        self.bundle.record(request.method, url, response.status_code, dict(response.headers), body)
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in ("content-encoding", "content-length")}
+        return httpx.Response(response.status_code, headers=headers, content=body, request=request)
+
+    async def aclose(self):
+        await self.inner.aclose()
@@ -0,0 +1,159 @@
+# utils/http_utils.py
+import asyncio
+from typing import List, Dict, Tuple
+
+import httpx
+
+from utils.logging_setup import setup_logger
+
+logger = setup_logger("http_utils", "logs/http_utils.log")
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
+    ),
+    "Accept": "application/json, text/plain, */*",
+    "Accept-Language": "fr-FR,fr;q=0.9,en;q=0.8",
+    "Referer": "https://www.sofascore.com/",
+    "Origin": "https://www.sofascore.com",
+}
+
+DEFAULT_MAX_CONNECTIONS = 10
+DEFAULT_TIMEOUT_SECONDS = 20
+
+# Statuses that mean "the API exists but won't serve us directly" -- the
+# caller should retry these through the browser. Anything else non-200
+# (e.g. 404 for a match with no shotmap) is a real answer.
+REFUSED_STATUSES = {401, 403, 429, 503}
+
+
+class RedirectTransport(httpx.AsyncBaseTransport):
+    """
+    Transport that sends every request to `target_origin` (scheme, host
+    and port) instead of the host in its URL, keeping path and query.
+    Lets the direct engine run against a local stand-in server that
+    serves recorded fixtures, with no change to the URLs it asks for.
+
+    Example:
+        ApiClient(transport=RedirectTransport("http://127.0.0.1:8765"))
+    """
+
+    def __init__(self, target_origin: str, inner: httpx.AsyncBaseTransport = None):
+        self.target = httpx.URL(target_origin)
+        self.inner = inner if inner is not None else httpx.AsyncHTTPTransport(http2=True)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = request.url.copy_with(scheme=self.target.scheme, host=self.target.host,
+                                            port=self.target.port)
+        request.headers["Host"] = request.url.netloc.decode("ascii")
+        return await self.inner.handle_async_request(request)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+class ApiClient:
+    """
+    Pooled async HTTP client for fetching Sofascore API JSON directly,
+    without a browser. One client (keep-alive, HTTP/2, connection reuse)
+    is meant to be shared by every fetch of a run.
+
+    If a `rate_limiter` (utils.rate_limiter.TokenBucket) is given, every
+    request first takes a token from it. `transport` replaces the network
+    layer (e.g. RedirectTransport, or httpx.MockTransport for fixtures).
+    With `fixtures` (utils.fixture_bundle.FixtureBundle), responses are
+    recorded into the bundle, or served from it without any network.
+
+    Usage:
+        async with ApiClient() as client:
+            responses, refused = await client.fetch_apis(urls)
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport = None, http2: bool = True,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS, timeout: float = DEFAULT_TIMEOUT_SECONDS,
+                 rate_limiter=None, fixtures=None):
+        self.rate_limiter = rate_limiter
+        if fixtures is not None and fixtures.mode == "replay":
+            transport = fixtures.mock_transport()
+        elif fixtures is not None:
+            transport = fixtures.recording_transport(transport)
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            transport=transport,
+            headers=DEFAULT_HEADERS,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            follow_redirects=True,
+        )
+
+        self.requests_sent = 0
+        self.requests_refused = 0
+        self.bytes_received = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        await self._client.aclose()
+        logger.info(
+            f"ApiClient: closed -- {self.requests_sent} requests, {self.requests_refused} refused, "
+            f"{self.bytes_received} bytes received"
+        )
+
+    async def fetch_json(self, url: str) -> Tuple[int, object]:
+        """
+        GETs one URL. Returns (status, parsed_json); parsed_json is None
+        unless status is 200. A network error is reported as status 0.
+        """
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+        self.requests_sent += 1
+        try:
+            response = await self._client.get(url)
+        except httpx.HTTPError as e:
+            logger.warning(f"ApiClient.fetch_json: request failed for {url} | {type(e).__name__}: {e}")
+            return 0, None
+
+        self.bytes_received += len(response.content)
+        if response.status_code != 200:
+            return response.status_code, None
+        try:
+            return 200, response.json()
+        except ValueError as e:
+            logger.warning(f"ApiClient.fetch_json: invalid JSON from {url} | {type(e).__name__}: {e}")
+            return 0, None
+
+    async def fetch_apis(self, urls: List[str], statuses: Dict[str, int] = None) -> Tuple[List[Dict], List[str]]:
+        """
+        Fetches every url concurrently. `statuses`, when given, is filled
+        in place with {url: status} for the urls that answered a final
+        non-200 status (e.g. 404), neither captured nor refused.
+
+        Returns:
+            (responses, refused): responses in the same shape as
+            capture_apis ("api_link", "json_response") for every 200, and
+            the urls that were refused or errored and should be retried
+            through the browser.
+        """
+        results = await asyncio.gather(*(self.fetch_json(url) for url in urls))
+
+        responses = []
+        refused = []
+        for url, (status, json_data) in zip(urls, results):
+            if status == 200:
+                responses.append({"api_link": url, "json_response": json_data})
+            elif status == 0 or status in REFUSED_STATUSES:
+                refused.append(url)
+            else:
+                logger.info(f"ApiClient.fetch_apis: {url} answered {status}, not retrying")
+                if statuses is not None:
+                    statuses[url] = status
+
+        if refused:
+            self.requests_refused += len(refused)
+            logger.warning(f"ApiClient.fetch_apis: {len(refused)}/{len(urls)} request(s) refused: {refused}")
+        return responses, refused
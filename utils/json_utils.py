@@ -0,0 +1,33 @@
+# utils/json_utils.py
+import json
+
+# Optional faster decoder: orjson when installed, the stdlib otherwise.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+
+def loads(data):
+    """
+    json.loads with the fastest available backend (see JSON_BACKEND).
+    orjson is stricter than the stdlib -- it rejects NaN/Infinity literals
+    and integers over 64 bits -- so documents it refuses are decoded again
+    with json.loads rather than failing.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def available_backends() -> dict:
+    """{name: loads function} for every backend importable here, for benchmarks."""
+    backends = {"json": json.loads}
+    if orjson is not None:
+        backends["orjson"] = orjson.loads
+    return backends
@@ -0,0 +1,245 @@
+# utils/metrics.py
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+DEFAULT_METRICS_DIR = "metrics"
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_registry: Dict[str, "_Metric"] = {}
+_registry_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], le: str = None) -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    if le is not None:
+        parts.append(f'le="{le}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(labels: dict) -> Tuple[Tuple[str, str], ...]:
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonic count, e.g. matches scraped. One series per label combination."""
+    type_name = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def drain(self) -> dict:
+        """Returns and clears every series, e.g. to ship a worker process's counts to the parent."""
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: dict):
+        """Adds series returned by another process's drain() into this counter."""
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0) + value
+
+    def _samples(self):
+        return [f"{self.name}{_format_labels(key)} {_format_value(v)}" for key, v in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    """Value that can go up and down, e.g. the last batch's rows per second."""
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def merge(self, values: dict):
+        """Takes over the other process's latest values."""
+        with self._lock:
+            self._values.update(values)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (durations, sizes) over fixed cumulative buckets."""
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def drain(self) -> dict:
+        """Returns and clears every series, e.g. to ship a worker process's observations to the parent."""
+        with self._lock:
+            series, self._series = self._series, {}
+        return series
+
+    def merge(self, series: dict):
+        """Adds series returned by another process's drain() into this histogram."""
+        with self._lock:
+            for key, other in series.items():
+                mine = self._series.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+                mine["counts"] = [a + b for a, b in zip(mine["counts"], other["counts"])]
+                mine["sum"] += other["sum"]
+                mine["count"] += other["count"]
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the wall-clock seconds spent in the with-block (also when it raises)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self):
+        lines = []
+        for key, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, le=_format_value(bound))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+def _get_or_create(cls, name: str, help_text: str, **kwargs):
+    # Same idea as setup_logger: asking twice for a name returns the same
+    # metric, so modules can declare their metrics at import time.
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, help_text, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} already registered as a {metric.type_name}")
+        return metric
+
+
+def counter(name: str, help_text: str) -> Counter:
+    return _get_or_create(Counter, name, help_text)
+
+
+def gauge(name: str, help_text: str) -> Gauge:
+    return _get_or_create(Gauge, name, help_text)
+
+
+def histogram(name: str, help_text: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+    return _get_or_create(Histogram, name, help_text, buckets=buckets)
+
+
+def drain(prefix: str = "") -> dict:
+    """
+    {name: series} of every registered metric whose name starts with
+    prefix, clearing them. A worker process returns this to its parent,
+    which folds it into its own metrics with merge().
+    """
+    with _registry_lock:
+        metrics = [m for name, m in _registry.items() if name.startswith(prefix)]
+    return {m.name: m.drain() for m in metrics}
+
+
+def merge(snapshot: dict):
+    """Adds a drain() snapshot from another process into the metrics registered here."""
+    with _registry_lock:
+        metrics = {name: _registry.get(name) for name in snapshot}
+    for name, series in snapshot.items():
+        if metrics[name] is not None:
+            metrics[name].merge(series)
+
+
+def render(prefix: str = "") -> str:
+    """Prometheus text exposition of every registered metric whose name starts with prefix."""
+    with _registry_lock:
+        metrics = [m for name, m in sorted(_registry.items()) if name.startswith(prefix)]
+    return "\n".join(m.render() for m in metrics) + "\n"
+
+
+def write_textfile(stage: str, metrics_dir: str = DEFAULT_METRICS_DIR) -> str:
+    """
+    Writes the metrics of one pipeline stage (names starting with
+    "<stage>_") to <metrics_dir>/<stage>.prom, atomically, for the node
+    exporter textfile collector or any scraper reading the directory.
+    Returns the path written.
+    """
+    os.makedirs(metrics_dir, exist_ok=True)
+    path = os.path.join(metrics_dir, f"{stage}.prom")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render(prefix=f"{stage}_"))
+    os.replace(tmp_path, path)
+    return path
+
+
+def serve(port: int = 9108, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serves every registered metric at http://host:port/metrics from a
+    daemon thread, for long runs that should be scraped live. Returns the
+    server; call .shutdown() to stop it.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
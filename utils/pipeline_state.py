@@ -51,9 +51,15 @@ def load_state(state_path=DEFAULT_STATE_PATH):
 
 
 def save_state(state_df, state_path=DEFAULT_STATE_PATH):
-    """Writes the state DataFrame back to disk, creating the folder if needed."""
+    """
+    Writes the state DataFrame back to disk, creating the folder if
+    needed. The file is replaced atomically (temp file + os.replace), so
+    a crash mid-save never leaves a truncated state file behind.
+    """
     os.makedirs(os.path.dirname(state_path), exist_ok=True)
-    state_df.reset_index(drop=True)[STATE_COLUMNS].to_csv(state_path, index=False)
+    tmp_path = f"{state_path}.tmp"
+    state_df.reset_index(drop=True)[STATE_COLUMNS].to_csv(tmp_path, index=False)
+    os.replace(tmp_path, state_path)
 
 
 def update_transform_state(state_df, event_id, status, error_message=None):
@@ -81,6 +87,38 @@ def update_transform_state(state_df, event_id, status, error_message=None):
     return state_df
 
 
+def update_transform_states(state_df, outcomes):
+    """
+    Batch form of update_transform_state, for a whole date's matches at
+    once: `outcomes` is a list of dicts with event_id, status,
+    error_message and timestamp (when the match was transformed). Later
+    outcomes for the same event_id win. Touches only the transform-stage
+    columns, like update_transform_state.
+
+    Returns the updated state DataFrame -- a new one when event_ids had to
+    be appended -- so callers must use the return value.
+    """
+    if not outcomes:
+        return state_df
+
+    updates = pd.DataFrame(outcomes, columns=['event_id', 'status', 'error_message', 'timestamp'])
+    updates = updates.drop_duplicates(subset='event_id', keep='last').set_index('event_id')
+    updates.loc[updates['status'] != 'failed', 'error_message'] = pd.NA
+
+    new_ids = updates.index.difference(state_df.index)
+    if len(new_ids):
+        new_rows = pd.DataFrame({col: pd.NA for col in STATE_COLUMNS}, index=new_ids)
+        new_rows['event_id'] = new_ids
+        state_df = pd.concat([state_df, new_rows]) if len(state_df) else new_rows
+        state_df.index.name = 'event_id'
+
+    transform_columns = ['state_transform', 'state_transform_error', 'state_transform_timestamp']
+    state_df[transform_columns] = state_df[transform_columns].astype(object)
+    state_df.loc[updates.index, transform_columns] = updates[['status', 'error_message', 'timestamp']].to_numpy()
+
+    return state_df
+
+
 def update_extract_state(state_df, event_id, status, error_message=None):
     """
     Updates ONLY the extract-stage columns for one event_id, in place, on
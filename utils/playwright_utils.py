@@ -1,61 +1,591 @@
 # utils/playwright_utils.py
 import asyncio
+from collections import Counter
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
 from playwright.async_api import async_playwright
-from typing import List, Dict
+from typing import Callable, Collection, List, Dict, Tuple, Union
 from utils.logging_setup import setup_logger
 
 logger = setup_logger("playwright_utils", "logs/playwright_utils.log")
 
-async def capture_apis(match_url: str, api_prefix: str , headless: bool = True, wait_time: int = 20) -> List[Dict]:
+# capture_apis url_filter: a predicate on the response URL, or the URLs to keep.
+UrlFilter = Union[Callable[[str], bool], Collection[str]]
+
+DEFAULT_POOL_SIZE = 1
+DEFAULT_PAGES_PER_CONTEXT = 50
+
+# Before each follow-up (tab) navigation, capture waits up to this long for
+# the previous step's expected URLs, so a hash change never lands before
+# the SPA has hydrated and handled the previous one. A step expecting no
+# URLs gets FOLLOW_UP_IDLE_SECONDS instead.
+FOLLOW_UP_SETTLE_SECONDS = 5
+FOLLOW_UP_IDLE_SECONDS = 1
+
+# Route-interception profiles: which requests a context aborts before
+# they are sent. Only the page shell, its scripts and the API are needed
+# to capture API_PREFIX responses.
+#   full:    nothing blocked (the default)
+#   light:   images, media, fonts and every third-party host blocked
+#   minimal: light + stylesheets
+# light/minimal are opt-in: keep "full" as the default until a recorded
+# run (extract.bench_browser_pool --url-filter) shows every MATCH_ENDPOINTS
+# response still arrives under them, and what they save.
+RESOURCE_PROFILES = {
+    "full":    {"resource_types": set(), "block_third_party": False},
+    "light":   {"resource_types": {"image", "media", "font"}, "block_third_party": True},
+    "minimal": {"resource_types": {"image", "media", "font", "stylesheet"}, "block_third_party": True},
+}
+DEFAULT_RESOURCE_PROFILE = "full"
+FIRST_PARTY_SUFFIXES = ("sofascore.com", "sofascore.app", "sofastatic.com")
+
+
+class CaptureStats:
+    """
+    Process-wide counters of the API responses seen by capture_apis:
+
+        responses_decoded: bodies fetched and JSON-decoded
+        bytes_decoded:     their Content-Length
+        responses_skipped: API responses rejected by the url filter, whose
+                           body was never fetched from the browser
+        bytes_skipped:     their Content-Length (when the server sent one)
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.responses_decoded = 0
+        self.bytes_decoded = 0
+        self.responses_skipped = 0
+        self.bytes_skipped = 0
+
+    def stats(self) -> dict:
+        return {
+            "responses_decoded": self.responses_decoded,
+            "bytes_decoded": self.bytes_decoded,
+            "responses_skipped": self.responses_skipped,
+            "bytes_skipped": self.bytes_skipped,
+        }
+
+
+capture_stats = CaptureStats()
+
+
+def _content_length(response) -> int:
+    content_length = response.headers.get("content-length")
+    return int(content_length) if content_length and content_length.isdigit() else 0
+
+
+def _url_predicate(url_filter, expected_urls):
+    """
+    The predicate deciding which API responses get decoded: `url_filter`
+    itself if callable, membership if it is a collection of URLs, else
+    membership in expected_urls; None (keep everything) if neither is set.
+    """
+    if url_filter is None:
+        url_filter = expected_urls
+    if url_filter is None or callable(url_filter):
+        return url_filter
+    allowed = set(url_filter)
+    return allowed.__contains__
+
+
+class ResourceBlocker:
+    """
+    Applies one RESOURCE_PROFILES entry to browser contexts and counts,
+    across every context it is attached to:
+
+        blocked / blocked_by_type: requests aborted before being sent
+        allowed:                   requests let through
+        bytes_received:            Content-Length of responses let through
+
+    Aborted requests never reach the server, so their size is unknown;
+    bytes saved by a profile is bytes_received under "full" minus
+    bytes_received under that profile for the same pages.
+    """
+
+    def __init__(self, profile: str = DEFAULT_RESOURCE_PROFILE, first_party_suffixes=FIRST_PARTY_SUFFIXES):
+        if profile not in RESOURCE_PROFILES:
+            raise ValueError(f"Unknown resource profile '{profile}', expected one of {list(RESOURCE_PROFILES)}")
+        self.profile = profile
+        self.resource_types = RESOURCE_PROFILES[profile]["resource_types"]
+        self.block_third_party = RESOURCE_PROFILES[profile]["block_third_party"]
+        self.first_party_suffixes = first_party_suffixes
+
+        self.blocked = 0
+        self.blocked_by_type = Counter()
+        self.allowed = 0
+        self.bytes_received = 0
+
+    def _is_third_party(self, url: str) -> bool:
+        host = urlsplit(url).hostname or ""
+        return not any(host == suffix or host.endswith("." + suffix) for suffix in self.first_party_suffixes)
+
+    def should_block(self, request) -> bool:
+        if request.resource_type in self.resource_types:
+            return True
+        return self.block_third_party and request.url.startswith("http") and self._is_third_party(request.url)
+
+    async def _handle_route(self, route):
+        request = route.request
+        if self.should_block(request):
+            self.blocked += 1
+            self.blocked_by_type[request.resource_type] += 1
+            await route.abort()
+        else:
+            self.allowed += 1
+            await route.continue_()
+
+    def _count_response(self, response):
+        self.bytes_received += _content_length(response)
+
+    async def attach(self, context):
+        """Routes every request of `context` through this blocker."""
+        if self.resource_types or self.block_third_party:
+            await context.route("**/*", self._handle_route)
+        context.on("response", self._count_response)
+
+    def stats(self) -> dict:
+        return {
+            "profile": self.profile,
+            "blocked": self.blocked,
+            "blocked_by_type": dict(self.blocked_by_type),
+            "allowed": self.allowed,
+            "bytes_received": self.bytes_received,
+        }
+
+
+async def _attach(context, resource_blocker: ResourceBlocker = None, fixtures=None):
+    if resource_blocker is not None:
+        await resource_blocker.attach(context)
+    if fixtures is not None:
+        await fixtures.attach(context)
+
+
+async def new_context(browser, resource_blocker: ResourceBlocker = None, fixtures=None):
+    """
+    Creates a browser context with the resource blocker (if any) attached,
+    and the fixture bundle (utils.fixture_bundle.FixtureBundle, if any)
+    recording or replaying its traffic. Replay routes are registered last,
+    so they take precedence and nothing reaches the network.
+    """
+    context = await browser.new_context()
+    await _attach(context, resource_blocker, fixtures)
+    return context
+
+
+class BrowserPool:
+    """
+    One long-lived Chromium shared by every capture_apis call of a run,
+    instead of a cold browser launch per page.
+
+    The pool holds `size` browser contexts (so at most `size` pages are
+    open at once). A context is closed and replaced after it has served
+    `pages_per_context` pages, so cookies/memory from hundreds of match
+    pages don't pile up in one context. If the browser crashes or
+    disconnects, the next borrower relaunches it and every context from
+    the dead browser is recreated on its next use.
+
+    If a `rate_limiter` (utils.rate_limiter.TokenBucket) is given, every
+    borrowed page first takes a token from it, so all coroutines sharing
+    the pool share one requests-per-second budget.
+
+    Every context gets the `resource_profile` route interception (see
+    RESOURCE_PROFILES); its counters for the whole run are on
+    pool.resource_blocker and logged when the pool closes. With
+    `fixtures` (utils.fixture_bundle.FixtureBundle) every context records
+    into, or replays from, that bundle.
+
+    With a `profile` (utils.browser_profile.BrowserProfile), each slot is
+    instead a persistent context on its own locked user-data-dir under
+    the profile directory: its disk HTTP cache and cookies outlive the
+    context, the run and the process, and cookies/localStorage (consent
+    state) are shared with every other slot and worker through the
+    profile's storage state.
+
+    Usage:
+        async with BrowserPool(size=2, headless=False) as pool:
+            responses = await capture_apis(url, API_PREFIX, pool=pool)
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE, pages_per_context: int = DEFAULT_PAGES_PER_CONTEXT,
+                 headless: bool = True, rate_limiter=None, resource_profile: str = DEFAULT_RESOURCE_PROFILE,
+                 fixtures=None, profile=None):
+        if size < 1:
+            raise ValueError(f"BrowserPool size must be >= 1, got {size}")
+        self.size = size
+        self.pages_per_context = pages_per_context
+        self.headless = headless
+        self.rate_limiter = rate_limiter
+        self.resource_blocker = ResourceBlocker(resource_profile)
+        self.fixtures = fixtures
+        self.profile = profile
+
+        self._playwright = None
+        self._browser = None
+        self._slots = None
+        self._all_slots = []
+        self._launch_lock = asyncio.Lock()
+
+        self.pages_served = 0
+        self.contexts_created = 0
+        self.relaunches = 0
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        self._playwright = await async_playwright().start()
+        self._slots = asyncio.Queue()
+        self._all_slots = []
+        for slot_id in range(self.size):
+            slot = {'id': slot_id, 'context': None, 'browser': None, 'pages': 0, 'user_data_dir': None,
+                    'closed': False}
+            self._all_slots.append(slot)
+            self._slots.put_nowait(slot)
+        profile_dir = self.profile.profile_dir if self.profile is not None else None
+        logger.info(f"BrowserPool: started (size={self.size}, pages_per_context={self.pages_per_context}, "
+                    f"headless={self.headless}, profile={profile_dir})")
+        if self.profile is not None and (self.resource_blocker.profile != "full" or self.fixtures is not None):
+            logger.warning(
+                f"BrowserPool: profile={profile_dir} with resource_profile={self.resource_blocker.profile}"
+                f"{' and fixtures' if self.fixtures is not None else ''} -- request routing disables "
+                f"Playwright's HTTP cache, so only cookies/consent persist, not the disk cache"
+            )
+
+    async def close(self):
+        if self.profile is not None:
+            for slot in self._all_slots:
+                await self._recycle(slot)
+                if slot['user_data_dir'] is not None:
+                    self.profile.release_slot_dir(slot['user_data_dir'])
+                    slot['user_data_dir'] = None
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception as e:
+                logger.warning(f"BrowserPool.close: browser close failed | {type(e).__name__}: {e}")
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        logger.info(
+            f"BrowserPool: closed -- {self.pages_served} pages served, "
+            f"{self.contexts_created} contexts created, {self.relaunches} relaunches, "
+            f"resources: {self.resource_blocker.stats()}"
+        )
+
+    async def _launch(self):
+        self._browser = await self._playwright.chromium.launch(headless=self.headless)
+
+    async def _ensure_browser(self):
+        """
+        Launches the browser on first use (so a run that never needs a page
+        never starts Chromium), and relaunches it if it crashed or
+        disconnected since the last borrow.
+        """
+        async with self._launch_lock:
+            if self._browser is None:
+                await self._launch()
+                return
+            if self._browser.is_connected():
+                return
+            logger.warning("BrowserPool: browser is not connected, relaunching")
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            await self._launch()
+            self.relaunches += 1
+
+    async def _open_context(self, slot):
+        if self.profile is None:
+            slot['context'] = await new_context(self._browser, self.resource_blocker, self.fixtures)
+            slot['browser'] = self._browser
+        else:
+            if slot['user_data_dir'] is None:
+                slot['user_data_dir'] = self.profile.acquire_slot_dir()
+            context = await self._playwright.chromium.launch_persistent_context(slot['user_data_dir'],
+                                                                                headless=self.headless)
+            slot['closed'] = False
+            context.on("close", lambda _: slot.update(closed=True))
+            await self.profile.seed_context(context)
+            await _attach(context, self.resource_blocker, self.fixtures)
+            slot['context'] = context
+        self.contexts_created += 1
+
+    def _slot_alive(self, slot) -> bool:
+        if self.profile is None:
+            return self._browser.is_connected()
+        return not slot['closed']
+
+    async def _recycle(self, slot):
+        if slot['context'] is not None:
+            if self.profile is not None and not slot['closed']:
+                await self.profile.persist_context(slot['context'])
+            try:
+                await slot['context'].close()
+            except Exception:
+                pass
+        slot['context'] = None
+        slot['browser'] = None
+        slot['pages'] = 0
+
+    @asynccontextmanager
+    async def page(self):
+        """
+        Borrows a context slot and yields a fresh page in it. The page is
+        closed and the slot returned to the pool on exit, even on error.
+        """
+        slot = await self._slots.get()
+        try:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
+            if self.profile is None:
+                await self._ensure_browser()
+                stale = slot['browser'] is not self._browser
+            else:
+                # A persistent context is its own browser process.
+                stale = slot['closed']
+            exhausted = slot['pages'] >= self.pages_per_context
+            if slot['context'] is not None and (stale or exhausted):
+                await self._recycle(slot)
+
+            if slot['context'] is None:
+                await self._open_context(slot)
+
+            page = await slot['context'].new_page()
+            slot['pages'] += 1
+            self.pages_served += 1
+
+            crashed = []
+            page.on("crash", lambda _: crashed.append(True))
+            try:
+                yield page
+            finally:
+                if crashed or not self._slot_alive(slot):
+                    logger.warning(f"BrowserPool: page crash/disconnect in slot {slot['id']}, recycling its context")
+                    await self._recycle(slot)
+                else:
+                    try:
+                        await page.close()
+                    except Exception:
+                        pass
+        finally:
+            self._slots.put_nowait(slot)
+
+
+async def _capture_on_page(page, match_url: str, api_prefix: str, wait_time: int,
+                           expected_urls: List[str] = None, follow_up_urls: List[Tuple[str, List[str]]] = None,
+                           url_filter: UrlFilter = None, settled_statuses: Dict[str, int] = None) -> List[Dict]:
+    match_requests = []
+    match_responses = []
+    is_wanted = _url_predicate(url_filter, expected_urls)
+
+    pending_urls = set(expected_urls) if expected_urls is not None else None
+    settled_urls = set()
+    settled_changed = asyncio.Event()
+
+    def handle_request(request):
+        if request.url.startswith(api_prefix):
+            match_requests.append(request.url)
+
+    async def handle_response(response):
+        if response.url.startswith(api_prefix) and response.status == 200:
+            if is_wanted is not None and not is_wanted(response.url):
+                capture_stats.responses_skipped += 1
+                capture_stats.bytes_skipped += _content_length(response)
+            else:
+                try:
+                    json_data = await response.json()
+                    match_responses.append({
+                        "api_link": response.url,
+                        "json_response": json_data
+                    })
+                    capture_stats.responses_decoded += 1
+                    capture_stats.bytes_decoded += _content_length(response)
+                except:
+                    pass
+        # Any status settles an expected URL: a 404 (e.g. no shotmap for
+        # this match) will not turn into a 200 by waiting longer. Non-200
+        # statuses are reported back through settled_statuses.
+        if pending_urls and response.url in pending_urls:
+            pending_urls.discard(response.url)
+            settled_urls.add(response.url)
+            if response.status != 200 and settled_statuses is not None:
+                settled_statuses[response.url] = response.status
+            settled_changed.set()
+
+    async def wait_settled(urls, timeout) -> bool:
+        """Waits until every one of urls has settled, for at most timeout seconds."""
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not settled_urls.issuperset(urls):
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                return False
+            settled_changed.clear()
+            try:
+                await asyncio.wait_for(settled_changed.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    page.on("request", handle_request)
+    page.on("response", handle_response)
+
+    # Follow-ups that differ from match_url only by #fragment are
+    # same-document navigations: the SPA switches tab without reloading.
+    # Each step waits for its own expected URLs (bounded) before the next
+    # tab switch.
+    follow_ups = list(follow_up_urls or [])
+    follow_up_expected = {url for _, step_urls in follow_ups for url in step_urls or []}
+    steps = [(match_url, [url for url in expected_urls or [] if url not in follow_up_expected])] + follow_ups
+
+    for step_num, (step_url, step_urls) in enumerate(steps):
+        if step_num > 0:
+            previous_urls = steps[step_num - 1][1]
+            if previous_urls and pending_urls is not None:
+                await wait_settled(previous_urls, FOLLOW_UP_SETTLE_SECONDS)
+            else:
+                await page.wait_for_timeout(FOLLOW_UP_IDLE_SECONDS * 1000)
+        await page.goto(step_url, timeout=100000)
+
+    if pending_urls is None:
+        await page.wait_for_timeout(wait_time * 1000)
+    elif not await wait_settled(expected_urls, wait_time):
+        logger.warning(
+            f"capture_apis: timed out after {wait_time}s at {match_url} waiting for "
+            f"{len(pending_urls)} endpoint(s): {sorted(pending_urls)}"
+        )
+
+    page.remove_listener("request", handle_request)
+    page.remove_listener("response", handle_response)
+
+    return match_responses
+
+
+async def capture_apis(match_url: str, api_prefix: str , headless: bool = True, wait_time: int = 20,
+                       pool: BrowserPool = None, expected_urls: List[str] = None,
+                       follow_up_urls: List[Tuple[str, List[str]]] = None,
+                       resource_blocker: ResourceBlocker = None, url_filter: UrlFilter = None,
+                       fixtures=None, settled_statuses: Dict[str, int] = None) -> List[Dict]:
     """
-    Launches a Playwright browser, navigates to match_url, and captures API requests/responses.
+    Navigates to match_url and captures API requests/responses. Borrows a
+    page from `pool` when one is given; otherwise launches (and closes) a
+    dedicated Playwright browser for this single call.
+
+    Without `expected_urls` the page is held for a fixed `wait_time`.
+    With `expected_urls`, capture returns as soon as every one of them has
+    responded, and `wait_time` is only the upper bound; endpoints still
+    outstanding at the deadline are logged as timed out.
+
+    `follow_up_urls` are (url, expected_urls) pairs visited on the same
+    page, in order, after match_url (e.g. "#...tab:statistics" variants of
+    it); their API responses are captured together with match_url's. Each
+    one is only navigated to once the previous step's expected URLs have
+    responded, or after FOLLOW_UP_SETTLE_SECONDS.
+
+    An expected URL that responds with a non-200 status (e.g. 404: no
+    shotmap for this match) is settled rather than waited on; its status
+    is recorded in `settled_statuses`, when given.
+
+    Only API responses accepted by `url_filter` -- a predicate on the URL,
+    or a collection of URLs to keep -- have their body fetched and
+    decoded; it defaults to `expected_urls` when those are given, and to
+    keeping every response otherwise. Skipped responses are counted in
+    `capture_stats`.
 
     Args:
         match_url (str): Sofascore match URL to visit.
-        headless (bool): Whether to run browser headless.
+        headless (bool): Whether to run browser headless (ignored when
+            `pool` is given -- the pool decides).
         wait_time (int): Time in seconds to wait for page to load API requests.
+        pool (BrowserPool): Shared browser pool to borrow a page from.
+        expected_urls (List[str]): Exact API URLs the caller needs.
+        follow_up_urls (List[Tuple[str, List[str]]]): (url, expected_urls) to
+            navigate to on the same page after match_url.
+        resource_blocker (ResourceBlocker): Route interception for the
+            dedicated browser's context (a pool applies its own).
+        url_filter (Callable[[str], bool] | Collection[str]): Which API
+            responses to decode (default: expected_urls).
+        fixtures (FixtureBundle): Record/replay bundle for the dedicated
+            browser's context (a pool applies its own).
+        settled_statuses (Dict[str, int]): Filled in place with
+            {expected url: status} for expected URLs that answered non-200.
 
     Returns:
         List[Dict]: List of captured responses with keys: "api_link", "json_response"
     """
-    match_requests = []
     match_responses = []
 
-
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=headless)
-            context = await browser.new_context()
-            page = await context.new_page()
-
-            def handle_request(request):
-                if request.url.startswith(api_prefix):
-                    match_requests.append(request.url)
+        if pool is not None:
+            async with pool.page() as page:
+                match_responses = await _capture_on_page(page, match_url, api_prefix, wait_time,
+                                                           expected_urls, follow_up_urls, url_filter,
+                                                           settled_statuses)
+        else:
+            async with async_playwright() as p:
+                browser = await p.chromium.launch(headless=headless)
+                context = await new_context(browser, resource_blocker, fixtures)
+                page = await context.new_page()
+                match_responses = await _capture_on_page(page, match_url, api_prefix, wait_time,
+                                                           expected_urls, follow_up_urls, url_filter,
+                                                           settled_statuses)
+                await browser.close()
+    except Exception as e:
+        print(f"Error capturing APIs for {match_url}: {e}")
 
-            async def handle_response(response):
-                if response.url.startswith(api_prefix) and response.status == 200:
-                    try:
-                        json_data = await response.json()
-                        match_responses.append({
-                            "api_link": response.url,
-                            "json_response": json_data
-                        })
-                    except:
-                        pass
+    return match_responses
 
-            page.on("request", handle_request)
-            page.on("response", handle_response)
 
+async def capture_apis_batch(targets: List[Tuple[str, List[str]]], api_prefix: str, headless: bool = True,
+                             wait_time: int = 20, pool: BrowserPool = None,
+                             resource_blocker: ResourceBlocker = None,
+                             url_filter: UrlFilter = None, fixtures=None) -> List[List[Dict]]:
+    """
+    capture_apis for several URLs, visited one after the other on ONE
+    page: one pool page (or one dedicated browser) for the whole batch
+    instead of one per URL. Each navigation after the first takes its own
+    token from the pool's rate limiter, if it has one.
 
-            await page.goto(match_url, timeout=100000)
-            await page.wait_for_timeout(wait_time * 1000)  
+    Args:
+        targets (List[Tuple[str, List[str]]]): (url, expected_urls) pairs,
+            visited in order; expected_urls works as in capture_apis,
+            and is each target's url filter unless `url_filter` is given.
+        (other args as in capture_apis)
 
+    Returns:
+        List[List[Dict]]: The captured responses of each target, in
+        target order. If the page fails, the targets not reached yet get
+        an empty list.
+    """
+    results = [[] for _ in targets]
 
-            page.remove_listener("request", handle_request)
-            page.remove_listener("response", handle_response)
+    async def capture_all(page):
+        for i, (url, expected_urls) in enumerate(targets):
+            if i > 0 and pool is not None and pool.rate_limiter is not None:
+                await pool.rate_limiter.acquire()
+            results[i] = await _capture_on_page(page, url, api_prefix, wait_time, expected_urls,
+                                                url_filter=url_filter)
 
-            await browser.close()
-    except Exception as e:  
-        print(f"Error capturing APIs for {match_url}: {e}")
+    try:
+        if pool is not None:
+            async with pool.page() as page:
+                await capture_all(page)
+        else:
+            async with async_playwright() as p:
+                browser = await p.chromium.launch(headless=headless)
+                context = await new_context(browser, resource_blocker, fixtures)
+                page = await context.new_page()
+                await capture_all(page)
+                await browser.close()
+    except Exception as e:
+        print(f"Error capturing APIs for batch of {len(targets)} URL(s): {e}")
 
-    return match_responses
\ No newline at end of file
+    return results
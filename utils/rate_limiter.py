@@ -0,0 +1,47 @@
+# utils/rate_limiter.py
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    asyncio token bucket shared by every coroutine that hits the site.
+
+    Tokens refill continuously at `rate` per second up to `capacity`;
+    acquire() waits until a token is available and takes it. With the
+    default capacity of 1 there are no bursts: requests are spaced at
+    least 1/rate seconds apart no matter how many coroutines are waiting.
+    Waiters are served in arrival order.
+
+    Args:
+        rate (float): Sustained requests per second.
+        capacity (float): Maximum burst size (default 1).
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        if rate <= 0:
+            raise ValueError(f"TokenBucket rate must be > 0, got {rate}")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+        self.acquired = 0
+        self.waited_seconds = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1):
+        started = time.monotonic()
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+        self.acquired += 1
+        self.waited_seconds += time.monotonic() - started
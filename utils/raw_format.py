@@ -0,0 +1,105 @@
+# utils/raw_format.py
+import math
+import os
+from typing import Iterable, Iterator, List
+
+import pandas as pd
+
+# On-disk formats for raw/<date>_match_data files.
+#   "csv":     the original format -- one row per match, each endpoint's
+#              JSON serialized into a CSV cell.
+#   "parquet": one string column per endpoint (same JSON text),
+#              zstd-compressed; columns can be read individually.
+RAW_FORMATS = ("csv", "parquet")
+DEFAULT_RAW_FORMAT = "csv"
+RAW_EXTENSIONS = {"csv": ".csv", "parquet": ".parquet"}
+
+PARQUET_COMPRESSION = "zstd"
+PARQUET_ROW_GROUP_SIZE = 50
+
+
+def raw_format_of(path: str) -> str:
+    for raw_format, extension in RAW_EXTENSIONS.items():
+        if path.endswith(extension):
+            return raw_format
+    raise ValueError(f"Unknown raw format for {path}, expected one of {list(RAW_EXTENSIONS.values())}")
+
+
+def match_data_path(raw_dir: str, date_str: str, raw_format: str = DEFAULT_RAW_FORMAT) -> str:
+    return os.path.join(raw_dir, f"{date_str}_match_data{RAW_EXTENSIONS[raw_format]}")
+
+
+def find_match_data(raw_dir: str, date_str: str) -> str:
+    """
+    Path of the existing match_data file for date_str, whichever format
+    it was written in, or None. If both formats exist (convert_raw_format
+    keeps its source by default) the most recently written one wins, so a
+    re-scrape or retry of the other format is never shadowed by a stale
+    copy; parquet wins a tie.
+    """
+    paths = [match_data_path(raw_dir, date_str, raw_format) for raw_format in ("parquet", "csv")]
+    paths = [path for path in paths if os.path.exists(path)]
+    if not paths:
+        return None
+    return max(paths, key=lambda path: (os.path.getmtime(path), path.endswith(RAW_EXTENSIONS["parquet"])))
+
+
+def read_match_data(path: str, columns: List[str] = None) -> pd.DataFrame:
+    """
+    Reads a match_data file of either format. `columns` limits the read
+    to those columns -- with parquet, the others are never decompressed.
+    """
+    if raw_format_of(path) == "parquet":
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+
+def iter_match_data(path: str, chunksize: int = PARQUET_ROW_GROUP_SIZE) -> Iterator[pd.DataFrame]:
+    """Yields a match_data file of either format as DataFrames of at most chunksize rows."""
+    if raw_format_of(path) == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+def _is_missing(value):
+    return value is None or value is pd.NA or (isinstance(value, float) and math.isnan(value))
+
+
+def parquet_schema(columns: List[str], int_columns: Iterable[str] = ()):
+    """The match_data parquet schema: int64 for `int_columns`, string for every other column."""
+    import pyarrow as pa
+
+    int_columns = set(int_columns)
+    return pa.schema([(col, pa.int64() if col in int_columns else pa.string()) for col in columns])
+
+
+def parquet_column(values: Iterable, is_int: bool) -> list:
+    """Values of one column converted for parquet_schema (missing values become null)."""
+    if is_int:
+        return [None if _is_missing(v) else int(v) for v in values]
+    return [None if _is_missing(v) else str(v) for v in values]
+
+
+def write_match_data(df: pd.DataFrame, path: str, int_columns: Iterable[str] = ()):
+    """
+    Writes a match_data DataFrame in the format given by path's extension,
+    atomically. For parquet, `int_columns` are stored as int64 and every
+    other column as a string -- the schema utils.raw_writer.MatchDataWriter
+    writes -- whatever dtypes pandas read them back as.
+    """
+    tmp_path = f"{path}.tmp"
+    if raw_format_of(path) == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        int_columns = set(int_columns)
+        schema = parquet_schema(list(df.columns), int_columns)
+        table = pa.table({col: parquet_column(df[col], col in int_columns) for col in df.columns}, schema=schema)
+        pq.write_table(table, tmp_path, compression=PARQUET_COMPRESSION, row_group_size=PARQUET_ROW_GROUP_SIZE)
+    else:
+        df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
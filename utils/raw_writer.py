@@ -0,0 +1,215 @@
+# utils/raw_writer.py
+import csv
+import json
+import math
+import os
+from typing import Dict, Iterable, List
+
+from utils.logging_setup import setup_logger
+from utils.raw_format import (PARQUET_COMPRESSION, PARQUET_ROW_GROUP_SIZE, parquet_column, parquet_schema,
+                              raw_format_of)
+
+logger = setup_logger("raw_writer", "logs/raw_writer.log")
+
+JOURNAL_SUFFIX = ".journal.jsonl"
+
+
+def _json_default(value):
+    # numpy/pandas scalars (int64, float64, bool_) from DataFrame rows
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+class MatchDataWriter:
+    """
+    Append-as-you-go writer for a raw match_data CSV.
+
+    Every record is appended to a JSON-lines journal next to the output
+    (<output_path>.journal.jsonl), flushed and fsynced before write()
+    returns, so a crash loses at most the match being written. Only the
+    byte offset of each event's latest record is kept in memory, so
+    memory stays flat however many matches a date has.
+
+    finalize() streams the journal into the output file (in `event_order`
+    when given, one row per event, latest record wins) through a temp file
+    and os.replace, then deletes the journal. Until then the previous
+    output, if any, is left untouched. The output is CSV or zstd Parquet
+    depending on output_path's extension (see utils.raw_format); for
+    Parquet, `int_columns` are stored as int64 and every other column as
+    a string.
+
+    A journal left behind by a crashed run is picked up by open(): its
+    complete records are kept (a torn last line is truncated away) and
+    their event_ids are returned, so the caller can skip those matches.
+
+    Usage:
+        with MatchDataWriter(output_path, columns) as writer:
+            done = writer.open()
+            for record in ...:
+                writer.write(record)
+            writer.finalize(event_order)
+    """
+
+    def __init__(self, output_path: str, columns: List[str], int_columns: List[str] = ()):
+        self.output_path = output_path
+        self.journal_path = output_path + JOURNAL_SUFFIX
+        self.raw_format = raw_format_of(output_path)
+        self.columns = list(columns)
+        self.int_columns = set(int_columns)
+        self._offsets: Dict[object, int] = {}
+        self._file = None
+
+        self.records_written = 0
+        self.records_recovered = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def open(self) -> set:
+        """Opens the journal for appending. Returns the event_ids recovered from a previous crashed run."""
+        os.makedirs(os.path.dirname(self.output_path) or ".", exist_ok=True)
+        if os.path.exists(self.journal_path):
+            self._recover()
+        self._file = open(self.journal_path, "ab")
+        return set(self._offsets)
+
+    def _recover(self):
+        good_end = 0
+        with open(self.journal_path, "rb") as f:
+            for line in iter(f.readline, b""):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                self._offsets[record["event_id"]] = good_end
+                good_end += len(line)
+
+        if good_end < os.path.getsize(self.journal_path):
+            logger.warning(f"MatchDataWriter: truncating torn record at byte {good_end} of {self.journal_path}")
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(good_end)
+
+        self.records_recovered = len(self._offsets)
+        logger.info(f"MatchDataWriter: recovered {self.records_recovered} record(s) from {self.journal_path}")
+
+    def __contains__(self, event_id) -> bool:
+        return event_id in self._offsets
+
+    def _append(self, record: dict):
+        line = json.dumps(record, default=_json_default).encode("utf-8") + b"\n"
+        offset = self._file.tell()
+        self._file.write(line)
+        self._offsets[record["event_id"]] = offset
+        self.records_written += 1
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def write(self, record: dict):
+        """Durably appends one match record; it replaces any earlier record for the same event_id."""
+        self._append(record)
+        self._sync()
+
+    def write_many(self, records: Iterable[dict]):
+        """write() for a batch of records, with a single fsync at the end."""
+        for record in records:
+            self._append(record)
+        self._sync()
+
+    def write_missing(self, records: Iterable[dict]):
+        """
+        Appends every record whose event_id isn't journaled yet (e.g. rows
+        kept from an existing CSV), with a single fsync at the end.
+        """
+        for record in records:
+            if record["event_id"] not in self._offsets:
+                self._append(record)
+        self._sync()
+
+    def _records(self, order, kept):
+        with open(self.journal_path, "rb") as journal:
+            for event_id in order:
+                if event_id not in self._offsets:
+                    yield kept[event_id]
+                    continue
+                journal.seek(self._offsets[event_id])
+                yield json.loads(journal.readline())
+
+    def _write_csv(self, records, tmp_path):
+        with open(tmp_path, "w", newline="", encoding="utf-8") as out:
+            writer = csv.DictWriter(out, fieldnames=self.columns, extrasaction="ignore",
+                                    lineterminator="\n")
+            writer.writeheader()
+            for record in records:
+                writer.writerow({col: "" if _is_missing(record.get(col)) else record.get(col)
+                                 for col in self.columns})
+            out.flush()
+            os.fsync(out.fileno())
+
+    def _write_parquet(self, records, tmp_path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = parquet_schema(self.columns, self.int_columns)
+
+        def to_table(batch):
+            return pa.table({col: parquet_column([r.get(col) for r in batch], col in self.int_columns)
+                             for col in self.columns}, schema=schema)
+
+        # One row group per PARQUET_ROW_GROUP_SIZE records, so only that
+        # many records are ever held in memory.
+        with pq.ParquetWriter(tmp_path, schema, compression=PARQUET_COMPRESSION) as writer:
+            batch = []
+            for record in records:
+                batch.append(record)
+                if len(batch) == PARQUET_ROW_GROUP_SIZE:
+                    writer.write_table(to_table(batch))
+                    batch = []
+            if batch:
+                writer.write_table(to_table(batch))
+
+    def finalize(self, event_order: Iterable = None, kept: Dict[object, dict] = None) -> int:
+        """
+        Atomically writes the output file from the journal and removes
+        the journal. `kept` ({event_id: record}) adds rows that were never
+        journaled (e.g. an existing row whose match failed to re-scrape);
+        a journaled record wins over a kept one. Events not in
+        `event_order` are dropped. Returns the number of rows written.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        kept = kept or {}
+        available = set(self._offsets) | set(kept)
+        if event_order is None:
+            order = list(self._offsets) + [e for e in kept if e not in self._offsets]
+        else:
+            order = [e for e in event_order if e in available]
+
+        tmp_path = f"{self.output_path}.tmp"
+        if self.raw_format == "parquet":
+            self._write_parquet(self._records(order, kept), tmp_path)
+        else:
+            self._write_csv(self._records(order, kept), tmp_path)
+
+        os.replace(tmp_path, self.output_path)
+        os.remove(self.journal_path)
+        logger.info(f"MatchDataWriter: finalized {len(order)} row(s) -> {self.output_path}")
+        return len(order)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,201 @@
+# utils/response_cache.py
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import List, Dict, Tuple
+
+from utils.logging_setup import setup_logger
+
+logger = setup_logger("response_cache", "logs/response_cache.log")
+
+DEFAULT_CACHE_DIR = "cache/api"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# Negative entries (an endpoint that answered 404, e.g. no shotmap for a
+# match) expire after a day: highlights and the like can still be added
+# to a finished match later.
+NEGATIVE_TTL_SECONDS = 24 * 3600
+
+# After eviction the cache is brought down to this fraction of max_bytes,
+# so a full cache doesn't rescan its directory on every single put().
+EVICT_TO_FRACTION = 0.9
+
+
+class ResponseCache:
+    """
+    Local on-disk cache of captured API responses, keyed by api_link.
+
+    Each entry is one gzip-compressed JSON file named after the sha256 of
+    its api_link, holding the response plus its fetch time and expiry.
+    Entries stored with ttl_seconds=None never expire (finished matches
+    don't change); others are ignored once older than their TTL.
+
+    put_unavailable() stores a negative entry instead: the status the
+    endpoint answered (e.g. 404), with a TTL (NEGATIVE_TTL_SECONDS by
+    default). get() treats it as a miss; lookup() can report it so the
+    caller doesn't request the endpoint again until it expires.
+
+    Total size is capped at max_bytes: when a put() goes over, the least
+    recently used entries (by file mtime, refreshed on every hit) are
+    deleted. Writes are atomic (temp file + os.replace), so concurrent
+    scrape processes can share one cache directory, and the size
+    bookkeeping is locked, so one instance can be used from worker threads
+    (asyncio.to_thread) to keep the gzip I/O off the event loop.
+
+    hits / misses / expired / evicted / negative_hits count lookups for
+    this instance.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._entries())
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.negative_hits = 0
+
+    def _path(self, api_link: str) -> str:
+        digest = hashlib.sha256(api_link.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.json.gz")
+
+    def _entries(self):
+        """Yields (path, size, mtime) for every entry file."""
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".json.gz"):
+                    stat = entry.stat()
+                    yield entry.path, stat.st_size, stat.st_mtime
+
+    def _read(self, api_link: str):
+        """The unexpired entry dict for api_link (positive or negative), or None."""
+        path = self._path(api_link)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"ResponseCache.get: unreadable entry for {api_link}, ignoring | {type(e).__name__}: {e}")
+            return None
+
+        expires_at = entry.get("expires_at")
+        if expires_at is not None and time.time() > expires_at:
+            self.expired += 1
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def get(self, api_link: str):
+        """Returns the cached json_response for api_link, or None on a miss/expired/negative entry."""
+        entry = self._read(api_link)
+        if entry is None or entry.get("status", 200) != 200:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["json_response"]
+
+    def _write(self, api_link: str, entry: dict):
+        path = self._path(api_link)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._total_bytes += os.path.getsize(path) - old_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def put(self, api_link: str, json_response, ttl_seconds: float = None):
+        fetched_at = time.time()
+        self._write(api_link, {
+            "api_link": api_link,
+            "fetched_at": fetched_at,
+            "expires_at": fetched_at + ttl_seconds if ttl_seconds is not None else None,
+            "json_response": json_response,
+        })
+
+    def put_unavailable(self, api_link: str, status: int, ttl_seconds: float = NEGATIVE_TTL_SECONDS):
+        """Caches that api_link answered `status` (e.g. 404), for ttl_seconds."""
+        fetched_at = time.time()
+        self._write(api_link, {
+            "api_link": api_link,
+            "fetched_at": fetched_at,
+            "expires_at": fetched_at + ttl_seconds if ttl_seconds is not None else None,
+            "status": status,
+            "json_response": None,
+        })
+
+    def lookup(self, urls: List[str], unavailable: Dict[str, int] = None) -> Tuple[List[Dict], List[str]]:
+        """
+        Returns (responses, missing): cached responses in the same shape
+        as capture_apis ("api_link", "json_response"), and the urls that
+        still have to be fetched.
+
+        With an `unavailable` dict, urls with an unexpired negative entry
+        are added to it as {url: status} instead of to missing.
+        """
+        responses = []
+        missing = []
+        for url in urls:
+            entry = self._read(url)
+            if entry is None:
+                self.misses += 1
+                missing.append(url)
+            elif entry.get("status", 200) != 200:
+                if unavailable is None:
+                    self.misses += 1
+                    missing.append(url)
+                else:
+                    self.negative_hits += 1
+                    unavailable[url] = entry["status"]
+            else:
+                self.hits += 1
+                responses.append({"api_link": url, "json_response": entry["json_response"]})
+        return responses, missing
+
+    def store(self, responses: List[Dict], ttl_seconds: float = None):
+        """put() for every {"api_link", "json_response"} in responses."""
+        for r in responses:
+            self.put(r["api_link"], r["json_response"], ttl_seconds=ttl_seconds)
+
+    def _evict(self):
+        target = self.max_bytes * EVICT_TO_FRACTION
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        self._total_bytes = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._total_bytes -= size
+            self.evicted += 1
+        logger.info(f"ResponseCache._evict: cache at {self._total_bytes} bytes after evicting, {self.evicted} evicted so far")
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "negative_hits": self.negative_hits,
+            "total_bytes": self._total_bytes,
+        }
@@ -0,0 +1,13 @@
+# utils/retry_utils.py
+import random
+
+# Exponential backoff: base * 2**(attempt-1) seconds, capped, with +/-50%
+# jitter so concurrent retries don't line up.
+RETRY_BASE_DELAY_SECONDS = 2.0
+RETRY_MAX_DELAY_SECONDS = 30.0
+
+
+def retry_delay(attempt: int, base_delay: float = RETRY_BASE_DELAY_SECONDS,
+                max_delay: float = RETRY_MAX_DELAY_SECONDS) -> float:
+    """Exponential backoff with +/-50% jitter for the sleep after `attempt` (1-based)."""
+    return min(max_delay, base_delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)